@@ -1,3 +1,88 @@
-"""Asynchronous API client for interaction with the CTS api."""
+"""Asynchronous API client for interaction with the CTS api.
+
+The client and the response types are imported on first access, so importing the
+package alone does not load aiohttp."""
+
+from importlib import import_module
+from typing import Any
 
 __version__ = "0.0.2"
+
+# Module of each attribute of the package.
+_EXPORTS: dict[str, str] = {
+    "CtsApi": "client",
+    "CachePolicy": "cache",
+    "MemoryCacheBackend": "cache",
+    "BalancingStrategy": "balancer",
+    "CircuitBreakerPolicy": "circuit_breaker",
+    "HedgingPolicy": "hedging",
+    "Priority": "priority",
+    "PriorityScheduler": "priority",
+    "PreparedRequest": "requests",
+    "VehicleMode": "requests",
+    "prepare_estimated_timetable": "requests",
+    "prepare_general_messages": "requests",
+    "prepare_lines_discovery": "requests",
+    "prepare_stop_monitoring": "requests",
+    "prepare_stoppoints_discovery": "requests",
+    "prepare_vehicle_monitoring": "requests",
+    **dict.fromkeys(
+        (
+            "CtsError",
+            "ApiConnectionError",
+            "ApiTimeoutError",
+            "BadRequestError",
+            "CircuitOpenError",
+            "InvalidTokenError",
+            "TechnicalError",
+            "TooManyRequestsError",
+        ),
+        "exceptions",
+    ),
+    **dict.fromkeys(
+        (
+            "AnnotatedLineRef",
+            "AnnotatedStopPointRef",
+            "ErrorResponse",
+            "EstimatedCall",
+            "EstimatedTimetableDelivery",
+            "EstimatedTimetableResponse",
+            "EstimatedVehicleJourney",
+            "GeneralMessageDelivery",
+            "GeneralMessageResponse",
+            "InfoMessage",
+            "LinesDelivery",
+            "LinesDiscoveryResponse",
+            "Location",
+            "MonitoredCall",
+            "MonitoredStopVisit",
+            "MonitoredVehicleJourney",
+            "OnwardCall",
+            "PreviousCall",
+            "ServiceDelivery",
+            "StopMonitoringDelivery",
+            "StopMonitoringResponse",
+            "StopPointsDelivery",
+            "StopPointsDiscoveryResponse",
+            "VehicleMonitoringDelivery",
+            "VehicleMonitoringResponse",
+        ),
+        "responses",
+    ),
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    """Import the module of an attribute on first access."""
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_EXPORTS])
@@ -0,0 +1,295 @@
+"""Compact archive of stop-monitoring polls for punctuality analytics."""
+
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import json
+import struct
+import sys
+from typing import Iterable, Iterator, Optional
+import zlib
+
+from .responses import MonitoredStopVisit, StopMonitoringResponse
+
+# Offset stored for a missing expected time.
+MISSING = -(2**31)
+
+_HEADER = struct.Struct("<I")
+
+
+class StringTable:
+    """Dictionary encoding of repetitive strings."""
+
+    def __init__(self, values: Iterable[str] = ()) -> None:
+        """Initialize the object."""
+        self.values: list[str] = []
+        self._ids: dict[str, int] = {}
+        for value in values:
+            self.encode(value)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def encode(self, value: str) -> int:
+        """Returns the id of a string, adding it if needed."""
+        index = self._ids.get(value)
+        if index is None:
+            index = self._ids[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def get(self, value: str) -> Optional[int]:
+        """Returns the id of a string, if known."""
+        return self._ids.get(value)
+
+    def decode(self, index: int) -> str:
+        """Returns the string of an id."""
+        return self.values[index]
+
+
+class DeltaArray:
+    """Integers stored as the differences between successive values."""
+
+    def __init__(self, deltas: Iterable[int] = ()) -> None:
+        """Initialize the object."""
+        self.deltas = array("q", deltas)
+        self.last = sum(self.deltas)
+
+    def __len__(self) -> int:
+        return len(self.deltas)
+
+    def __iter__(self) -> Iterator[int]:
+        value = 0
+        for delta in self.deltas:
+            value += delta
+            yield value
+
+    @property
+    def first(self) -> int:
+        """Returns the first value."""
+        return self.deltas[0]
+
+    def append(self, value: int) -> None:
+        """Append a value."""
+        self.deltas.append(value - self.last)
+        self.last = value
+
+
+@dataclass
+class Observation:
+    """Expected times of a journey at a stop, as recorded by one poll."""
+
+    journey_ref: str
+    line_ref: str
+    destination_name: str
+    stop_code: str
+    recorded_at: datetime
+    expected_departure_time: Optional[datetime]
+    expected_arrival_time: Optional[datetime]
+
+
+class _Series:
+    """Observations of a journey at a stop.
+
+    Recording times are epoch seconds, expected times are offsets in seconds against
+    the recording time."""
+
+    __slots__ = (
+        "journey",
+        "line",
+        "destination",
+        "stop",
+        "recorded_at",
+        "departure",
+        "arrival",
+    )
+
+    def __init__(self, journey: int, line: int, destination: int, stop: int) -> None:
+        self.journey = journey
+        self.line = line
+        self.destination = destination
+        self.stop = stop
+        self.recorded_at = DeltaArray()
+        self.departure = DeltaArray()
+        self.arrival = DeltaArray()
+
+
+def _offset(value: Optional[datetime], epoch: int) -> int:
+    """Returns the offset of an expected time against a recording time."""
+    return int(value.timestamp()) - epoch if value is not None else MISSING
+
+
+def _time(epoch: int, offset: int = 0) -> Optional[datetime]:
+    """Returns the UTC time of an offset against a recording time."""
+    if offset == MISSING:
+        return None
+    return datetime.fromtimestamp(epoch + offset, timezone.utc)
+
+
+def _to_bytes(values: array) -> bytes:
+    """Returns the little-endian bytes of an array."""
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(data: bytes) -> array:
+    """Returns the array of little-endian bytes."""
+    values = array("q")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class StopMonitoringArchive:
+    """Time series of the expected times of each journey at each stop.
+
+    Each poll of a stop adds one observation per visit, unless the visit was already
+    archived with the same recording time. Times are stored to the second, and
+    returned in UTC."""
+
+    def __init__(self) -> None:
+        """Initialize the object."""
+        self.strings = StringTable()
+        self._series: dict[tuple[int, int], _Series] = {}
+        self._by_stop: dict[int, list[_Series]] = {}
+        self._by_journey: dict[int, list[_Series]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(s.recorded_at) for s in self._series.values())
+
+    def add(self, response: StopMonitoringResponse) -> int:
+        """Archive a response and return the number of new observations."""
+        added = 0
+        for delivery in response.service_delivery.stop_monitoring_delivery:
+            for visit in delivery.monitored_stop_visit:
+                added += self.add_visit(visit, delivery.response_timestamp)
+        return added
+
+    def add_visit(
+        self, visit: MonitoredStopVisit, recorded_at: Optional[datetime] = None
+    ) -> bool:
+        """Archive a visit, recorded at recorded_at if it has no recording time."""
+        recorded_at = visit.recorded_at_time or recorded_at
+        if recorded_at is None:
+            return False
+
+        journey = visit.monitored_vehicle_journey
+        call = journey.monitored_call
+        stop = self.strings.encode(visit.stop_code or call.stop_code)
+        key = (self.strings.encode(journey.journey_ref), stop)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series(
+                key[0],
+                self.strings.encode(journey.line_ref),
+                self.strings.encode(journey.destination_name),
+                stop,
+            )
+            self._by_stop.setdefault(stop, []).append(series)
+            self._by_journey.setdefault(key[0], []).append(series)
+
+        epoch = int(recorded_at.timestamp())
+        if len(series.recorded_at) and epoch <= series.recorded_at.last:
+            return False
+        series.recorded_at.append(epoch)
+        series.departure.append(_offset(call.expected_departure_time, epoch))
+        series.arrival.append(_offset(call.expected_arrival_time, epoch))
+        return True
+
+    def _observations(
+        self, series: _Series, start: Optional[int] = None, end: Optional[int] = None
+    ) -> Iterator[Observation]:
+        """Decode the observations of a series recorded within [start, end)."""
+        decode = self.strings.decode
+        for epoch, departure, arrival in zip(
+            series.recorded_at, series.departure, series.arrival
+        ):
+            if start is not None and epoch < start:
+                continue
+            if end is not None and epoch >= end:
+                break
+            yield Observation(
+                decode(series.journey),
+                decode(series.line),
+                decode(series.destination),
+                decode(series.stop),
+                _time(epoch),
+                _time(epoch, departure),
+                _time(epoch, arrival),
+            )
+
+    def scan(self, stop_code: str, start: datetime, end: datetime) -> list[Observation]:
+        """Returns the observations of a stop recorded within [start, end), by time."""
+        stop = self.strings.get(stop_code)
+        if stop is None:
+            return []
+
+        start_epoch, end_epoch = int(start.timestamp()), int(end.timestamp())
+        observations = []
+        # The strings are shared with lines, destinations and journeys.
+        for series in self._by_stop.get(stop, []):
+            recorded_at = series.recorded_at
+            if recorded_at.first >= end_epoch or recorded_at.last < start_epoch:
+                continue
+            observations.extend(self._observations(series, start_epoch, end_epoch))
+        observations.sort(key=lambda o: o.recorded_at)
+        return observations
+
+    def journey(self, journey_ref: str) -> list[Observation]:
+        """Returns the observations of a journey at all its stops, by time."""
+        journey = self.strings.get(journey_ref)
+        if journey is None:
+            return []
+        observations = [
+            o
+            for s in self._by_journey.get(journey, [])
+            for o in self._observations(s)
+        ]
+        observations.sort(key=lambda o: o.recorded_at)
+        return observations
+
+    def to_bytes(self) -> bytes:
+        """Serialize the archive."""
+        series = list(self._series.values())
+        header = json.dumps(
+            {
+                "strings": self.strings.values,
+                "series": [
+                    [s.journey, s.line, s.destination, s.stop, len(s.recorded_at)]
+                    for s in series
+                ],
+            }
+        ).encode()
+        columns = array("q")
+        for name in ("recorded_at", "departure", "arrival"):
+            for s in series:
+                columns.extend(getattr(s, name).deltas)
+        return zlib.compress(_HEADER.pack(len(header)) + header + _to_bytes(columns))
+
+    @staticmethod
+    def from_bytes(data: bytes) -> "StopMonitoringArchive":
+        """Deserialize an archive."""
+        data = zlib.decompress(data)
+        (size,) = _HEADER.unpack_from(data)
+        header = json.loads(data[_HEADER.size : _HEADER.size + size])
+        columns = _from_bytes(data[_HEADER.size + size :])
+
+        archive = StopMonitoringArchive()
+        archive.strings = StringTable(header["strings"])
+        series = []
+        for journey, line, destination, stop, _ in header["series"]:
+            s = _Series(journey, line, destination, stop)
+            archive._series[(journey, stop)] = s
+            archive._by_stop.setdefault(stop, []).append(s)
+            archive._by_journey.setdefault(journey, []).append(s)
+            series.append(s)
+
+        position = 0
+        for name in ("recorded_at", "departure", "arrival"):
+            for s, (*_, count) in zip(series, header["series"]):
+                setattr(s, name, DeltaArray(columns[position : position + count]))
+                position += count
+        return archive
@@ -0,0 +1,93 @@
+"""Client-side load balancing over several API base URLs."""
+
+from dataclasses import dataclass
+from enum import Enum
+import time
+from typing import Callable, Collection, Sequence
+
+
+class BalancingStrategy(Enum):
+    """Describe the possible balancing strategies."""
+
+    ROUND_ROBIN = 0
+    LEAST_OUTSTANDING = 1
+
+
+@dataclass
+class Upstream:
+    """Base URL of the API, with its health and load."""
+
+    base_url: str
+    outstanding: int = 0
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    unhealthy_until: float = 0.0
+
+    def is_healthy(self, now: float) -> bool:
+        """Returns True if the upstream can receive requests."""
+        return now >= self.unhealthy_until
+
+
+class LoadBalancer:
+    """Spread requests across upstreams and fail over unhealthy ones.
+
+    An upstream is marked unhealthy after failure_threshold consecutive connection
+    failures (timeouts are not recorded as failures), and is retried after
+    retry_after seconds. When every upstream is unhealthy, the one that will recover
+    first is used."""
+
+    def __init__(
+        self,
+        base_urls: Sequence[str],
+        strategy: BalancingStrategy = BalancingStrategy.ROUND_ROBIN,
+        failure_threshold: int = 1,
+        retry_after: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize the object."""
+        if not base_urls:
+            raise ValueError("At least one base URL is required")
+        self.upstreams = [Upstream(url.rstrip("/")) for url in base_urls]
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.retry_after = retry_after
+        self._clock = clock
+        self._next = 0
+
+    def __len__(self) -> int:
+        return len(self.upstreams)
+
+    def pick(self, exclude: Collection[Upstream] = ()) -> Upstream:
+        """Returns the upstream for the next request."""
+        candidates = [u for u in self.upstreams if u not in exclude] or self.upstreams
+        now = self._clock()
+        healthy = [u for u in candidates if u.is_healthy(now)]
+        if not healthy:
+            return min(candidates, key=lambda u: u.unhealthy_until)
+
+        if self.strategy is BalancingStrategy.LEAST_OUTSTANDING:
+            return min(healthy, key=lambda u: (u.outstanding, u.requests))
+
+        # Round robin over the healthy candidates, in configuration order.
+        count = len(self.upstreams)
+        for offset in range(count):
+            upstream = self.upstreams[(self._next + offset) % count]
+            if upstream in healthy:
+                self._next = (self._next + offset + 1) % count
+                return upstream
+        return healthy[0]
+
+    def record_success(self, upstream: Upstream) -> None:
+        """Record a successful request to an upstream."""
+        upstream.requests += 1
+        upstream.consecutive_failures = 0
+        upstream.unhealthy_until = 0.0
+
+    def record_failure(self, upstream: Upstream) -> None:
+        """Record a connection failure of an upstream."""
+        upstream.requests += 1
+        upstream.failures += 1
+        upstream.consecutive_failures += 1
+        if upstream.consecutive_failures >= self.failure_threshold:
+            upstream.unhealthy_until = self._clock() + self.retry_after
@@ -0,0 +1,222 @@
+"""Response cache for the CTS API client."""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+import secrets
+import time
+from typing import Any, Callable, Generic, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """Caching behaviour of the client.
+
+    A cached response is fresh for max_age, or until the ValidUntil of the delivery
+    when the API provides one. Once fresh time is over, the response is still returned
+    for stale_while_revalidate while it is refreshed in the background, and for
+    stale_if_error when the API fails. With a shared cache backend, a client waits up
+    to lock_timeout seconds for another client refreshing the same request, and calls
+    to the backend taking longer than backend_timeout seconds are given up."""
+
+    max_age: timedelta = timedelta(seconds=30)
+    stale_while_revalidate: timedelta = timedelta(minutes=1)
+    stale_if_error: timedelta = timedelta(minutes=10)
+    use_valid_until: bool = True
+    max_entries: int = 10000
+    lock_timeout: float = 10.0
+    backend_timeout: float = 1.0
+
+
+def valid_until(value: Any) -> Optional[datetime]:
+    """Returns the earliest ValidUntil of the deliveries of a response, if any."""
+    deliveries: list[Any] = []
+    service_delivery = getattr(value, "service_delivery", None)
+    if service_delivery is not None:
+        deliveries.extend(service_delivery.stop_monitoring_delivery)
+        deliveries.extend(service_delivery.vehicle_monitoring_delivery)
+        deliveries.extend(service_delivery.estimated_timetable_delivery)
+    lines_delivery = getattr(value, "lines_delivery", None)
+    if lines_delivery is not None:
+        deliveries.append(lines_delivery)
+
+    dates = [d.valid_until for d in deliveries if d.valid_until is not None]
+    return min(dates) if dates else None
+
+
+def time_to_live(value: Any, policy: CachePolicy) -> float:
+    """Returns how long a response is fresh, in seconds."""
+    until = valid_until(value) if policy.use_valid_until else None
+    if until is None:
+        return policy.max_age.total_seconds()
+    return max((until - datetime.now(until.tzinfo)).total_seconds(), 0.0)
+
+
+def mark_stale(value: T) -> T:
+    """Returns a shallow copy of a response flagged as stale."""
+    if hasattr(value, "stale"):
+        return replace(value, stale=True)
+    return value
+
+
+@dataclass
+class CacheEntry(Generic[T]):
+    """Cached response."""
+
+    value: T
+    stored_at: float
+    fresh_until: float
+
+    def age(self, now: Optional[float] = None) -> float:
+        """Returns the age of the entry, in seconds."""
+        return (now if now is not None else time.monotonic()) - self.stored_at
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        """Returns True if the entry can be returned without revalidation."""
+        return (now if now is not None else time.monotonic()) < self.fresh_until
+
+
+class LruDict(Generic[K, V]):
+    """Mapping keeping the max_entries most recently used keys."""
+
+    def __init__(self, max_entries: int) -> None:
+        """Initialize the object."""
+        self.max_entries = max_entries
+        self._items: OrderedDict[K, V] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._items
+
+    def __setitem__(self, key: K, value: V) -> None:
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    def get(self, key: K) -> Optional[V]:
+        """Returns the value of a key, if any."""
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def pop(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        """Remove a key and return its value."""
+        return self._items.pop(key, default)
+
+
+class ResponseCache:
+    """In-memory LRU cache of parsed responses."""
+
+    def __init__(self, policy: CachePolicy) -> None:
+        """Initialize the object."""
+        self.policy = policy
+        self._entries: OrderedDict[Hashable, CacheEntry[Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[CacheEntry[Any]]:
+        """Returns the entry of a key, if any."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: Hashable, value: Any) -> CacheEntry[Any]:
+        """Store a response and compute its freshness from the policy."""
+        now = time.monotonic()
+        entry = CacheEntry(value, now, now + time_to_live(value, self.policy))
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.policy.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def can_revalidate(self, entry: CacheEntry[Any], now: float) -> bool:
+        """Returns True if a stale entry can be served while it is revalidated."""
+        return now < entry.fresh_until + self.policy.stale_while_revalidate.total_seconds()
+
+    def can_serve_on_error(self, entry: CacheEntry[Any], now: float) -> bool:
+        """Returns True if a stale entry can be served when the API fails."""
+        return now < entry.fresh_until + self.policy.stale_if_error.total_seconds()
+
+    def clear(self) -> None:
+        """Remove all the entries."""
+        self._entries.clear()
+
+
+class CacheBackendError(Exception):
+    """Exception raised when a cache backend fails."""
+
+
+class CacheBackend(ABC):
+    """Storage of serialized responses shared by several clients."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """Returns the value of a key, if any."""
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        """Store a value expiring after ttl seconds."""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Remove a key."""
+
+    @abstractmethod
+    async def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        """Try to acquire a lock expiring after ttl seconds.
+
+        Returns the token to release the lock, or None if it is already held."""
+
+    @abstractmethod
+    async def release_lock(self, key: str, token: str) -> None:
+        """Release a lock if it is still held with the given token."""
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Cache backend local to the process."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        """Initialize the object."""
+        self._clock = clock
+        self._values: dict[str, tuple[bytes, float]] = {}
+        self._locks: dict[str, tuple[str, float]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        item = self._values.get(key)
+        if item is None:
+            return None
+        if item[1] <= self._clock():
+            del self._values[key]
+            return None
+        return item[0]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._values[key] = (value, self._clock() + ttl)
+
+    async def delete(self, key: str) -> None:
+        self._values.pop(key, None)
+
+    async def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        lock = self._locks.get(key)
+        if lock is not None and lock[1] > self._clock():
+            return None
+        token = secrets.token_hex(8)
+        self._locks[key] = (token, self._clock() + ttl)
+        return token
+
+    async def release_lock(self, key: str, token: str) -> None:
+        lock = self._locks.get(key)
+        if lock is not None and lock[0] == token:
+            del self._locks[key]
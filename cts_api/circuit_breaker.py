@@ -0,0 +1,165 @@
+"""Circuit breaker to fail fast while the API is degraded."""
+
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+import time
+from typing import Callable, Optional
+
+from .exceptions import CircuitOpenError
+
+
+class CircuitState(Enum):
+    """Describe the possible circuit states."""
+
+    CLOSED = 0
+    OPEN = 1
+    HALF_OPEN = 2
+
+
+@dataclass(frozen=True)
+class CircuitBreakerPolicy:
+    """Circuit breaker behaviour of the client.
+
+    The circuit opens when, over the last window calls (and at least min_calls), the
+    rate of failed calls or the rate of calls slower than slow_call_duration seconds
+    reaches its threshold. After open_duration seconds, up to half_open_calls trial
+    calls are let through: the circuit closes if they all succeed and opens again
+    otherwise."""
+
+    failure_rate_threshold: float = 0.5
+    slow_call_rate_threshold: float = 0.8
+    slow_call_duration: float = 5.0
+    window: int = 50
+    min_calls: int = 10
+    open_duration: float = 30.0
+    half_open_calls: int = 3
+
+
+@dataclass(frozen=True)
+class CircuitBreakerStatus:
+    """Snapshot of a circuit breaker, for monitoring."""
+
+    name: str
+    state: CircuitState
+    calls: int
+    failure_rate: float
+    slow_call_rate: float
+    opened_count: int
+    retry_in: Optional[float]
+
+
+class CircuitBreaker:
+    """Circuit breaker of an endpoint."""
+
+    def __init__(
+        self,
+        name: str,
+        policy: CircuitBreakerPolicy,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize the object."""
+        self.name = name
+        self.policy = policy
+        self._clock = clock
+        self._state = CircuitState.CLOSED
+        # Outcome of the recent calls as (failed, slow) pairs.
+        self._calls: deque[tuple[bool, bool]] = deque(maxlen=policy.window)
+        self._opened_at = 0.0
+        self._opened_count = 0
+        self._trials = 0
+        self._trial_successes = 0
+
+    @property
+    def state(self) -> CircuitState:
+        """Returns the current state of the circuit."""
+        if (
+            self._state is CircuitState.OPEN
+            and self._clock() - self._opened_at >= self.policy.open_duration
+        ):
+            self._state = CircuitState.HALF_OPEN
+            self._trials = 0
+            self._trial_successes = 0
+        return self._state
+
+    def before_call(self) -> None:
+        """Check that a call is allowed, raising CircuitOpenError otherwise."""
+        state = self.state
+        if state is CircuitState.CLOSED:
+            return
+        if state is CircuitState.HALF_OPEN and self._trials < self.policy.half_open_calls:
+            self._trials += 1
+            return
+        raise CircuitOpenError(f"Circuit open for {self.name}")
+
+    def release(self) -> None:
+        """Release a call that completed without an outcome (e.g. cancelled)."""
+        if self._state is CircuitState.HALF_OPEN and self._trials > 0:
+            self._trials -= 1
+
+    def record_success(self, duration: float) -> None:
+        """Record a successful call."""
+        self._record(False, duration)
+
+    def record_failure(self, duration: float) -> None:
+        """Record a failed call."""
+        self._record(True, duration)
+
+    def _record(self, failed: bool, duration: float) -> None:
+        """Record the outcome of a call and update the state."""
+        slow = duration >= self.policy.slow_call_duration
+        state = self.state
+        if state is CircuitState.HALF_OPEN:
+            if failed or slow:
+                self._open()
+                return
+            self._trial_successes += 1
+            if self._trial_successes >= self.policy.half_open_calls:
+                self._state = CircuitState.CLOSED
+                self._calls.clear()
+            return
+        if state is CircuitState.OPEN:
+            return
+
+        self._calls.append((failed, slow))
+        if len(self._calls) < self.policy.min_calls:
+            return
+        failure_rate, slow_call_rate = self._rates()
+        if (
+            failure_rate >= self.policy.failure_rate_threshold
+            or slow_call_rate >= self.policy.slow_call_rate_threshold
+        ):
+            self._open()
+
+    def _open(self) -> None:
+        """Open the circuit."""
+        self._state = CircuitState.OPEN
+        self._opened_at = self._clock()
+        self._opened_count += 1
+        self._calls.clear()
+
+    def _rates(self) -> tuple[float, float]:
+        """Returns the failure rate and the slow call rate over the window."""
+        if not self._calls:
+            return 0.0, 0.0
+        failures = sum(1 for failed, _ in self._calls if failed)
+        slow = sum(1 for _, is_slow in self._calls if is_slow)
+        return failures / len(self._calls), slow / len(self._calls)
+
+    def status(self) -> CircuitBreakerStatus:
+        """Returns a snapshot of the circuit breaker."""
+        state = self.state
+        failure_rate, slow_call_rate = self._rates()
+        return CircuitBreakerStatus(
+            name=self.name,
+            state=state,
+            calls=len(self._calls),
+            failure_rate=failure_rate,
+            slow_call_rate=slow_call_rate,
+            opened_count=self._opened_count,
+            retry_in=(
+                max(0.0, self._opened_at + self.policy.open_duration - self._clock())
+                if state is CircuitState.OPEN
+                else None
+            ),
+        )
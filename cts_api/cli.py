@@ -0,0 +1,195 @@
+"""Command line interface writing the responses of the CTS API as NDJSON.
+
+Stop codes are read from the arguments, or one per line from a file or stdin. They
+are fetched concurrently over one session within a rate limit, and each response is
+written as a JSON line as soon as it completes, e.g.:
+
+    cts-api stop-monitoring --maximum-stop-visits 2 < stops.txt | jq .
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import Any, Awaitable, Callable, Optional, TextIO
+
+from .const import BASE_URL
+
+# Label of a request (added to its JSON line) and the call making it.
+Call = tuple[dict[str, str], Callable[[], Awaitable[Any]]]
+
+
+def read_codes(values: list[str], path: Optional[str]) -> list[str]:
+    """Returns the codes given as arguments, or read one per line from a file.
+
+    path "-" reads stdin. Blank lines and lines starting with # are skipped."""
+    if values or path is None:
+        return values
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, encoding="utf-8") as file:
+            lines = file.read().splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.startswith("#")]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Returns the parser of the command line."""
+    parser = argparse.ArgumentParser(
+        prog="cts-api", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument(
+        "--token",
+        default=os.environ.get("CTS_API_TOKEN"),
+        help="API token, CTS_API_TOKEN by default",
+    )
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument(
+        "--rate", type=float, default=10.0, help="requests per second (default: 10)"
+    )
+    parser.add_argument("--burst", type=float, default=1.0)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=10,
+        help="requests in flight (default: 10)",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("general-messages", help="traffic and service messages")
+    commands.add_parser("lines-discovery", help="all the lines")
+
+    stoppoints = commands.add_parser(
+        "stoppoints-discovery",
+        help="stop points around a location, or of stop codes",
+    )
+    stoppoints.add_argument("stop_codes", nargs="*", metavar="STOP_CODE")
+    stoppoints.add_argument("--input", help="file of stop codes, - for stdin")
+    stoppoints.add_argument("--latitude", type=float)
+    stoppoints.add_argument("--longitude", type=float)
+    stoppoints.add_argument("--distance", type=int)
+    stoppoints.add_argument("--include-lines-destinations", action="store_true")
+
+    monitoring = commands.add_parser("stop-monitoring", help="next departures at stops")
+    monitoring.add_argument("stop_codes", nargs="*", metavar="STOP_CODE")
+    monitoring.add_argument(
+        "--input", default="-", help="file of stop codes, stdin by default"
+    )
+    monitoring.add_argument("--line-ref")
+    monitoring.add_argument("--direction-ref")
+    monitoring.add_argument("--maximum-stop-visits", type=int, default=3)
+    monitoring.add_argument("--minimum-stop-visits-per-line", type=int, default=3)
+    monitoring.add_argument("--include-general-message", action="store_true")
+    return parser
+
+
+def calls(api: Any, args: argparse.Namespace) -> list[Call]:
+    """Returns the calls to make for the command line."""
+    if args.command == "general-messages":
+        return [({}, api.general_messages)]
+    if args.command == "lines-discovery":
+        return [({}, api.lines_discovery)]
+
+    codes = read_codes(args.stop_codes, args.input)
+    if args.command == "stoppoints-discovery":
+        if not codes:
+            return [
+                (
+                    {},
+                    lambda: api.stoppoints_discovery(
+                        latitude=args.latitude,
+                        longitude=args.longitude,
+                        distance=args.distance,
+                        include_lines_destinations=args.include_lines_destinations
+                        or None,
+                    ),
+                )
+            ]
+        return [
+            (
+                {"stop_code": code},
+                lambda code=code: api.stoppoints_discovery(
+                    stop_code=code,
+                    include_lines_destinations=args.include_lines_destinations
+                    or None,
+                ),
+            )
+            for code in codes
+        ]
+
+    return [
+        (
+            {"monitoring_ref": code},
+            lambda code=code: api.stop_monitoring(
+                code,
+                line_ref=args.line_ref,
+                direction_ref=args.direction_ref,
+                maximum_stop_visits=args.maximum_stop_visits,
+                minimum_stop_visits_per_line=args.minimum_stop_visits_per_line,
+                include_general_message=args.include_general_message or None,
+            ),
+        )
+        for code in codes
+    ]
+
+
+async def run(args: argparse.Namespace, output: TextIO) -> int:
+    """Make the calls of the command line, writing each response as it completes.
+
+    Returns the exit status: 1 if a call failed, 0 otherwise."""
+    # Imported here so that --help does not pay for aiohttp.
+    from aiohttp import ClientSession, TCPConnector
+
+    from .client import CtsApi
+    from .exceptions import CtsError
+    from .priority import PriorityScheduler
+    from .utils import to_jsonable
+
+    async def fetch(call: Call) -> tuple[dict[str, str], Any, Optional[CtsError]]:
+        label, request = call
+        try:
+            return label, await request(), None
+        except CtsError as err:
+            return label, None, err
+
+    status = 0
+    async with ClientSession(connector=TCPConnector(limit=args.concurrency)) as session:
+        api = CtsApi(
+            args.token,
+            session,
+            base_url=args.base_url,
+            scheduler=PriorityScheduler(
+                args.concurrency, rate=args.rate, burst=args.burst
+            ),
+        )
+        for future in asyncio.as_completed([fetch(call) for call in calls(api, args)]):
+            label, response, error = await future
+            if error is not None:
+                status = 1
+                name = " ".join(label.values()) or args.command
+                print(f"cts-api: {name}: {error}", file=sys.stderr)
+                continue
+            output.write(json.dumps({**label, **to_jsonable(response)}) + "\n")
+            output.flush()
+    return status
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Run the command line."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.token:
+        parser.error("an API token is required (--token or CTS_API_TOKEN)")
+    try:
+        return asyncio.run(run(args, sys.stdout))
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # The reader of the output went away, e.g. head.
+        sys.stderr.close()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,109 +1,764 @@
 """Class to communicate with the Diagral e-one API."""
 
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+import hashlib
+from http import HTTPStatus
+import json
 import logging
-import ssl
-from typing import Any, Optional
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Mapping,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+)
+import zlib
 
-from aiohttp import ClientConnectorError, ClientResponseError, ClientSession
+from aiohttp import ClientConnectionError, ClientResponseError, ClientSession, hdrs
 import aiohttp
+from yarl import URL
 
-from cts_api.requests import VehicleMode
-from cts_api.utils import timedelta_isoformat
+from cts_api.requests import (
+    PreparedRequest,
+    VehicleMode,
+    prepare_estimated_timetable,
+    prepare_general_messages,
+    prepare_lines_discovery,
+    prepare_stop_monitoring,
+    prepare_stoppoints_discovery,
+    prepare_vehicle_monitoring,
+)
 
 from .responses import (
     ErrorResponse,
+    EstimatedTimetableResponse,
     GeneralMessageResponse,
+    InfoMessage,
     LinesDiscoveryResponse,
+    MonitoredStopVisit,
     StopMonitoringResponse,
     StopPointsDiscoveryResponse,
+    VehicleMonitoringResponse,
 )
 
 from .const import (
+    BASE_URL,
     HTTP_CALL_TIMEOUT,
+    RESOURCE_ESTIMATED_TIMETABLE,
     RESOURCE_GENERAL_MESSAGE,
     RESOURCE_LINES_DISCOVERY,
     RESOURCE_STOP_MONITORING,
     RESOURCE_STOPPOINTS_DISCOVERY,
+    RESOURCE_VEHICLE_MONITORING,
 )
 from .exceptions import (
     ApiConnectionError,
+    ApiTimeoutError,
     BadRequestError,
     CtsError,
     InvalidTokenError,
     TechnicalError,
     TooManyRequestsError,
 )
+from .metrics import FingerprintMetrics, HedgingMetrics, TransferMetrics
+
+# The optional features are imported when they are used, so that importing the
+# client does not pay for them.
+# pylint: disable=import-outside-toplevel
+if TYPE_CHECKING:
+    from .balancer import BalancingStrategy, Upstream
+    from .cache import CacheBackend, CachePolicy, LruDict, ResponseCache
+    from .circuit_breaker import (
+        CircuitBreaker,
+        CircuitBreakerPolicy,
+        CircuitBreakerStatus,
+    )
+    from .hedging import HedgingPolicy, LatencyTracker
+    from .priority import PriorityScheduler
+
+try:
+    import brotli  # noqa: F401 pylint: disable=unused-import
+
+    HAS_BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401 pylint: disable=unused-import
+
+        HAS_BROTLI = True
+    except ImportError:
+        HAS_BROTLI = False
 
 _LOGGER = logging.getLogger(__name__)
 
+# Seconds between two checks of the shared cache while another client refreshes.
+SHARED_LOCK_POLL_INTERVAL = 0.05
+
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=HTTP_CALL_TIMEOUT)
+
+ACCEPT_ENCODING = "gzip, deflate, br" if HAS_BROTLI else "gzip, deflate"
+
+# Errors caused by the request itself rather than by the state of the API.
+CLIENT_ERRORS = (BadRequestError, InvalidTokenError)
+
+T = TypeVar("T")
+
+RESPONSE_PARSERS: dict[str, Callable[[Any], Any]] = {
+    RESOURCE_GENERAL_MESSAGE: GeneralMessageResponse.from_dict,
+    RESOURCE_LINES_DISCOVERY: LinesDiscoveryResponse.from_dict,
+    RESOURCE_STOPPOINTS_DISCOVERY: StopPointsDiscoveryResponse.from_dict,
+    RESOURCE_STOP_MONITORING: StopMonitoringResponse.from_dict,
+    RESOURCE_VEHICLE_MONITORING: VehicleMonitoringResponse.from_dict,
+    RESOURCE_ESTIMATED_TIMETABLE: EstimatedTimetableResponse.from_dict,
+}
+
+# Elements yielded by CtsApi.stream(), per resource.
+STREAMED_ELEMENTS: dict[str, tuple[str, Callable[[Any], Any]]] = {
+    RESOURCE_STOP_MONITORING: ("MonitoredStopVisit", MonitoredStopVisit.from_dict),
+    RESOURCE_VEHICLE_MONITORING: ("VehicleActivity", MonitoredStopVisit.from_dict),
+    RESOURCE_GENERAL_MESSAGE: ("InfoMessage", InfoMessage.from_dict),
+}
+
+STREAM_CHUNK_SIZE = 16384
+
+# Set once the request of a prefetch holds a request slot.
+_SLOT_ACQUIRED: ContextVar[Optional[asyncio.Event]] = ContextVar(
+    "cts_api_slot_acquired", default=None
+)
+
+
+@asynccontextmanager
+async def _unscheduled() -> AsyncIterator[None]:
+    """Request slot of a client without scheduler."""
+    yield
+
+
+@dataclass
+class RawResponse:
+    """Raw HTTP response of the API."""
+
+    status: int
+    headers: Mapping[str, str]
+    body: bytes
+
+    def json(self) -> Any:
+        """Decode the JSON body."""
+        return json.loads(self.body)
+
+
+@dataclass
+class _ConditionalEntry:
+    """Validators and parsed value of a previous response."""
+
+    etag: Optional[str]
+    last_modified: Optional[str]
+    value: Any
+    size: int
+    body: Optional[bytes] = None
+
+    def headers(self) -> dict[str, str]:
+        """Returns the headers of a conditional request."""
+        headers = {}
+        if self.etag is not None:
+            headers[hdrs.IF_NONE_MATCH] = self.etag
+        if self.last_modified is not None:
+            headers[hdrs.IF_MODIFIED_SINCE] = self.last_modified
+        return headers
+
 
 class CtsApi:
     """CTS API class."""
 
-    def __init__(self, token: str, session: Optional[ClientSession]) -> None:
-        """Initialize the object."""
+    def __init__(
+        self,
+        token: str,
+        session: Optional[ClientSession],
+        conditional_requests: bool = True,
+        cache_policy: Optional["CachePolicy"] = None,
+        cache_backend: Optional["CacheBackend"] = None,
+        timeouts: Optional[Mapping[str, aiohttp.ClientTimeout]] = None,
+        default_timeout: aiohttp.ClientTimeout = DEFAULT_TIMEOUT,
+        hedging_policy: Optional["HedgingPolicy"] = None,
+        circuit_breaker_policy: Optional["CircuitBreakerPolicy"] = None,
+        base_url: Union[str, Sequence[str]] = BASE_URL,
+        balancing_strategy: Optional["BalancingStrategy"] = None,
+        upstream_failure_threshold: int = 1,
+        upstream_retry_after: float = 30.0,
+        fingerprint_bodies: bool = True,
+        scheduler: Optional["PriorityScheduler"] = None,
+        prefetch_stops: int = 0,
+    ) -> None:
+        """Initialize the object.
+
+        timeouts maps resources (RESOURCE_* constants) to their timeout, other
+        resources use default_timeout. cache_backend shares the responses between
+        the clients using the same backend. base_url may be a list of base URLs, across
+        which requests are balanced with balancing_strategy, round robin by default,
+        failing over on connection errors (but not on timeouts). An upstream is
+        skipped for upstream_retry_after seconds after upstream_failure_threshold
+        consecutive connection errors. When fingerprint_bodies is enabled, a body
+        identical to the previous one of the same request returns the previously
+        parsed object without decoding it. scheduler queues the requests in priority
+        lanes (see cts_api.priority). When prefetch_stops is set, a stop points
+        discovery around a location fetches the monitoring of that many of the nearest
+        stops in the background, at background priority, so that the usual follow-up
+        call is served from the cache.
+
+        Validators and fingerprints are kept for the cache_policy.max_entries most
+        recent requests. Responses served from the caches, 304 responses and unchanged
+        bodies are the same objects for all the callers: they must not be modified."""
+        if prefetch_stops and cache_policy is None and cache_backend is None:
+            raise ValueError("Prefetching requires a cache policy or a cache backend")
+        from .balancer import BalancingStrategy, LoadBalancer
+        from .cache import CachePolicy, LruDict, ResponseCache
+
         self.session: Optional[ClientSession] = session
         self.token = token
+        self.balancer = LoadBalancer(
+            [base_url] if isinstance(base_url, str) else base_url,
+            balancing_strategy or BalancingStrategy.ROUND_ROBIN,
+            upstream_failure_threshold,
+            upstream_retry_after,
+        )
+        self.conditional_requests = conditional_requests
+        self.transfer_metrics = TransferMetrics()
+        self.cache_policy = cache_policy or CachePolicy()
+        self._conditional_entries: "LruDict[PreparedRequest, _ConditionalEntry]" = (
+            LruDict(self.cache_policy.max_entries)
+        )
+        self._cache = ResponseCache(cache_policy) if cache_policy is not None else None
+        self.cache_backend = cache_backend
+        self._revalidations: dict[PreparedRequest, asyncio.Task] = {}
+        self.timeouts: dict[str, aiohttp.ClientTimeout] = dict(timeouts or {})
+        self.default_timeout = default_timeout
+        self.hedging_policy = hedging_policy
+        self.hedging_metrics = HedgingMetrics()
+        self._latencies: dict[str, "LatencyTracker"] = {}
+        self.circuit_breaker_policy = circuit_breaker_policy
+        self.circuit_breakers: dict[str, "CircuitBreaker"] = {}
+        self.fingerprint_bodies = fingerprint_bodies
+        self.fingerprint_metrics = FingerprintMetrics()
+        self._fingerprints: "LruDict[PreparedRequest, tuple[bytes, Any]]" = LruDict(
+            self.cache_policy.max_entries
+        )
+        self.scheduler = scheduler
+        self.prefetch_stops = prefetch_stops
+        self._prefetches: dict[PreparedRequest, tuple[asyncio.Task, asyncio.Event]] = {}
+
+    def circuit_status(self) -> dict[str, "CircuitBreakerStatus"]:
+        """Returns the status of the circuit breaker of each endpoint."""
+        return {url: cb.status() for url, cb in self.circuit_breakers.items()}
+
+    @property
+    def cache(self) -> Optional["ResponseCache"]:
+        """Returns the response cache, if caching is enabled."""
+        return self._cache
+
+    @property
+    def base_url(self) -> str:
+        """Returns the first base URL."""
+        return self.balancer.upstreams[0].base_url
 
     async def api_request(self, method: str, url: str, data: Optional[Any] = None):
-        """Make an API request."""
+        """Make an API request.
+
+        url is either a resource (RESOURCE_* constant) or an absolute URL."""
+        response = await self._request(method, PreparedRequest.from_params(url, data))
+        return response.json()
+
+    async def stream(self, request: PreparedRequest) -> AsyncIterator[Any]:
+        """Send a prepared request and yield the elements of its response.
+
+        The elements are the visits of stop and vehicle monitoring and the messages
+        of general messages. The body is decoded incrementally, so the first elements are available
+        before it is complete and the memory used does not grow with its size.
+        Streamed requests bypass the caches, hedging and the circuit breakers."""
+        from .streaming import iter_elements
+
+        key, parser = STREAMED_ELEMENTS[request.resource]
+        upstream = self.balancer.pick()
+        upstream.outstanding += 1
+        try:
+            async with self._open("get", request, upstream.base_url) as response:
+                chunks = response.content.iter_chunked(STREAM_CHUNK_SIZE)
+                async for _, element in iter_elements(chunks, [key]):
+                    yield parser(element)
+        except ApiTimeoutError:
+            raise
+        except ApiConnectionError:
+            self.balancer.record_failure(upstream)
+            raise
+        finally:
+            upstream.outstanding -= 1
+        self.balancer.record_success(upstream)
+
+    async def execute(self, request: PreparedRequest) -> Any:
+        """Send a prepared request and return its parsed response.
+
+        Prepared requests (see the prepare_* functions of cts_api.requests) can be
+        reused across polls, saving the encoding of their parameters."""
+        return await self._get(request, RESPONSE_PARSERS[request.resource])
+
+    async def _request(
+        self,
+        method: str,
+        request: PreparedRequest,
+        headers: Optional[dict[str, str]] = None,
+    ) -> RawResponse:
+        """Send a request through the circuit breaker of the endpoint."""
+        url = request.resource
+        if self.circuit_breaker_policy is None:
+            return await self._send_hedged(method, request, headers)
+
+        breaker = self.circuit_breakers.get(url)
+        if breaker is None:
+            from .circuit_breaker import CircuitBreaker
+
+            breaker = self.circuit_breakers[url] = CircuitBreaker(
+                url, self.circuit_breaker_policy
+            )
+        breaker.before_call()
+        start = time.monotonic()
+        try:
+            response = await self._send_hedged(method, request, headers)
+        except CLIENT_ERRORS:
+            breaker.record_success(time.monotonic() - start)
+            raise
+        except CtsError:
+            breaker.record_failure(time.monotonic() - start)
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record_success(time.monotonic() - start)
+        return response
+
+    async def _send_hedged(
+        self,
+        method: str,
+        request: PreparedRequest,
+        headers: Optional[dict[str, str]] = None,
+    ) -> RawResponse:
+        """Send a request, hedging it if the hedging policy applies."""
+        url = request.resource
+        policy = self.hedging_policy
+        if policy is None or not policy.applies_to(url):
+            return await self._send(method, request, headers)
+
+        from .hedging import LatencyTracker, hedge
+
+        tracker = self._latencies.get(url)
+        if tracker is None:
+            tracker = self._latencies[url] = LatencyTracker(policy.window)
+        return await hedge(
+            lambda: self._send(method, request, headers),
+            tracker.hedge_delay(policy),
+            tracker,
+            self.hedging_metrics,
+        )
+
+    async def _send(
+        self,
+        method: str,
+        request: PreparedRequest,
+        headers: Optional[dict[str, str]] = None,
+    ) -> RawResponse:
+        """Send a request to one of the upstreams, failing over to the others
+        on connection errors."""
+        if request.resource.startswith(("http://", "https://")):
+            return await self._send_to(method, request, "", headers)
+
+        tried: list["Upstream"] = []
+        while True:
+            upstream = self.balancer.pick(exclude=tried)
+            tried.append(upstream)
+            upstream.outstanding += 1
+            try:
+                response = await self._send_to(
+                    method, request, upstream.base_url, headers
+                )
+            except ApiTimeoutError:
+                # A slow response says little about the health of the upstream, and
+                # failing over would multiply the latency by the number of upstreams.
+                raise
+            except ApiConnectionError as err:
+                self.balancer.record_failure(upstream)
+                if len(tried) >= len(self.balancer):
+                    raise
+                _LOGGER.warning("%s failed, failing over: %s", upstream.base_url, err)
+                continue
+            finally:
+                upstream.outstanding -= 1
+            self.balancer.record_success(upstream)
+            return response
+
+    @asynccontextmanager
+    async def _open(
+        self,
+        method: str,
+        request: PreparedRequest,
+        base_url: str,
+        headers: Optional[dict[str, str]] = None,
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """Send a request and yield the successful response, mapping the errors."""
         if self.session is None:
             session = ClientSession()
         else:
             session = self.session
 
+        absolute_url = base_url + request.resource
+        if request.query_string:
+            absolute_url += "?" + request.query_string
         basic_auth = aiohttp.BasicAuth(self.token, "")
         error_response = ErrorResponse(None)
-        response_json = None
-
-        params = {}
-        if data:
-            for k, v in data.items():
-                if v is not None:
-                    if isinstance(v, bool):
-                        params[k] = str(v).lower()
-                    else:
-                        params[k] = v
+
+        slot = self.scheduler.slot() if self.scheduler is not None else _unscheduled()
+        async with slot:
+            slot_acquired = _SLOT_ACQUIRED.get()
+            if slot_acquired is not None:
+                slot_acquired.set()
+            try:
+                async with session.request(
+                    method,
+                    URL(absolute_url, encoded=True),
+                    auth=basic_auth,
+                    headers={hdrs.ACCEPT_ENCODING: ACCEPT_ENCODING, **(headers or {})},
+                    raise_for_status=False,
+                    timeout=self.timeouts.get(request.resource, self.default_timeout),
+                ) as response:
+                    if not response.ok:
+                        error_response = (
+                            ErrorResponse.from_dict(await response.json())
+                            if response.content_type == "application/json"
+                            else error_response
+                        )
+                        response.raise_for_status()
+                    yield response
+            except ClientConnectionError as err:
+                raise ApiConnectionError(err) from err
+            except asyncio.TimeoutError as err:
+                raise ApiTimeoutError(f"Timeout while requesting {absolute_url}") from err
+            except ClientResponseError as err:
+                if err.status == 400:  # Bad request
+                    raise BadRequestError(error_response.message or err) from err
+                if err.status == 401:  # Unauthorized
+                    raise InvalidTokenError(error_response.message or err) from err
+                if err.status == 429:  # Too many requests
+                    raise TooManyRequestsError(error_response.message or err) from err
+                if err.status == 500:  # Technical error
+                    raise TechnicalError(error_response.message or err) from err
+                # Generic exception
+                raise CtsError(error_response.message or err) from err
+            finally:
+                if self.session is None:
+                    await session.close()
+
+    async def _send_to(
+        self,
+        method: str,
+        request: PreparedRequest,
+        base_url: str,
+        headers: Optional[dict[str, str]] = None,
+    ) -> RawResponse:
+        """Send a request and return the raw response."""
+        async with self._open(method, request, base_url, headers) as response:
+            body = (
+                await response.read()
+                if response.status != HTTPStatus.NOT_MODIFIED
+                else b""
+            )
+            raw_response = RawResponse(response.status, response.headers, body)
+            self._count_transfer(raw_response, response.content_length)
+        return raw_response
+
+    def _count_transfer(
+        self, response: RawResponse, content_length: Optional[int]
+    ) -> None:
+        """Update the transfer metrics with a response."""
+        metrics = self.transfer_metrics
+        metrics.requests += 1
+        decoded = len(response.body)
+        metrics.bytes_decoded += decoded
+        if response.headers.get(hdrs.CONTENT_ENCODING) and content_length is not None:
+            metrics.compressed_responses += 1
+            metrics.bytes_received += content_length
         else:
-            params = None
+            metrics.bytes_received += decoded
+
+    async def _get(self, request: PreparedRequest, parser: Callable[[Any], T]) -> T:
+        """Make a GET request and parse the response, going through the cache."""
+        prefetch = self._prefetches.get(request)
+        if prefetch is not None:
+            from .priority import Priority, current_priority
+
+            task, slot_acquired = prefetch
+            if slot_acquired.is_set() or current_priority() is Priority.BACKGROUND:
+                value = await asyncio.shield(task)
+                if value is not None:
+                    return value
+            else:
+                # The prefetch waits in the background lane: fetching in the lane of
+                # the call instead of joining it avoids a priority inversion.
+                del self._prefetches[request]
+                task.cancel()
+
+        if self._cache is None:
+            return await self._fetch_shared(request, parser)
+
+        now = time.monotonic()
+        cached = self._cache.get(request)
+        if cached is not None:
+            if cached.is_fresh(now):
+                return cached.value
+            if self._cache.can_revalidate(cached, now):
+                from .cache import mark_stale
+
+                self._revalidate(request, parser)
+                return mark_stale(cached.value)
 
         try:
-            async with session.request(
-                method,
-                url,
-                auth=basic_auth,
-                params=params,
-                raise_for_status=False,
-                timeout=HTTP_CALL_TIMEOUT,
-            ) as response:
-                if response.ok:
-                    response_json = await response.json()
-                else:
-                    error_response = (
-                        ErrorResponse.from_dict(await response.json())
-                        if response.content_type == "application/json"
-                        else error_response
+            return await self._fetch_shared(request, parser)
+        except CLIENT_ERRORS:
+            raise
+        except CtsError as err:
+            if cached is not None and self._cache.can_serve_on_error(cached, now):
+                from .cache import mark_stale
+
+                _LOGGER.warning(
+                    "GET '%s' failed, serving stale response: %s", request.resource, err
+                )
+                return mark_stale(cached.value)
+            raise
+
+    def _revalidate(
+        self,
+        request: PreparedRequest,
+        parser: Callable[[Any], Any],
+    ) -> None:
+        """Refresh a cached response in the background."""
+        if request in self._revalidations:
+            return
+
+        async def revalidate() -> None:
+            try:
+                await self._fetch_shared(request, parser)
+            except CtsError as err:
+                _LOGGER.warning(
+                    "Background refresh of '%s' failed: %s", request.resource, err
+                )
+            finally:
+                del self._revalidations[request]
+
+        self._revalidations[request] = asyncio.create_task(revalidate())
+
+    def _prefetch(self, response: StopPointsDiscoveryResponse) -> None:
+        """Fetch the monitoring of the nearest stops of a discovery in the background."""
+        from .priority import Priority, priority
+
+        codes: list[str] = []
+        for stop_point in sorted(
+            response.stop_points_delivery.annotated_stop_point_ref,
+            key=lambda stop_point: stop_point.extension.distance,
+        ):
+            code = stop_point.extension.stop_code or stop_point.stop_point_ref
+            if code and code not in codes:
+                codes.append(code)
+
+        now = time.monotonic()
+        for code in codes[: self.prefetch_stops]:
+            request = prepare_stop_monitoring(code)
+            cached = self._cache.get(request) if self._cache is not None else None
+            if request in self._prefetches or (
+                cached is not None and cached.is_fresh(now)
+            ):
+                continue
+
+            slot_acquired = asyncio.Event()
+
+            async def prefetch(
+                request: PreparedRequest = request,
+                slot_acquired: asyncio.Event = slot_acquired,
+            ) -> Optional[StopMonitoringResponse]:
+                _SLOT_ACQUIRED.set(slot_acquired)
+                try:
+                    return await self._fetch_shared(
+                        request, StopMonitoringResponse.from_dict
                     )
-                    response.raise_for_status()
-        except ClientConnectorError as err:
-            raise ApiConnectionError(err) from err
-        except ClientResponseError as err:
-            if err.status == 400:  # Bad request
-                raise BadRequestError(error_response.message or err) from err
-            if err.status == 401:  # Unauthorized
-                raise InvalidTokenError(error_response.message or err) from err
-            if err.status == 429:  # Too many requests
-                raise TooManyRequestsError(error_response.message or err) from err
-            if err.status == 500:  # Technical error
-                raise TechnicalError(error_response.message or err) from err
-            # Generic exception
-            raise CtsError(error_response.message or err) from err
+                except CtsError as err:
+                    _LOGGER.debug("Prefetch of '%s' failed: %s", request.key, err)
+                    return None
+                finally:
+                    current = self._prefetches.get(request)
+                    if current is not None and current[0] is asyncio.current_task():
+                        del self._prefetches[request]
+
+            with priority(Priority.BACKGROUND):
+                task = asyncio.create_task(prefetch())
+            self._prefetches[request] = (task, slot_acquired)
+
+    async def _fetch_shared(
+        self,
+        request: PreparedRequest,
+        parser: Callable[[Any], T],
+    ) -> T:
+        """Make a GET request through the shared cache backend, if any.
+
+        A response stored by another client is reused. Otherwise, only the client
+        holding the lock of the request calls the API, the others wait for the
+        response it stores. When the backend fails, the API is called directly."""
+        from .cache import CacheBackendError
+
+        backend = self.cache_backend
+        if backend is None:
+            return await self._fetch(request, parser)
+
+        name = request.key
+        try:
+            data = await self._backend_call(backend.get(name))
+            if data is not None:
+                return self._load_shared(request, data, parser)
+
+            token = await self._backend_call(
+                backend.acquire_lock(name, self.cache_policy.lock_timeout)
+            )
+            deadline = time.monotonic() + self.cache_policy.lock_timeout
+            while token is None and time.monotonic() < deadline:
+                await asyncio.sleep(SHARED_LOCK_POLL_INTERVAL)
+                data = await self._backend_call(backend.get(name))
+                if data is not None:
+                    return self._load_shared(request, data, parser)
+                # The holder released the lock without storing a response, e.g. the
+                # API failed: take over instead of waiting for the lock to expire.
+                token = await self._backend_call(
+                    backend.acquire_lock(name, self.cache_policy.lock_timeout)
+                )
+        except CacheBackendError as err:
+            _LOGGER.warning("Shared cache backend unavailable: %s", err)
+            return await self._fetch(request, parser)
+        if token is None:
+            return await self._fetch(request, parser)
+
+        try:
+            return await self._fetch(request, parser)
         finally:
-            if self.session is None:
-                await session.close()
+            try:
+                await self._backend_call(backend.release_lock(name, token))
+            except CacheBackendError as err:
+                _LOGGER.warning("Shared cache backend unavailable: %s", err)
+
+    def _load_shared(
+        self, request: PreparedRequest, data: bytes, parser: Callable[[Any], T]
+    ) -> T:
+        """Parse a response stored in the shared cache backend."""
+        value = parser(json.loads(zlib.decompress(data)))
+        if self._cache is not None:
+            self._cache.set(request, value)
+        return value
+
+    async def _backend_call(self, call: Awaitable[T]) -> T:
+        """Run a call to the shared cache backend.
+
+        Raises CacheBackendError when the backend fails or does not answer in time."""
+        from .cache import CacheBackendError
+
+        try:
+            return await asyncio.wait_for(call, self.cache_policy.backend_timeout)
+        except CacheBackendError:
+            raise
+        except (OSError, EOFError, asyncio.TimeoutError) as err:
+            raise CacheBackendError(str(err) or type(err).__name__) from err
+
+    async def _store(
+        self, request: PreparedRequest, value: Any, body: Optional[bytes]
+    ) -> None:
+        """Store a fresh response in the caches."""
+        if self._cache is not None:
+            self._cache.set(request, value)
+        if self.cache_backend is not None and body is not None:
+            from .cache import CacheBackendError, time_to_live
 
-        return response_json
+            try:
+                await self._backend_call(
+                    self.cache_backend.set(
+                        request.key,
+                        zlib.compress(body),
+                        time_to_live(value, self.cache_policy),
+                    )
+                )
+            except CacheBackendError as err:
+                _LOGGER.warning("Shared cache backend unavailable: %s", err)
+
+    async def _fetch(
+        self,
+        request: PreparedRequest,
+        parser: Callable[[Any], T],
+    ) -> T:
+        """Make a GET request and parse the response.
+
+        When the API sent validators for a previous identical request, the request is
+        made conditional and a 304 response returns the previously parsed object."""
+        entry = (
+            self._conditional_entries.get(request) if self.conditional_requests else None
+        )
+
+        response = await self._request(
+            "get", request, entry.headers() if entry is not None else None
+        )
+
+        if response.status == HTTPStatus.NOT_MODIFIED and entry is not None:
+            _LOGGER.debug("GET '%s' not modified", request.resource)
+            self.transfer_metrics.not_modified += 1
+            self.transfer_metrics.bytes_saved_not_modified += entry.size
+            await self._store(request, entry.value, entry.body)
+            return entry.value
+
+        value = self._parse(request, response, parser)
+
+        etag = response.headers.get(hdrs.ETAG)
+        last_modified = response.headers.get(hdrs.LAST_MODIFIED)
+        if self.conditional_requests and (etag or last_modified):
+            self._conditional_entries[request] = _ConditionalEntry(
+                etag,
+                last_modified,
+                value,
+                len(response.body),
+                response.body if self.cache_backend is not None else None,
+            )
+        else:
+            self._conditional_entries.pop(request, None)
+        await self._store(request, value, response.body)
+
+        return value
+
+    def _parse(
+        self, request: PreparedRequest, response: RawResponse, parser: Callable[[Any], T]
+    ) -> T:
+        """Parse a response, reusing the previous object if the body is unchanged."""
+        fingerprint = None
+        if self.fingerprint_bodies:
+            fingerprint = hashlib.blake2b(response.body, digest_size=16).digest()
+            self.fingerprint_metrics.lookups += 1
+            previous = self._fingerprints.get(request)
+            if previous is not None and previous[0] == fingerprint:
+                _LOGGER.debug("GET '%s' unchanged", request.resource)
+                self.fingerprint_metrics.hits += 1
+                return previous[1]
+
+        response_json = response.json()
+        _LOGGER.debug("GET '%s' response: %s", request.resource, response_json)
+        value = parser(response_json)
+        if fingerprint is not None:
+            self._fingerprints[request] = (fingerprint, value)
+        return value
 
     async def general_messages(
         self,
@@ -114,19 +769,15 @@ class CtsApi:
         impacted_line_ref: Optional[list[str]] = None,
     ) -> GeneralMessageResponse:
         """Returns messages about traffic, services, commercial information, etc."""
-        url = RESOURCE_GENERAL_MESSAGE
-        data = {
-            "RequestorRef": requestor_ref,
-            "MessageIdentifier": message_identfier,
-            "InfoChannelRef": ",".join(info_channel_ref or []),
-            "LineRef": ",".join(line_ref or []),
-            "ImpactedLineRef": ",".join(impacted_line_ref or []),
-        }
-        response_json = await self.api_request("get", url, data)
-
-        _LOGGER.debug("GET 'general-messages' response: %s", response_json)
-
-        return GeneralMessageResponse.from_dict(response_json)
+        return await self.execute(
+            prepare_general_messages(
+                requestor_ref,
+                message_identfier,
+                info_channel_ref,
+                line_ref,
+                impacted_line_ref,
+            )
+        )
 
     async def lines_discovery(
         self,
@@ -134,14 +785,9 @@ class CtsApi:
         message_identifier: Optional[str] = None,
     ) -> LinesDiscoveryResponse:
         """Returns a list of all lines."""
-        url = RESOURCE_LINES_DISCOVERY
-        data = {"RequestorRef": requestor_ref, "MessageIdentifier": message_identifier}
-
-        response_json = await self.api_request("get", url, data)
-
-        _LOGGER.debug("GET 'lines-discovery' response: %s", response_json)
-
-        return LinesDiscoveryResponse.from_dict(response_json)
+        return await self.execute(
+            prepare_lines_discovery(requestor_ref, message_identifier)
+        )
 
     async def stoppoints_discovery(
         self,
@@ -154,22 +800,20 @@ class CtsApi:
         stop_code: Optional[str] = None,
     ) -> StopPointsDiscoveryResponse:
         """Returns a list of stop points."""
-        url = RESOURCE_STOPPOINTS_DISCOVERY
-        data = {
-            "RequestorRef": requestor_ref,
-            "MessageIdentifier": message_identifier,
-            "latitude": latitude,
-            "longitude": longitude,
-            "distance": distance,
-            "includeLinesDestinations": include_lines_destinations,
-            "stopCode": stop_code,
-        }
-
-        response_json = await self.api_request("get", url, data)
-
-        _LOGGER.debug("GET 'stoppoints-discovery' response: %s", response_json)
-
-        return StopPointsDiscoveryResponse.from_dict(response_json)
+        response = await self.execute(
+            prepare_stoppoints_discovery(
+                requestor_ref,
+                message_identifier,
+                latitude,
+                longitude,
+                distance,
+                include_lines_destinations,
+                stop_code,
+            )
+        )
+        if self.prefetch_stops and latitude is not None and longitude is not None:
+            self._prefetch(response)
+        return response
 
     async def stop_monitoring(
         self,
@@ -189,30 +833,53 @@ class CtsApi:
         """Provides a stop-centric view of VEHICLE
         departures (realtime) at a list of designated stops."""
 
-        url = RESOURCE_STOP_MONITORING
-        data = {
-            "MonitoringRef": monitoring_ref,
-            "RequestorRef": requestor_ref,
-            "MessageIdentifier": message_identifier,
-            "VehicleMode": (
-                vehicle_mode.name.lower() if vehicle_mode is not None else None
-            ),
-            "PreviewInternal": (
-                timedelta_isoformat(preview_interval)
-                if preview_interval is not None
-                else None
-            ),
-            "StartTime": start_time.isoformat() if start_time is not None else None,
-            "LineRef": line_ref,
-            "DirectionRef": direction_ref,
-            "MaximumStopVisits": maximum_stop_visits,
-            "MinimumStopVisitsPerLine": minimum_stop_visits_per_line,
-            "IncludeGeneralMessage": include_general_message,
-            "IncludeFLUO67": include_fluo67,
-        }
-
-        response_json = await self.api_request("get", url, data)
-
-        _LOGGER.debug("GET 'stop-monitoring' response: %s", response_json)
-
-        return StopMonitoringResponse.from_dict(response_json)
+        return await self.execute(
+            prepare_stop_monitoring(
+                monitoring_ref,
+                requestor_ref,
+                message_identifier,
+                vehicle_mode,
+                preview_interval,
+                start_time,
+                line_ref,
+                direction_ref,
+                maximum_stop_visits,
+                minimum_stop_visits_per_line,
+                include_general_message,
+                include_fluo67,
+            )
+        )
+
+    async def vehicle_monitoring(
+        self,
+        requestor_ref: Optional[str] = None,
+        message_identifier: Optional[str] = None,
+        line_ref: Optional[str] = None,
+        direction_ref: Optional[int] = None,
+        vehicle_mode: Optional[VehicleMode] = None,
+    ) -> VehicleMonitoringResponse:
+        """Returns the current activity of the vehicles of the network, or of a line."""
+        return await self.execute(
+            prepare_vehicle_monitoring(
+                requestor_ref, message_identifier, line_ref, direction_ref, vehicle_mode
+            )
+        )
+
+    async def estimated_timetable(
+        self,
+        requestor_ref: Optional[str] = None,
+        message_identifier: Optional[str] = None,
+        line_ref: Optional[str] = None,
+        direction_ref: Optional[int] = None,
+        preview_interval: Optional[timedelta] = None,
+    ) -> EstimatedTimetableResponse:
+        """Returns the estimated calls of the journeys of the network, or of a line."""
+        return await self.execute(
+            prepare_estimated_timetable(
+                requestor_ref,
+                message_identifier,
+                line_ref,
+                direction_ref,
+                preview_interval,
+            )
+        )
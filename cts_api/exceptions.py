@@ -23,3 +23,11 @@ class TooManyRequestsError(CtsError):
 
 class TechnicalError(CtsError):
     """Exception raised when a technical exception occured."""
+
+
+class ApiTimeoutError(ApiConnectionError):
+    """Exception raised when the API did not respond in time."""
+
+
+class CircuitOpenError(CtsError):
+    """Exception raised when a call is rejected because the circuit is open."""
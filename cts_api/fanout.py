@@ -0,0 +1,317 @@
+"""Push server fanning out one upstream poll to many WebSocket/SSE subscribers."""
+
+import asyncio
+from datetime import timedelta
+import json
+import logging
+from typing import Any, Optional
+
+from aiohttp import WSMsgType, web
+
+from .client import CtsApi
+from .exceptions import CtsError
+from .messages import MessageStore
+from .responses import MonitoredStopVisit, StopMonitoringResponse
+from .utils import parse_isoduration, to_jsonable
+
+_LOGGER = logging.getLogger(__name__)
+
+STOP_TOPIC = "stop"
+LINE_TOPIC = "line"
+
+
+def visit_key(visit: MonitoredStopVisit) -> str:
+    """Returns a key identifying a visit across polls."""
+    return f"{visit.monitored_vehicle_journey.journey_ref}@{visit.stop_code}"
+
+
+def diff(previous: dict[str, Any], current: dict[str, Any]) -> dict[str, Any]:
+    """Returns the items added, updated and removed between two states."""
+    return {
+        "added": [v for k, v in current.items() if k not in previous],
+        "updated": [
+            v for k, v in current.items() if k in previous and previous[k] != v
+        ],
+        "removed": [k for k in previous if k not in current],
+    }
+
+
+class Subscriber:
+    """Client of the fan-out server, with a bounded queue of events.
+
+    When the queue is full, the pending events of the topic are dropped and replaced
+    by a snapshot of its current state, so a slow consumer catches up without
+    holding an unbounded backlog. If the events of the other topics still do not
+    fit, they are replaced by snapshots as well, the oldest topic first, so that no
+    topic loses a change without being sent its state again."""
+
+    def __init__(self, max_queue: int = 100) -> None:
+        """Initialize the object."""
+        self.queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(max_queue)
+        self.topics: set[str] = set()
+        self.dropped = 0
+        self._snapshots: dict[str, dict[str, Any]] = {}
+
+    def send(self, event: dict[str, Any], snapshot: dict[str, Any]) -> None:
+        """Queue an event, falling back to snapshots when the queue is full."""
+        topic = event["topic"]
+        self._snapshots[topic] = snapshot
+        try:
+            self.queue.put_nowait(event)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        drained = []
+        while not self.queue.empty():
+            drained.append(self.queue.get_nowait())
+        events = [e for e in drained if e["topic"] != topic] + [snapshot]
+        compacted = {topic}
+        while len(events) > self.queue.maxsize:
+            pending = [e["topic"] for e in events if e["topic"] not in compacted]
+            if not pending:
+                # More topics than the queue can hold: keep the most recent ones.
+                events = events[-self.queue.maxsize :]
+                break
+            oldest = pending[0]
+            compacted.add(oldest)
+            first = next(i for i, e in enumerate(events) if e["topic"] == oldest)
+            events = (
+                events[:first]
+                + [self._snapshots[oldest]]
+                + [e for e in events[first:] if e["topic"] != oldest]
+            )
+        self.dropped += len(drained) + 1 - len(events)
+        for queued in events:
+            self.queue.put_nowait(queued)
+
+    def forget(self, topic: str) -> None:
+        """Forget the state of a topic the subscriber left."""
+        self._snapshots.pop(topic, None)
+
+
+class _Topic:
+    """Subscribed topic and its last known state."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.subscribers: set[Subscriber] = set()
+        self.state: dict[str, Any] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def snapshot(self) -> dict[str, Any]:
+        return {"topic": self.name, "snapshot": list(self.state.values())}
+
+    def publish(self, state: dict[str, Any]) -> None:
+        """Broadcast the changes to the subscribers."""
+        changes = diff(self.state, state)
+        self.state = state
+        if not any(changes.values()):
+            return
+        event = {"topic": self.name, **changes}
+        snapshot = self.snapshot()
+        for subscriber in list(self.subscribers):
+            subscriber.send(event, snapshot)
+
+
+class FanoutHub:
+    """Polls each subscribed topic upstream once and broadcasts the changes.
+
+    Topics are "stop:<monitoring ref>", polled with stop_monitoring once per
+    ShortestPossibleCycle, and "line:<line ref>", receiving the general messages
+    impacting the line, all lines sharing one general-message poll."""
+
+    def __init__(
+        self,
+        api: CtsApi,
+        default_interval: timedelta = timedelta(seconds=30),
+        min_interval: timedelta = timedelta(seconds=10),
+    ) -> None:
+        """Initialize the object."""
+        self.api = api
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.topics: dict[str, _Topic] = {}
+        self.messages = MessageStore()
+        self._messages_task: Optional[asyncio.Task] = None
+
+    def _interval(self, cycle: Optional[str]) -> float:
+        """Returns the polling interval for a ShortestPossibleCycle."""
+        interval = parse_isoduration(cycle or "") or self.default_interval
+        return max(interval, self.min_interval).total_seconds()
+
+    def subscribe(self, subscriber: Subscriber, name: str) -> None:
+        """Subscribe to a topic, starting its poll if needed."""
+        kind, _, ref = name.partition(":")
+        if kind not in (STOP_TOPIC, LINE_TOPIC) or not ref:
+            raise ValueError(f"Invalid topic: {name}")
+
+        topic = self.topics.get(name)
+        subscriber.topics.add(name)
+        if topic is not None:
+            topic.subscribers.add(subscriber)
+            if topic.state:
+                subscriber.send(topic.snapshot(), topic.snapshot())
+            return
+
+        topic = self.topics[name] = _Topic(name)
+        topic.subscribers.add(subscriber)
+        if kind == STOP_TOPIC:
+            topic.task = asyncio.create_task(self._poll_stop(topic, ref))
+        elif self._messages_task is None:
+            self._messages_task = asyncio.create_task(self._poll_messages())
+        elif self.messages.last_response is not None:
+            self._publish_line(topic, ref)
+
+    def unsubscribe(self, subscriber: Subscriber, name: Optional[str] = None) -> None:
+        """Unsubscribe from a topic (all topics by default), stopping unused polls."""
+        for topic_name in [name] if name is not None else list(subscriber.topics):
+            subscriber.topics.discard(topic_name)
+            subscriber.forget(topic_name)
+            topic = self.topics.get(topic_name)
+            if topic is None:
+                continue
+            topic.subscribers.discard(subscriber)
+            if not topic.subscribers:
+                del self.topics[topic_name]
+                if topic.task is not None:
+                    topic.task.cancel()
+
+        if self._messages_task is not None and not any(
+            t.startswith(LINE_TOPIC + ":") for t in self.topics
+        ):
+            self._messages_task.cancel()
+            self._messages_task = None
+
+    async def close(self) -> None:
+        """Stop all the polls."""
+        tasks = [t.task for t in self.topics.values() if t.task is not None]
+        if self._messages_task is not None:
+            tasks.append(self._messages_task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.topics.clear()
+        self._messages_task = None
+
+    async def _poll_stop(self, topic: _Topic, monitoring_ref: str) -> None:
+        while True:
+            cycle = None
+            try:
+                response = await self.api.stop_monitoring(monitoring_ref)
+                cycle = self._publish_stop(topic, response)
+            except CtsError as err:
+                _LOGGER.warning("Polling %s failed: %s", topic.name, err)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Unexpected error polling %s", topic.name)
+            await asyncio.sleep(self._interval(cycle))
+
+    @staticmethod
+    def _publish_stop(topic: _Topic, response: StopMonitoringResponse) -> Optional[str]:
+        """Publish a stop-monitoring response and return its shortest cycle."""
+        state = {}
+        cycle = None
+        for delivery in response.service_delivery.stop_monitoring_delivery:
+            cycle = cycle or delivery.shortest_possible_cycle
+            for visit in delivery.monitored_stop_visit:
+                state[visit_key(visit)] = to_jsonable(visit)
+        topic.publish(state)
+        return cycle
+
+    def _publish_line(self, topic: _Topic, line_ref: str) -> None:
+        """Publish the active messages of a line."""
+        topic.publish(
+            {
+                m.info_message_identifier: to_jsonable(m)
+                for m in self.messages.active(line_ref)
+            }
+        )
+
+    async def _poll_messages(self) -> None:
+        while True:
+            cycle = None
+            try:
+                await self.messages.refresh(self.api)
+                deliveries = (
+                    self.messages.last_response.service_delivery.general_message_delivery
+                    if self.messages.last_response is not None
+                    else []
+                )
+                cycle = deliveries[0].shortest_possible_cycle if deliveries else None
+                for name, topic in list(self.topics.items()):
+                    kind, _, line_ref = name.partition(":")
+                    if kind == LINE_TOPIC:
+                        self._publish_line(topic, line_ref)
+            except CtsError as err:
+                _LOGGER.warning("Polling general messages failed: %s", err)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Unexpected error polling general messages")
+            await asyncio.sleep(self._interval(cycle))
+
+
+class FanoutServer:
+    """aiohttp application serving the hub over WebSocket and Server-Sent Events.
+
+    WebSocket clients connect to /ws and send {"subscribe": [topics]} or
+    {"unsubscribe": [topics]}. SSE clients connect to /sse?topic=...&topic=...."""
+
+    def __init__(self, hub: FanoutHub, max_queue: int = 100) -> None:
+        """Initialize the object."""
+        self.hub = hub
+        self.max_queue = max_queue
+        self.app = web.Application()
+        self.app.router.add_get("/ws", self.websocket)
+        self.app.router.add_get("/sse", self.server_sent_events)
+        self.app.on_cleanup.append(lambda _: self.hub.close())
+
+    async def websocket(self, request: web.Request) -> web.WebSocketResponse:
+        """Handle a WebSocket subscriber."""
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        subscriber = Subscriber(self.max_queue)
+
+        async def forward() -> None:
+            while True:
+                await ws.send_json(await subscriber.queue.get())
+
+        sender = asyncio.create_task(forward())
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    command = json.loads(msg.data)
+                    for name in command.get("subscribe", []):
+                        self.hub.subscribe(subscriber, name)
+                    for name in command.get("unsubscribe", []):
+                        self.hub.unsubscribe(subscriber, name)
+                except (ValueError, AttributeError) as err:
+                    await ws.send_json({"error": str(err)})
+        finally:
+            sender.cancel()
+            self.hub.unsubscribe(subscriber)
+        return ws
+
+    async def server_sent_events(self, request: web.Request) -> web.StreamResponse:
+        """Handle a Server-Sent Events subscriber."""
+        subscriber = Subscriber(self.max_queue)
+        try:
+            for name in request.query.getall("topic", []):
+                self.hub.subscribe(subscriber, name)
+        except ValueError as err:
+            self.hub.unsubscribe(subscriber)
+            raise web.HTTPBadRequest(text=str(err)) from err
+
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+        )
+        await response.prepare(request)
+        try:
+            while True:
+                event = await subscriber.queue.get()
+                await response.write(f"data: {json.dumps(event)}\n\n".encode())
+        except ConnectionResetError:
+            pass
+        finally:
+            self.hub.unsubscribe(subscriber)
+        return response
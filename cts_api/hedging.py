@@ -0,0 +1,115 @@
+"""Hedged requests to cut the tail latency of the API."""
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+import math
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from .metrics import HedgingMetrics
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class HedgingPolicy:
+    """Hedging behaviour of the client.
+
+    A second identical request is sent when the first one has not completed after
+    the given percentile of the recent latencies of the endpoint. Until min_samples
+    latencies are known, initial_delay is used."""
+
+    percentile: float = 0.95
+    initial_delay: float = 1.0
+    min_delay: float = 0.05
+    max_delay: float = 5.0
+    min_samples: int = 20
+    window: int = 200
+    endpoints: Optional[frozenset[str]] = None
+
+    def applies_to(self, url: str) -> bool:
+        """Returns True if requests to the given resource are hedged."""
+        return self.endpoints is None or url in self.endpoints
+
+
+class LatencyTracker:
+    """Rolling window of request latencies."""
+
+    def __init__(self, window: int) -> None:
+        """Initialize the object."""
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, latency: float) -> None:
+        """Record the latency of a completed request, in seconds."""
+        self._samples.append(latency)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """Returns the given percentile (0-1) of the recorded latencies."""
+        if not self._samples:
+            return None
+        samples = sorted(self._samples)
+        index = min(len(samples) - 1, max(0, math.ceil(percentile * len(samples)) - 1))
+        return samples[index]
+
+    def hedge_delay(self, policy: HedgingPolicy) -> float:
+        """Returns the delay after which a request is hedged."""
+        delay = self.percentile(policy.percentile)
+        if delay is None or len(self) < policy.min_samples:
+            delay = policy.initial_delay
+        return min(max(delay, policy.min_delay), policy.max_delay)
+
+
+async def hedge(
+    request: Callable[[], Awaitable[T]],
+    delay: float,
+    tracker: Optional[LatencyTracker] = None,
+    metrics: Optional[HedgingMetrics] = None,
+) -> T:
+    """Run a request, and a second identical one if the first has not completed
+    after the delay. The first successful result wins and the other is cancelled."""
+
+    async def timed() -> T:
+        start = time.monotonic()
+        try:
+            result = await request()
+        except asyncio.CancelledError:
+            # A losing attempt took at least this long, keep the percentile honest.
+            if tracker is not None:
+                tracker.record(time.monotonic() - start)
+            raise
+        if tracker is not None:
+            tracker.record(time.monotonic() - start)
+        return result
+
+    primary = asyncio.ensure_future(timed())
+    pending = {primary}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if done:
+            return primary.result()
+
+        if metrics is not None:
+            metrics.hedged += 1
+        secondary = asyncio.ensure_future(timed())
+        pending = {primary, secondary}
+        while True:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            errors: list[BaseException] = []
+            for task in done:
+                error = task.exception()
+                if error is None:
+                    if metrics is not None and task is secondary:
+                        metrics.hedge_wins += 1
+                    return task.result()
+                errors.append(error)
+            if not pending:
+                raise errors[-1]
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,143 @@
+"""Vehicle-centric view of journeys merged from stop-monitoring data."""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from .responses import MonitoredStopVisit, StopMonitoringResponse
+
+
+@dataclass
+class JourneyCall:
+    """Latest known state of a journey at a stop."""
+
+    stop_code: str
+    stop_point_name: str
+    order: int
+    expected_departure_time: Optional[datetime] = None
+    expected_arrival_time: Optional[datetime] = None
+    recorded_at: Optional[datetime] = None
+    passed: bool = False
+
+
+@dataclass
+class Journey:
+    """Vehicle journey merged from the visits of all its stops."""
+
+    journey_ref: str
+    line_ref: str
+    direction_ref: int
+    published_line_name: str
+    destination_name: str
+    calls: dict[str, JourneyCall] = field(default_factory=dict)
+    updated_at: Optional[datetime] = None
+
+    def stops(self) -> list[JourneyCall]:
+        """Returns the calls of the journey in stop order."""
+        return sorted(self.calls.values(), key=lambda c: c.order)
+
+    def last_call(self) -> Optional[JourneyCall]:
+        """Returns the last stop the vehicle has passed, if known."""
+        passed = [c for c in self.calls.values() if c.passed]
+        return max(passed, key=lambda c: c.order) if passed else None
+
+    def next_calls(self) -> list[JourneyCall]:
+        """Returns the stops the vehicle has yet to call at, in order."""
+        last = self.last_call()
+        return [
+            c
+            for c in self.stops()
+            if not c.passed and (last is None or c.order > last.order)
+        ]
+
+
+def _newer(recorded_at: Optional[datetime], call: JourneyCall) -> bool:
+    """Tells whether an observation is at least as recent as a call."""
+    return call.recorded_at is None or (
+        recorded_at is not None and recorded_at >= call.recorded_at
+    )
+
+
+class JourneyStore:
+    """Merges per-stop observations into one record per journey.
+
+    A journey appears at every stop it serves, each visit repeating its previous and
+    onward calls. The store keeps one record per journey with the latest prediction
+    per stop, instead of every copy."""
+
+    def __init__(self) -> None:
+        """Initialize the object."""
+        self.journeys: dict[str, Journey] = {}
+
+    def __len__(self) -> int:
+        return len(self.journeys)
+
+    def add(self, response: StopMonitoringResponse) -> None:
+        """Merge the visits of a stop-monitoring response."""
+        for delivery in response.service_delivery.stop_monitoring_delivery:
+            for visit in delivery.monitored_stop_visit:
+                self.add_visit(visit, delivery.response_timestamp)
+
+    def add_visit(
+        self, visit: MonitoredStopVisit, recorded_at: Optional[datetime] = None
+    ) -> Journey:
+        """Merge a visit, recorded at recorded_at if it has no recording time."""
+        recorded_at = visit.recorded_at_time or recorded_at
+        vehicle_journey = visit.monitored_vehicle_journey
+        journey = self.journeys.get(vehicle_journey.journey_ref)
+        if journey is None:
+            journey = self.journeys[vehicle_journey.journey_ref] = Journey(
+                vehicle_journey.journey_ref,
+                vehicle_journey.line_ref,
+                vehicle_journey.direction_ref,
+                vehicle_journey.published_line_name,
+                vehicle_journey.destination_name,
+            )
+        if recorded_at is not None and (
+            journey.updated_at is None or recorded_at > journey.updated_at
+        ):
+            journey.updated_at = recorded_at
+
+        for previous in vehicle_journey.previous_call:
+            call = self._call(journey, previous.stop_code, previous.stop_point_name)
+            call.order = previous.order
+            call.passed = True
+
+        for prediction in [vehicle_journey.monitored_call, *vehicle_journey.onward_call]:
+            if not prediction.stop_code:
+                continue
+            call = self._call(journey, prediction.stop_code, prediction.stop_point_name)
+            if not _newer(recorded_at, call):
+                continue
+            call.order = prediction.order
+            call.expected_departure_time = prediction.expected_departure_time
+            call.expected_arrival_time = prediction.expected_arrival_time
+            call.recorded_at = recorded_at
+        return journey
+
+    @staticmethod
+    def _call(journey: Journey, stop_code: str, stop_point_name: str) -> JourneyCall:
+        """Returns the call of a journey at a stop, adding it if needed."""
+        call = journey.calls.get(stop_code)
+        if call is None:
+            call = journey.calls[stop_code] = JourneyCall(stop_code, stop_point_name, 0)
+        return call
+
+    def get(self, journey_ref: str) -> Optional[Journey]:
+        """Returns a journey, if known."""
+        return self.journeys.get(journey_ref)
+
+    def for_line(self, line_ref: str) -> list[Journey]:
+        """Returns the journeys of a line."""
+        return [j for j in self.journeys.values() if j.line_ref == line_ref]
+
+    def prune(self, before: datetime) -> int:
+        """Drop the journeys not updated since before and return how many."""
+        stale = [
+            ref
+            for ref, journey in self.journeys.items()
+            if journey.updated_at is not None and journey.updated_at < before
+        ]
+        for ref in stale:
+            del self.journeys[ref]
+        return len(stale)
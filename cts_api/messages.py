@@ -0,0 +1,206 @@
+"""Indexed store of general messages."""
+
+from bisect import bisect_right
+from datetime import datetime
+import math
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from .responses import GeneralMessageResponse, InfoMessage
+
+if TYPE_CHECKING:
+    from .client import CtsApi
+
+
+def _timestamp(value: Optional[datetime], default: float) -> float:
+    """Convert a datetime to a POSIX timestamp, using a default for None."""
+    return value.timestamp() if value is not None else default
+
+
+def impact_window(message: InfoMessage) -> tuple[float, float]:
+    """Returns the (start, end) timestamps during which a message is active.
+
+    A message is active from its impact start until the earliest of its impact end
+    and its validity end. Missing bounds are treated as unbounded."""
+    start = _timestamp(message.content.impact_start_date_time, -math.inf)
+    end = min(
+        _timestamp(message.content.impact_end_date_time, math.inf),
+        _timestamp(message.valid_until_time, math.inf),
+    )
+    return start, end
+
+
+class _IntervalIndex:
+    """Static segment index over a set of intervals.
+
+    The boundaries of all intervals split the time line into elementary segments, and
+    each segment stores the set of identifiers active over it, so a point query is a
+    single binary search. The index is rebuilt lazily after modifications."""
+
+    def __init__(self) -> None:
+        """Initialize the object."""
+        self._intervals: dict[str, tuple[float, float]] = {}
+        self._boundaries: list[float] = []
+        self._segments: list[frozenset[str]] = [frozenset()]
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._intervals)
+
+    def set(self, key: str, start: float, end: float) -> None:
+        """Add or replace the interval of a key."""
+        if self._intervals.get(key) != (start, end):
+            self._intervals[key] = (start, end)
+            self._dirty = True
+
+    def discard(self, key: str) -> None:
+        """Remove the interval of a key, if any."""
+        if self._intervals.pop(key, None) is not None:
+            self._dirty = True
+
+    def _rebuild(self) -> None:
+        """Recompute the elementary segments."""
+        boundaries = sorted(
+            {b for interval in self._intervals.values() for b in interval}
+            - {-math.inf, math.inf}
+        )
+        # Segment i covers [boundaries[i - 1], boundaries[i]), the first and the last
+        # segments being unbounded.
+        segments: list[set[str]] = [set() for _ in range(len(boundaries) + 1)]
+        for key, (start, end) in self._intervals.items():
+            first = bisect_right(boundaries, start) if start != -math.inf else 0
+            last = (
+                bisect_right(boundaries, end) - 1
+                if end != math.inf
+                else len(boundaries)
+            )
+            for i in range(first, last + 1):
+                segments[i].add(key)
+        self._boundaries = boundaries
+        self._segments = [frozenset(s) for s in segments]
+        self._dirty = False
+
+    def at(self, point: float) -> frozenset[str]:
+        """Returns the keys whose interval [start, end) contains the point."""
+        if self._dirty:
+            self._rebuild()
+        return self._segments[bisect_right(self._boundaries, point)]
+
+
+class MessageStore:
+    """Incrementally updated store of general messages.
+
+    Messages are keyed by their info message identifier and indexed by impacted line
+    and by impact window, so that the messages active for a line at a given time are
+    found without scanning the whole store."""
+
+    def __init__(self) -> None:
+        """Initialize the object."""
+        self._messages: dict[str, InfoMessage] = {}
+        self._by_line: dict[str, set[str]] = {}
+        self._windows = _IntervalIndex()
+        self._last_response: Optional[GeneralMessageResponse] = None
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    @property
+    def last_response(self) -> Optional[GeneralMessageResponse]:
+        """Returns the last response merged by refresh."""
+        return self._last_response
+
+    def __contains__(self, identifier: object) -> bool:
+        return identifier in self._messages
+
+    def get(self, identifier: str) -> Optional[InfoMessage]:
+        """Returns a message by its identifier."""
+        return self._messages.get(identifier)
+
+    def add(self, message: InfoMessage) -> bool:
+        """Add or replace a message. Returns True if the store changed."""
+        identifier = message.info_message_identifier
+        previous = self._messages.get(identifier)
+        if previous == message:
+            return False
+        if previous is not None:
+            self._unindex_lines(identifier, previous)
+
+        self._messages[identifier] = message
+        for line_ref in message.content.impacted_line_ref:
+            self._by_line.setdefault(line_ref, set()).add(identifier)
+        self._windows.set(identifier, *impact_window(message))
+        return True
+
+    def remove(self, identifier: str) -> bool:
+        """Remove a message. Returns True if the message was in the store."""
+        message = self._messages.pop(identifier, None)
+        if message is None:
+            return False
+        self._unindex_lines(identifier, message)
+        self._windows.discard(identifier)
+        return True
+
+    def _unindex_lines(self, identifier: str, message: InfoMessage) -> None:
+        """Remove a message from the line index."""
+        for line_ref in message.content.impacted_line_ref:
+            identifiers = self._by_line.get(line_ref)
+            if identifiers is not None:
+                identifiers.discard(identifier)
+                if not identifiers:
+                    del self._by_line[line_ref]
+
+    def update(self, messages: Iterable[InfoMessage], complete: bool = True) -> int:
+        """Merge messages into the store and return the number of changes.
+
+        When complete is True, the messages are the full current set and the stored
+        messages missing from it are removed."""
+        changes = 0
+        seen: set[str] = set()
+        for message in messages:
+            seen.add(message.info_message_identifier)
+            changes += self.add(message)
+        if complete:
+            for identifier in [i for i in self._messages if i not in seen]:
+                changes += self.remove(identifier)
+        return changes
+
+    def update_from_response(
+        self, response: GeneralMessageResponse, complete: bool = True
+    ) -> int:
+        """Merge the messages of a general-message response into the store."""
+        return self.update(
+            (
+                message
+                for delivery in response.service_delivery.general_message_delivery
+                for message in delivery.info_message
+            ),
+            complete,
+        )
+
+    async def refresh(self, api: "CtsApi", **kwargs) -> int:
+        """Poll the general-message endpoint and merge the result into the store.
+
+        Keyword arguments are passed to CtsApi.general_messages. The response only
+        replaces the full set of messages when no filter is given. With conditional
+        requests, an unchanged response is the previous object and is skipped."""
+        response = await api.general_messages(**kwargs)
+        if response is self._last_response:
+            return 0
+        self._last_response = response
+        return self.update_from_response(
+            response, complete=not any(v for v in kwargs.values())
+        )
+
+    def active(
+        self, line_ref: Optional[str] = None, at: Optional[datetime] = None
+    ) -> list[InfoMessage]:
+        """Returns the messages active at a given time (now by default),
+        optionally restricted to the messages impacting a line."""
+        point = (at or datetime.now().astimezone()).timestamp()
+        identifiers = self._windows.at(point)
+        if line_ref is not None:
+            identifiers = identifiers.intersection(self._by_line.get(line_ref, ()))
+        return [self._messages[i] for i in sorted(identifiers)]
+
+    def for_line(self, line_ref: str) -> list[InfoMessage]:
+        """Returns all the messages impacting a line, whatever their impact window."""
+        return [self._messages[i] for i in sorted(self._by_line.get(line_ref, ()))]
@@ -0,0 +1,77 @@
+"""Metrics exposed by the CTS API client."""
+
+from dataclasses import dataclass
+
+
+@dataclass
+class TransferMetrics:
+    """Counters about the data transferred from the API."""
+
+    requests: int = 0
+    not_modified: int = 0
+    compressed_responses: int = 0
+    bytes_received: int = 0
+    bytes_decoded: int = 0
+    bytes_saved_not_modified: int = 0
+
+    @property
+    def bytes_saved_compression(self) -> int:
+        """Bytes saved on the wire thanks to content encoding."""
+        return self.bytes_decoded - self.bytes_received
+
+    @property
+    def bytes_saved(self) -> int:
+        """Total bytes saved by compression and conditional requests."""
+        return self.bytes_saved_compression + self.bytes_saved_not_modified
+
+
+@dataclass
+class HedgingMetrics:
+    """Counters about hedged requests."""
+
+    hedged: int = 0
+    hedge_wins: int = 0
+
+
+@dataclass
+class FingerprintMetrics:
+    """Counters about response bodies identical to the previous ones."""
+
+    lookups: int = 0
+    hits: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of the bodies whose parsing was skipped."""
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
+@dataclass
+class QueueMetrics:
+    """Counters about the time spent waiting in a priority lane, in seconds."""
+
+    requests: int = 0
+    waiting: int = 0
+    queue_time: float = 0.0
+    max_queue_time: float = 0.0
+
+    @property
+    def mean_queue_time(self) -> float:
+        """Mean time spent waiting by a request."""
+        return self.queue_time / self.requests if self.requests else 0.0
+
+    def record(self, queue_time: float) -> None:
+        """Record the time a request waited."""
+        self.requests += 1
+        self.queue_time += queue_time
+        self.max_queue_time = max(self.max_queue_time, queue_time)
+
+
+@dataclass
+class PlannerMetrics:
+    """Counters about stop-monitoring requests merged by the query planner."""
+
+    requests: int = 0
+    upstream_calls: int = 0
+    merged: int = 0
+    fallbacks: int = 0
@@ -0,0 +1,242 @@
+"""Query planner merging the stop-monitoring requests of a stop."""
+
+import asyncio
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from typing import Awaitable, Optional
+
+from .client import CtsApi
+from .metrics import PlannerMetrics
+from .requests import VehicleMode
+from .responses import MonitoredStopVisit, StopMonitoringResponse
+
+
+@dataclass(frozen=True)
+class VisitSelection:
+    """Visits a caller asked for at a stop.
+
+    As the API does, the first maximum_stop_visits visits are selected, plus the
+    earliest minimum_stop_visits_per_line visits of each line."""
+
+    line_ref: Optional[str] = None
+    direction_ref: Optional[str] = None
+    maximum_stop_visits: Optional[int] = 3
+    minimum_stop_visits_per_line: Optional[int] = 3
+
+    @property
+    def needed(self) -> Optional[int]:
+        """Returns the number of visits of the line of a line selection."""
+        if self.maximum_stop_visits is None:
+            return None
+        return max(self.maximum_stop_visits, self.minimum_stop_visits_per_line or 0)
+
+    def matches(self, visit: MonitoredStopVisit) -> bool:
+        """Returns whether a visit is of the line and direction of the selection."""
+        journey = visit.monitored_vehicle_journey
+        return (self.line_ref is None or journey.line_ref == self.line_ref) and (
+            self.direction_ref is None
+            or str(journey.direction_ref) == str(self.direction_ref)
+        )
+
+    def select(self, visits: list[MonitoredStopVisit]) -> list[MonitoredStopVisit]:
+        """Returns the selected visits among the visits of a stop, in time order."""
+        matching = [visit for visit in visits if self.matches(visit)]
+        if self.maximum_stop_visits is None:
+            return matching
+        selected = []
+        per_line: dict[str, int] = {}
+        for index, visit in enumerate(matching):
+            line_ref = visit.monitored_vehicle_journey.line_ref
+            count = per_line.get(line_ref, 0)
+            if index < self.maximum_stop_visits or count < (
+                self.minimum_stop_visits_per_line or 0
+            ):
+                selected.append(visit)
+                per_line[line_ref] = count + 1
+        return selected
+
+
+def _broaden(selections: list[VisitSelection]) -> VisitSelection:
+    """Returns the selection of the upstream query answering all the selections.
+
+    The query has no line nor direction filter. It returns at least as many visits
+    as any caller asked for, and for each line as many as any line caller needs."""
+    if any(s.maximum_stop_visits is None for s in selections):
+        return VisitSelection(None, None, None, None)
+    return VisitSelection(
+        maximum_stop_visits=max(s.maximum_stop_visits or 0 for s in selections),
+        minimum_stop_visits_per_line=max(
+            (s.needed if s.line_ref is not None else s.minimum_stop_visits_per_line)
+            or 0
+            for s in selections
+        ),
+    )
+
+
+class StopMonitoringPlanner:
+    """Merges the concurrent stop-monitoring requests of a stop into one query.
+
+    Requests for the same monitoring_ref made within window seconds (by default, in
+    the same iteration of the event loop) are sent as one query without line and
+    direction filters, asking for enough visits to answer each of them. The result is
+    then filtered locally for each caller. When the broader query may have cut the
+    visits a caller needs, that caller falls back to its own filtered query."""
+
+    def __init__(self, api: CtsApi, window: float = 0.0) -> None:
+        """Initialize the object."""
+        self.api = api
+        self.window = window
+        self.metrics = PlannerMetrics()
+        self._batches: dict[tuple, list[tuple[VisitSelection, asyncio.Future]]] = {}
+        self._flushes: set[asyncio.Task] = set()
+
+    async def stop_monitoring(
+        self,
+        monitoring_ref: str,
+        requestor_ref: Optional[str] = None,
+        message_identifier: Optional[str] = None,
+        vehicle_mode: Optional[VehicleMode] = VehicleMode.UNDEFINED,
+        preview_interval: Optional[timedelta] = timedelta(hours=1, minutes=30),
+        start_time: Optional[datetime] = None,
+        line_ref: Optional[str] = None,
+        direction_ref: Optional[str] = None,
+        maximum_stop_visits: Optional[int] = 3,
+        minimum_stop_visits_per_line: Optional[int] = 3,
+        include_general_message: Optional[bool] = None,
+        include_fluo67: Optional[bool] = False,
+    ) -> StopMonitoringResponse:
+        """Returns the same visits as CtsApi.stop_monitoring, merging the requests."""
+        self.metrics.requests += 1
+        key = (
+            monitoring_ref,
+            requestor_ref,
+            message_identifier,
+            vehicle_mode,
+            preview_interval,
+            start_time,
+            include_general_message,
+            include_fluo67,
+        )
+        selection = VisitSelection(
+            line_ref, direction_ref, maximum_stop_visits, minimum_stop_visits_per_line
+        )
+        if line_ref is None and direction_ref is not None:
+            # Directions are not ordered per line by the API, so the visits of a
+            # direction across lines cannot be told complete from a broader query.
+            return await self._call(key, selection)
+
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = []
+            task = asyncio.create_task(self._flush(key))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+        future = asyncio.get_running_loop().create_future()
+        batch.append((selection, future))
+        return await future
+
+    async def _call(
+        self, key: tuple, selection: VisitSelection
+    ) -> StopMonitoringResponse:
+        """Query the API for a selection."""
+        (
+            monitoring_ref,
+            requestor_ref,
+            message_identifier,
+            vehicle_mode,
+            preview_interval,
+            start_time,
+            include_general_message,
+            include_fluo67,
+        ) = key
+        self.metrics.upstream_calls += 1
+        return await self.api.stop_monitoring(
+            monitoring_ref,
+            requestor_ref,
+            message_identifier,
+            vehicle_mode,
+            preview_interval,
+            start_time,
+            selection.line_ref,
+            selection.direction_ref,
+            selection.maximum_stop_visits,
+            selection.minimum_stop_visits_per_line,
+            include_general_message,
+            include_fluo67,
+        )
+
+    async def _flush(self, key: tuple) -> None:
+        """Send the requests of a batch once its window is over."""
+        await asyncio.sleep(self.window)
+        batch = [item for item in self._batches.pop(key) if not item[1].done()]
+        if not batch:
+            return
+        if len(batch) == 1:
+            await self._resolve(batch[0][1], self._call(key, batch[0][0]))
+            return
+
+        broad = _broaden([selection for selection, _ in batch])
+        try:
+            response = await self._call(key, broad)
+        except Exception as err:  # pylint: disable=broad-except
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(err)
+            return
+
+        self.metrics.merged += len(batch)
+        fallbacks = []
+        for selection, future in batch:
+            if future.done():
+                continue
+            result = self._split(response, selection, broad)
+            if result is None:
+                self.metrics.fallbacks += 1
+                fallbacks.append(self._resolve(future, self._call(key, selection)))
+            else:
+                future.set_result(result)
+        await asyncio.gather(*fallbacks)
+
+    @staticmethod
+    async def _resolve(
+        future: asyncio.Future, call: Awaitable[StopMonitoringResponse]
+    ) -> None:
+        """Set the outcome of a call as the result of a caller."""
+        try:
+            result = await call
+        except Exception as err:  # pylint: disable=broad-except
+            if not future.done():
+                future.set_exception(err)
+        else:
+            if not future.done():
+                future.set_result(result)
+
+    @staticmethod
+    def _split(
+        response: StopMonitoringResponse,
+        selection: VisitSelection,
+        broad: VisitSelection,
+    ) -> Optional[StopMonitoringResponse]:
+        """Returns the response of a selection, None if the broad query may lack some
+        of its visits."""
+        deliveries = []
+        for delivery in response.service_delivery.stop_monitoring_delivery:
+            visits = selection.select(delivery.monitored_stop_visit)
+            if selection.line_ref is not None and broad.maximum_stop_visits is not None:
+                # The visits of a line are its earliest ones, complete unless the API
+                # returned as many as the broad query asked per line.
+                line_visits = sum(
+                    visit.monitored_vehicle_journey.line_ref == selection.line_ref
+                    for visit in delivery.monitored_stop_visit
+                )
+                if len(visits) < (selection.needed or 0) and line_visits >= (
+                    broad.minimum_stop_visits_per_line or 0
+                ):
+                    return None
+            deliveries.append(replace(delivery, monitored_stop_visit=visits))
+        return replace(
+            response,
+            service_delivery=replace(
+                response.service_delivery, stop_monitoring_delivery=deliveries
+            ),
+        )
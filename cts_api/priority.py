@@ -0,0 +1,141 @@
+"""Priority lanes sharing the connections and quota of the API."""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import Enum
+import time
+from typing import AsyncIterator, Callable, Iterator, Mapping, Optional
+
+from .metrics import QueueMetrics
+from .ratelimit import TokenBucket
+
+
+class Priority(Enum):
+    """Describe the priorities of the calls to the API."""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+DEFAULT_WEIGHTS: dict[Priority, int] = {Priority.INTERACTIVE: 9, Priority.BACKGROUND: 1}
+
+_PRIORITY: ContextVar[Priority] = ContextVar(
+    "cts_api_priority", default=Priority.INTERACTIVE
+)
+
+
+def current_priority() -> Priority:
+    """Returns the priority of the calls made from the current context."""
+    return _PRIORITY.get()
+
+
+@contextmanager
+def priority(value: Priority) -> Iterator[None]:
+    """Make the calls to the API of the block with a priority.
+
+    Tasks created in the block inherit the priority."""
+    token = _PRIORITY.set(value)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+class PriorityScheduler:
+    """Grants request slots to priority lanes with weighted scheduling.
+
+    At most max_concurrency requests are in flight, and at most rate requests per
+    second are started when a rate is given. While several lanes are waiting, slots
+    are granted in proportion to their weights (smooth weighted round-robin): queued
+    interactive requests go before background ones, which still get their share."""
+
+    def __init__(
+        self,
+        max_concurrency: int = 10,
+        weights: Optional[Mapping[Priority, int]] = None,
+        rate: Optional[float] = None,
+        burst: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize the object."""
+        self.max_concurrency = max_concurrency
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.budget = TokenBucket(rate, burst, clock) if rate is not None else None
+        self.metrics = {p: QueueMetrics() for p in Priority}
+        self.active = 0
+        self._clock = clock
+        self._queues: dict[Priority, deque[asyncio.Future]] = {
+            p: deque() for p in Priority
+        }
+        self._current = {p: 0 for p in Priority}
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @asynccontextmanager
+    async def slot(self, value: Optional[Priority] = None) -> AsyncIterator[None]:
+        """Hold a request slot, with the priority of the context by default."""
+        await self.acquire(value or current_priority())
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, value: Priority) -> None:
+        """Wait for a request slot."""
+        metrics = self.metrics[value]
+        enqueued = self._clock()
+        future = asyncio.get_running_loop().create_future()
+        self._queues[value].append(future)
+        metrics.waiting += 1
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                self.release()
+            elif future in self._queues[value]:
+                self._queues[value].remove(future)
+            raise
+        finally:
+            metrics.waiting -= 1
+        metrics.record(self._clock() - enqueued)
+
+    def release(self) -> None:
+        """Release a request slot."""
+        self.active -= 1
+        self._dispatch()
+
+    def _waiting(self) -> bool:
+        """Returns whether a request is waiting, dropping the cancelled ones."""
+        for queue in self._queues.values():
+            while queue and queue[0].done():
+                queue.popleft()
+        return any(self._queues.values())
+
+    def _pick(self) -> Priority:
+        """Returns the lane to grant the next slot to."""
+        waiting = [p for p in Priority if self._queues[p]]
+        for lane in waiting:
+            self._current[lane] += self.weights[lane]
+        chosen = max(waiting, key=lambda p: (self._current[p], -p.value))
+        self._current[chosen] -= sum(self.weights[p] for p in waiting)
+        return chosen
+
+    def _dispatch(self) -> None:
+        """Grant the available slots."""
+        while self.active < self.max_concurrency and self._waiting():
+            if self.budget is not None and not self.budget.try_acquire():
+                if self._timer is None:
+                    delay = (1 - self.budget.tokens) / self.budget.rate
+                    self._timer = asyncio.get_running_loop().call_later(
+                        delay, self._on_timer
+                    )
+                return
+            self.active += 1
+            self._queues[self._pick()].popleft().set_result(None)
+
+    def _on_timer(self) -> None:
+        """Grant the slots waiting for the rate budget."""
+        self._timer = None
+        self._dispatch()
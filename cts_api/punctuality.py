@@ -0,0 +1,186 @@
+"""Delay and punctuality statistics over polled vehicle journeys."""
+
+from array import array
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+import math
+from typing import Optional, Union
+
+from .archive import StringTable
+from .responses import MonitoredVehicleJourney, StopMonitoringResponse
+
+
+class Dimension(Enum):
+    """Describe the dimensions statistics can be grouped by."""
+
+    LINE = 0
+    STOP = 1
+    HOUR = 2
+
+
+@dataclass
+class DelayStats:
+    """Distribution of the drifts of a group, in seconds."""
+
+    count: int
+    mean: float
+    median: float
+    p90: float
+    minimum: float
+    maximum: float
+
+    @staticmethod
+    def from_values(values: list[int]) -> "DelayStats":
+        """Compute the statistics of a list of drifts."""
+        values = sorted(values)
+        count = len(values)
+        return DelayStats(
+            count=count,
+            mean=sum(values) / count,
+            median=_percentile(values, 50),
+            p90=_percentile(values, 90),
+            minimum=values[0],
+            maximum=values[-1],
+        )
+
+
+def _percentile(values: list[int], percentile: float) -> float:
+    """Returns the nearest-rank percentile of sorted values."""
+    return values[max(0, math.ceil(percentile / 100 * len(values)) - 1)]
+
+
+class PunctualityEngine:
+    """Tracks how the predicted departure of each journey at each stop evolves.
+
+    Each (journey, stop) pair is one row of columnar arrays holding its first and
+    latest predictions, so a full day of network data stays compact and aggregates
+    are single passes over the columns. The drift of a row is its latest prediction
+    minus the first one: positive when the vehicle is running later than first
+    announced."""
+
+    def __init__(self) -> None:
+        """Initialize the object."""
+        self.strings = StringTable()
+        self._rows: dict[tuple[int, int], int] = {}
+        self._journey_rows: dict[int, list[int]] = {}
+        self.journey = array("l")
+        self.line = array("l")
+        self.stop = array("l")
+        self.hour = array("b")
+        self.first = array("q")
+        self.latest = array("q")
+        self.updates = array("l")
+        # 1 if real time, 0 if theoretical, -1 if only known from onward calls.
+        self.real_time = array("b")
+
+    def __len__(self) -> int:
+        return len(self.first)
+
+    def add(self, response: StopMonitoringResponse) -> None:
+        """Ingest the journeys of a stop-monitoring response."""
+        for delivery in response.service_delivery.stop_monitoring_delivery:
+            for visit in delivery.monitored_stop_visit:
+                self.add_journey(visit.monitored_vehicle_journey)
+
+    def add_journey(self, journey: MonitoredVehicleJourney) -> None:
+        """Ingest the predictions of a journey at its monitored and onward calls."""
+        journey_id = self.strings.encode(journey.journey_ref)
+        line_id = self.strings.encode(journey.line_ref)
+        call = journey.monitored_call
+        self._record(
+            journey_id,
+            line_id,
+            call.stop_code,
+            call.expected_departure_time or call.expected_arrival_time,
+            call.extension.is_real_time,
+        )
+        for onward in journey.onward_call:
+            self._record(
+                journey_id,
+                line_id,
+                onward.stop_code,
+                onward.expected_departure_time or onward.expected_arrival_time,
+                None,
+            )
+
+    def _record(
+        self,
+        journey_id: int,
+        line_id: int,
+        stop_code: str,
+        expected: Optional[datetime],
+        real_time: Optional[bool],
+    ) -> None:
+        """Record a prediction of a journey at a stop."""
+        if expected is None or not stop_code:
+            return
+        stop_id = self.strings.encode(stop_code)
+        epoch = int(expected.timestamp())
+        row = self._rows.get((journey_id, stop_id))
+        if row is None:
+            row = self._rows[(journey_id, stop_id)] = len(self.first)
+            self._journey_rows.setdefault(journey_id, []).append(row)
+            self.journey.append(journey_id)
+            self.line.append(line_id)
+            self.stop.append(stop_id)
+            self.hour.append(expected.hour)
+            self.first.append(epoch)
+            self.latest.append(epoch)
+            self.updates.append(0)
+            self.real_time.append(-1 if real_time is None else int(real_time))
+            return
+
+        if self.latest[row] != epoch:
+            self.latest[row] = epoch
+            self.updates[row] += 1
+        if real_time is not None:
+            self.real_time[row] = int(real_time)
+
+    def drift(self, journey_ref: str) -> dict[str, int]:
+        """Returns the drift in seconds of a journey at each of its stops."""
+        journey_id = self.strings.get(journey_ref)
+        if journey_id is None:
+            return {}
+        return {
+            self.strings.decode(self.stop[row]): self.latest[row] - self.first[row]
+            for row in self._journey_rows.get(journey_id, [])
+        }
+
+    def _keys(self, dimension: Dimension) -> array:
+        """Returns the column of a dimension."""
+        if dimension is Dimension.LINE:
+            return self.line
+        if dimension is Dimension.STOP:
+            return self.stop
+        return self.hour
+
+    def _decode(self, dimension: Dimension, key: int) -> Union[str, int]:
+        return key if dimension is Dimension.HOUR else self.strings.decode(key)
+
+    def delays(self, dimension: Dimension) -> dict[Union[str, int], DelayStats]:
+        """Returns the distribution of the drifts per line, stop or hour."""
+        groups: dict[int, list[int]] = {}
+        for key, first, latest in zip(self._keys(dimension), self.first, self.latest):
+            groups.setdefault(key, []).append(latest - first)
+        return {
+            self._decode(dimension, key): DelayStats.from_values(values)
+            for key, values in groups.items()
+        }
+
+    def real_time_share(self, dimension: Dimension) -> dict[Union[str, int], float]:
+        """Returns the share of real-time predictions per line, stop or hour.
+
+        Only the stops observed as monitored calls are counted, onward calls not
+        telling whether their prediction is real time."""
+        counts: dict[int, list[int]] = {}
+        for key, real_time in zip(self._keys(dimension), self.real_time):
+            if real_time < 0:
+                continue
+            count = counts.setdefault(key, [0, 0])
+            count[0] += real_time
+            count[1] += 1
+        return {
+            self._decode(dimension, key): real_time / total
+            for key, (real_time, total) in counts.items()
+        }
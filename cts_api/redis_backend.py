@@ -0,0 +1,150 @@
+"""Cache backend over a Redis-protocol (RESP) store."""
+
+import asyncio
+import secrets
+from typing import Any, Optional, Union
+
+from .cache import CacheBackend, CacheBackendError
+
+# Delete the lock only if it is still held with our token.
+RELEASE_LOCK_SCRIPT = (
+    'if redis.call("get", KEYS[1]) == ARGV[1] then '
+    'return redis.call("del", KEYS[1]) else return 0 end'
+)
+
+
+class RedisError(CacheBackendError):
+    """Exception raised when the store replies with an error."""
+
+
+def encode_command(*args: Union[str, bytes, int]) -> bytes:
+    """Encode a command as a RESP array of bulk strings."""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, int):
+            arg = str(arg)
+        if isinstance(arg, str):
+            arg = arg.encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    """Read a RESP reply."""
+    line = await reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("Connection closed by the server")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        raise RedisError(payload.decode())
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        length = int(payload)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise RedisError(f"Unexpected reply: {line!r}")
+
+
+class RedisConnection:
+    """Connection to a Redis-protocol store."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Initialize the object."""
+        self._reader = reader
+        self._writer = writer
+
+    @staticmethod
+    async def open(host: str, port: int, db: int = 0) -> "RedisConnection":
+        """Open a connection and select the database."""
+        reader, writer = await asyncio.open_connection(host, port)
+        connection = RedisConnection(reader, writer)
+        if db:
+            await connection.execute("SELECT", db)
+        return connection
+
+    async def execute(self, *args: Union[str, bytes, int]) -> Any:
+        """Send a command and return its reply."""
+        self._writer.write(encode_command(*args))
+        await self._writer.drain()
+        return await read_reply(self._reader)
+
+    async def close(self) -> None:
+        """Close the connection."""
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+class RedisCacheBackend(CacheBackend):
+    """Cache backend over a Redis-protocol store, with a pool of connections."""
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        db: int = 0,
+        prefix: str = "cts-api:",
+        max_connections: int = 10,
+    ) -> None:
+        """Initialize the object."""
+        self.host = host
+        self.port = port
+        self.db = db
+        self.prefix = prefix
+        self.max_connections = max_connections
+        self._idle: list[RedisConnection] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def execute(self, *args: Union[str, bytes, int]) -> Any:
+        """Run a command on a pooled connection."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+        async with self._slots:
+            connection = (
+                self._idle.pop()
+                if self._idle
+                else await RedisConnection.open(self.host, self.port, self.db)
+            )
+            try:
+                reply = await connection.execute(*args)
+            except RedisError:
+                self._idle.append(connection)
+                raise
+            except BaseException:
+                await connection.close()
+                raise
+            self._idle.append(connection)
+            return reply
+
+    async def close(self) -> None:
+        """Close the pooled connections."""
+        while self._idle:
+            await self._idle.pop().close()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.execute("GET", self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.execute("SET", self.prefix + key, value, "PX", max(1, int(ttl * 1000)))
+
+    async def delete(self, key: str) -> None:
+        await self.execute("DEL", self.prefix + key)
+
+    async def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        token = secrets.token_hex(8)
+        reply = await self.execute(
+            "SET", self.prefix + "lock:" + key, token, "NX", "PX", max(1, int(ttl * 1000))
+        )
+        return token if reply == "OK" else None
+
+    async def release_lock(self, key: str, token: str) -> None:
+        await self.execute("EVAL", RELEASE_LOCK_SCRIPT, 1, self.prefix + "lock:" + key, token)
@@ -1,6 +1,22 @@
-"""Api response models"""
+"""Api request models"""
 
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 from enum import Enum
+from functools import lru_cache
+import hashlib
+from typing import Any, Optional
+from urllib.parse import urlencode
+
+from .const import (
+    RESOURCE_ESTIMATED_TIMETABLE,
+    RESOURCE_GENERAL_MESSAGE,
+    RESOURCE_LINES_DISCOVERY,
+    RESOURCE_STOP_MONITORING,
+    RESOURCE_STOPPOINTS_DISCOVERY,
+    RESOURCE_VEHICLE_MONITORING,
+)
+from .utils import timedelta_isoformat
 
 
 class VehicleMode(Enum):
@@ -10,3 +26,191 @@ class VehicleMode(Enum):
     BUS = 1
     TRAM = 2
     COACH = 3
+
+
+def encode_params(data: Optional[dict[str, Any]]) -> list[tuple[str, str]]:
+    """Encode request parameters, dropping unset values."""
+    params = []
+    for k, v in (data or {}).items():
+        if v is not None:
+            params.append((k, str(v).lower() if isinstance(v, bool) else str(v)))
+    return params
+
+
+@dataclass(frozen=True)
+class PreparedRequest:
+    """Request to a resource with its query string already encoded.
+
+    Prepared requests are immutable and can be reused across polls. Two requests with
+    the same parameters, in any order, have the same key, a stable hash suitable as a
+    cache key shared between processes."""
+
+    resource: str
+    query_string: str
+    key: str = field(compare=False)
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PreparedRequest):
+            return NotImplemented
+        return self.key == other.key
+
+    @staticmethod
+    def from_params(
+        resource: str, data: Optional[dict[str, Any]] = None
+    ) -> "PreparedRequest":
+        """Prepare a request from its parameters."""
+        params = encode_params(data)
+        canonical = resource + "?" + urlencode(sorted(params))
+        return PreparedRequest(
+            resource,
+            urlencode(params),
+            hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest(),
+        )
+
+
+def prepare_general_messages(
+    requestor_ref: Optional[str] = None,
+    message_identfier: Optional[str] = None,
+    info_channel_ref: Optional[list[str]] = None,
+    line_ref: Optional[list[str]] = None,
+    impacted_line_ref: Optional[list[str]] = None,
+) -> PreparedRequest:
+    """Prepare a general message request."""
+    return PreparedRequest.from_params(
+        RESOURCE_GENERAL_MESSAGE,
+        {
+            "RequestorRef": requestor_ref,
+            "MessageIdentifier": message_identfier,
+            "InfoChannelRef": ",".join(info_channel_ref or []),
+            "LineRef": ",".join(line_ref or []),
+            "ImpactedLineRef": ",".join(impacted_line_ref or []),
+        },
+    )
+
+
+def prepare_lines_discovery(
+    requestor_ref: Optional[str] = None,
+    message_identifier: Optional[str] = None,
+) -> PreparedRequest:
+    """Prepare a lines discovery request."""
+    return PreparedRequest.from_params(
+        RESOURCE_LINES_DISCOVERY,
+        {"RequestorRef": requestor_ref, "MessageIdentifier": message_identifier},
+    )
+
+
+def prepare_stoppoints_discovery(
+    requestor_ref: Optional[str] = None,
+    message_identifier: Optional[str] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    distance: Optional[int] = None,
+    include_lines_destinations: Optional[bool] = None,
+    stop_code: Optional[str] = None,
+) -> PreparedRequest:
+    """Prepare a stop points discovery request."""
+    return PreparedRequest.from_params(
+        RESOURCE_STOPPOINTS_DISCOVERY,
+        {
+            "RequestorRef": requestor_ref,
+            "MessageIdentifier": message_identifier,
+            "latitude": latitude,
+            "longitude": longitude,
+            "distance": distance,
+            "includeLinesDestinations": include_lines_destinations,
+            "stopCode": stop_code,
+        },
+    )
+
+
+@lru_cache(maxsize=1024)
+def prepare_stop_monitoring(
+    monitoring_ref: str,
+    requestor_ref: Optional[str] = None,
+    message_identifier: Optional[str] = None,
+    vehicle_mode: Optional[VehicleMode] = VehicleMode.UNDEFINED,
+    preview_interval: Optional[timedelta] = timedelta(hours=1, minutes=30),
+    start_time: Optional[datetime] = None,
+    line_ref: Optional[str] = None,
+    direction_ref: Optional[str] = None,
+    maximum_stop_visits: Optional[int] = 3,
+    minimum_stop_visits_per_line: Optional[int] = 3,
+    include_general_message: Optional[bool] = None,
+    include_fluo67: Optional[bool] = False,
+) -> PreparedRequest:
+    """Prepare a stop monitoring request.
+
+    Prepared requests are memoized, so polling a stop with the same arguments does
+    not encode its parameters again."""
+    return PreparedRequest.from_params(
+        RESOURCE_STOP_MONITORING,
+        {
+            "MonitoringRef": monitoring_ref,
+            "RequestorRef": requestor_ref,
+            "MessageIdentifier": message_identifier,
+            "VehicleMode": (
+                vehicle_mode.name.lower() if vehicle_mode is not None else None
+            ),
+            "PreviewInternal": (
+                timedelta_isoformat(preview_interval)
+                if preview_interval is not None
+                else None
+            ),
+            "StartTime": start_time.isoformat() if start_time is not None else None,
+            "LineRef": line_ref,
+            "DirectionRef": direction_ref,
+            "MaximumStopVisits": maximum_stop_visits,
+            "MinimumStopVisitsPerLine": minimum_stop_visits_per_line,
+            "IncludeGeneralMessage": include_general_message,
+            "IncludeFLUO67": include_fluo67,
+        },
+    )
+
+
+def prepare_vehicle_monitoring(
+    requestor_ref: Optional[str] = None,
+    message_identifier: Optional[str] = None,
+    line_ref: Optional[str] = None,
+    direction_ref: Optional[int] = None,
+    vehicle_mode: Optional[VehicleMode] = None,
+) -> PreparedRequest:
+    """Prepare a vehicle monitoring request."""
+    return PreparedRequest.from_params(
+        RESOURCE_VEHICLE_MONITORING,
+        {
+            "RequestorRef": requestor_ref,
+            "MessageIdentifier": message_identifier,
+            "LineRef": line_ref,
+            "DirectionRef": direction_ref,
+            "VehicleMode": (
+                vehicle_mode.name.lower() if vehicle_mode is not None else None
+            ),
+        },
+    )
+
+
+def prepare_estimated_timetable(
+    requestor_ref: Optional[str] = None,
+    message_identifier: Optional[str] = None,
+    line_ref: Optional[str] = None,
+    direction_ref: Optional[int] = None,
+    preview_interval: Optional[timedelta] = None,
+) -> PreparedRequest:
+    """Prepare an estimated timetable request."""
+    return PreparedRequest.from_params(
+        RESOURCE_ESTIMATED_TIMETABLE,
+        {
+            "RequestorRef": requestor_ref,
+            "MessageIdentifier": message_identifier,
+            "LineRef": line_ref,
+            "DirectionRef": direction_ref,
+            "PreviewInterval": (
+                timedelta_isoformat(preview_interval)
+                if preview_interval is not None
+                else None
+            ),
+        },
+    )
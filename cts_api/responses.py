@@ -1,6 +1,6 @@
 """Api response models"""
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
@@ -140,6 +140,23 @@ class MonitoredVehicleJourney:
     previous_call: List[PreviousCall]
     onward_call: List[OnwardCall]
 
+    @property
+    def journey_ref(self) -> str:
+        """Returns a reference identifying the journey across stops and polls.
+
+        Without DatedVehicleJourneyRef, the journey cannot be followed across stops
+        and polls, and the reference identifies the departure of the monitored call
+        instead, so that successive vehicles of a line are not merged."""
+        journey_ref = self.framed_vehicle_journey_ref.get("DatedVehicleJourneyRef")
+        if journey_ref:
+            return journey_ref
+        call = self.monitored_call
+        time = call.expected_departure_time or call.expected_arrival_time
+        return (
+            f"{self.line_ref}:{self.direction_ref}:{self.destination_name}"
+            f"@{call.stop_code}:{time.isoformat() if time is not None else ''}"
+        )
+
     @staticmethod
     def from_dict(data: Dict[str, Any]) -> "MonitoredVehicleJourney":
         """Convert the dictionary to the response object."""
@@ -657,6 +674,7 @@ class GeneralMessageResponse:
     """Describe the API response."""
 
     service_delivery: ServiceDelivery
+    stale: bool = field(default=False, compare=False)
 
     @staticmethod
     def from_dict(data: Dict[str, Any]) -> "GeneralMessageResponse":
@@ -711,6 +729,7 @@ class LinesDiscoveryResponse:
     """Describe the API response."""
 
     lines_delivery: LinesDelivery
+    stale: bool = field(default=False, compare=False)
 
     @staticmethod
     def from_dict(data: Dict[str, Any]) -> "LinesDiscoveryResponse":
@@ -815,6 +834,7 @@ class StopPointsDiscoveryResponse:
     """Describe the stoppoints-discovery API response."""
 
     stop_points_delivery: StopPointsDelivery
+    stale: bool = field(default=False, compare=False)
 
     @staticmethod
     def from_dict(data: Dict[str, Any]) -> "StopPointsDiscoveryResponse":
@@ -836,6 +856,7 @@ class StopMonitoringResponse:
     """Describe the stop-monitoring API response."""
 
     service_delivery: ServiceDelivery
+    stale: bool = field(default=False, compare=False)
 
     @staticmethod
     def from_dict(data: Dict[str, Any]) -> "StopMonitoringResponse":
@@ -846,3 +867,43 @@ class StopMonitoringResponse:
 
 
 # endregion
+
+# region vehicle-monitoring
+
+
+@dataclass
+class VehicleMonitoringResponse:
+    """Describe the vehicle-monitoring API response."""
+
+    service_delivery: ServiceDelivery
+    stale: bool = field(default=False, compare=False)
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "VehicleMonitoringResponse":
+        """Convert the dictionary to the response object."""
+        return VehicleMonitoringResponse(
+            service_delivery=ServiceDelivery.from_dict(data.get("ServiceDelivery", {}))
+        )
+
+
+# endregion
+
+# region estimated-timetable
+
+
+@dataclass
+class EstimatedTimetableResponse:
+    """Describe the estimated-timetable API response."""
+
+    service_delivery: ServiceDelivery
+    stale: bool = field(default=False, compare=False)
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "EstimatedTimetableResponse":
+        """Convert the dictionary to the response object."""
+        return EstimatedTimetableResponse(
+            service_delivery=ServiceDelivery.from_dict(data.get("ServiceDelivery", {}))
+        )
+
+
+# endregion
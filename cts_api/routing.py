@@ -0,0 +1,203 @@
+"""Earliest-arrival journey planning over monitored departures."""
+
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Mapping, Optional
+
+from .journeys import Journey, JourneyStore
+from .responses import StopMonitoringResponse, StopPointsDiscoveryResponse
+
+# Departure, arrival (epoch seconds), from stop, to stop, journey ref.
+Connection = tuple[int, int, str, str, str]
+
+
+@dataclass
+class Leg:
+    """Ride on a journey between two stops."""
+
+    journey_ref: str
+    line_ref: str
+    from_stop: str
+    to_stop: str
+    departure: datetime
+    arrival: datetime
+
+
+class ConnectionRouter:
+    """Answers earliest-arrival queries with the connection scan algorithm.
+
+    Each pair of consecutive calls of a journey is a connection. Connections are kept
+    sorted by departure time, and replaced journey by journey as new polls arrive, so
+    queries only scan the connections departing after the requested time.
+
+    Stops sharing a logical stop code, e.g. the platforms of a station, are joined by
+    footpaths taking the transfer time. logical_stops maps stop codes to their logical
+    stop code, and can be completed with add_stop_points()."""
+
+    def __init__(
+        self,
+        journeys: Optional[JourneyStore] = None,
+        logical_stops: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        """Initialize the object."""
+        self.journeys = journeys or JourneyStore()
+        self.connections: list[Connection] = []
+        self._journey_connections: dict[str, list[Connection]] = {}
+        self.logical_stops: dict[str, str] = {}
+        self._stop_groups: dict[str, list[str]] = {}
+        for stop_code, logical_stop_code in (logical_stops or {}).items():
+            self.add_logical_stop(stop_code, logical_stop_code)
+
+    def add_logical_stop(self, stop_code: str, logical_stop_code: str) -> None:
+        """Join a stop to the other stops of a logical stop."""
+        previous = self.logical_stops.get(stop_code)
+        if previous == logical_stop_code:
+            return
+        if previous is not None:
+            self._stop_groups[previous].remove(stop_code)
+        self.logical_stops[stop_code] = logical_stop_code
+        self._stop_groups.setdefault(logical_stop_code, []).append(stop_code)
+
+    def add_stop_points(self, response: StopPointsDiscoveryResponse) -> None:
+        """Join the stops of a stoppoints-discovery response by logical stop code."""
+        for stop_point in response.stop_points_delivery.annotated_stop_point_ref:
+            stop_code = stop_point.extension.stop_code or stop_point.stop_point_ref
+            if stop_code and stop_point.extension.logical_stop_code:
+                self.add_logical_stop(
+                    stop_code, stop_point.extension.logical_stop_code
+                )
+
+    def _group(self, stop_code: str) -> list[str]:
+        """Returns the stops of the logical stop of a stop, the stop alone if none."""
+        logical_stop_code = self.logical_stops.get(stop_code)
+        if logical_stop_code is None:
+            return [stop_code]
+        return self._stop_groups[logical_stop_code]
+
+    def add(self, response: StopMonitoringResponse) -> None:
+        """Update the connections with a stop-monitoring response."""
+        updated = {}
+        for delivery in response.service_delivery.stop_monitoring_delivery:
+            for visit in delivery.monitored_stop_visit:
+                journey = self.journeys.add_visit(visit, delivery.response_timestamp)
+                updated[journey.journey_ref] = journey
+        for journey in updated.values():
+            self.update_journey(journey)
+
+    def update_journey(self, journey: Journey) -> None:
+        """Replace the connections of a journey."""
+        for connection in self._journey_connections.pop(journey.journey_ref, []):
+            del self.connections[bisect_left(self.connections, connection)]
+
+        calls = [
+            (
+                call.stop_code,
+                call.expected_arrival_time or call.expected_departure_time,
+                call.expected_departure_time or call.expected_arrival_time,
+            )
+            for call in journey.stops()
+            if call.expected_departure_time or call.expected_arrival_time
+        ]
+        connections = []
+        for (from_stop, _, departure), (to_stop, arrival, _) in zip(calls, calls[1:]):
+            connection = (
+                int(departure.timestamp()),
+                int(arrival.timestamp()),
+                from_stop,
+                to_stop,
+                journey.journey_ref,
+            )
+            insort(self.connections, connection)
+            connections.append(connection)
+        self._journey_connections[journey.journey_ref] = connections
+
+    def prune(self, before: datetime) -> int:
+        """Drop the connections departing before a time and return how many."""
+        count = bisect_left(self.connections, (int(before.timestamp()),))
+        for connection in self.connections[:count]:
+            journey_connections = self._journey_connections[connection[4]]
+            journey_connections.remove(connection)
+            if not journey_connections:
+                del self._journey_connections[connection[4]]
+        del self.connections[:count]
+        return count
+
+    def earliest_arrival(
+        self,
+        source: str,
+        target: str,
+        departure: datetime,
+        transfer_time: timedelta = timedelta(minutes=2),
+    ) -> Optional[list[Leg]]:
+        """Returns the legs arriving the earliest at target, None if it is unreachable.
+
+        Any stop of the logical stop of source or target may be used to depart or
+        arrive, and an empty list is returned when they are the same logical stop.
+        Changing journeys takes at least transfer_time, including the walk to another
+        stop of the same logical stop: consecutive legs may then end and start at
+        different stops."""
+        sources = set(self._group(source))
+        targets = set(self._group(target))
+        if target in sources:
+            return []
+        start = int(departure.timestamp())
+        transfer = int(transfer_time.total_seconds())
+        # Earliest time a journey can be boarded at each stop, and the stop reached
+        # by a journey it is walked from.
+        ready = dict.fromkeys(sources, start)
+        walked_from: dict[str, str] = {}
+        arrival: dict[str, int] = {}
+        best: Optional[str] = None
+        # Connection boarding each journey, and legs reaching each stop.
+        boarded: dict[str, Connection] = {}
+        reached_by: dict[str, tuple[Connection, Connection]] = {}
+
+        position = bisect_left(self.connections, (start,))
+        for connection in self.connections[position:]:
+            dep, arr, from_stop, to_stop, journey_ref = connection
+            if best is not None and arrival[best] <= dep:
+                break
+            if journey_ref not in boarded:
+                if ready.get(from_stop, dep + 1) > dep:
+                    continue
+                boarded[journey_ref] = connection
+            if arr >= arrival.get(to_stop, arr + 1):
+                continue
+            arrival[to_stop] = arr
+            reached_by[to_stop] = (boarded[journey_ref], connection)
+            if to_stop in targets and (best is None or arr < arrival[best]):
+                best = to_stop
+            for stop in self._group(to_stop):
+                if stop not in sources and arr + transfer < ready.get(
+                    stop, arr + transfer + 1
+                ):
+                    ready[stop] = arr + transfer
+                    walked_from[stop] = to_stop
+
+        if best is None:
+            return None
+
+        legs = []
+        stop = best
+        while stop not in sources:
+            first, last = reached_by[stop]
+            legs.append(self._leg(first, last, departure))
+            stop = first[2]
+            if stop not in sources:
+                stop = walked_from[stop]
+        legs.reverse()
+        return legs
+
+    def _leg(self, first: Connection, last: Connection, departure: datetime) -> Leg:
+        """Returns the leg from the first to the last connection of a journey."""
+        journey = self.journeys.get(first[4])
+        tzinfo = departure.tzinfo or timezone.utc
+        return Leg(
+            first[4],
+            journey.line_ref if journey is not None else "",
+            first[2],
+            last[3],
+            datetime.fromtimestamp(first[0], tzinfo),
+            datetime.fromtimestamp(last[1], tzinfo),
+        )
@@ -0,0 +1,180 @@
+"""Demand-aware polling of stop monitoring within a rate budget."""
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import logging
+import time
+from typing import Callable, Optional
+
+from .client import CtsApi
+from .exceptions import CtsError
+from .ratelimit import TokenBucket
+from .responses import StopMonitoringResponse
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class StopDemand:
+    """Demand and polling state of a stop."""
+
+    monitoring_ref: str
+    demand: float = 0.0
+    demand_at: float = 0.0
+    polled_at: Optional[float] = None
+    next_departure: Optional[datetime] = None
+    response: Optional[StopMonitoringResponse] = None
+
+
+def next_departure(response: StopMonitoringResponse) -> Optional[datetime]:
+    """Returns the earliest expected departure of a stop-monitoring response."""
+    departures = [
+        visit.monitored_vehicle_journey.monitored_call.expected_departure_time
+        for delivery in response.service_delivery.stop_monitoring_delivery
+        for visit in delivery.monitored_stop_visit
+    ]
+    departures = [d for d in departures if d is not None]
+    return min(departures) if departures else None
+
+
+class AdaptivePoller:
+    """Polls stop monitoring for the stops in demand, within a rate budget.
+
+    Each view of a stop adds to its demand, which decays with half_life. The budget of
+    rate requests per second is shared in proportion to the demand: the hottest stops
+    are refreshed every cycle, colder ones less often, down to max_interval, and the
+    stops under cold_demand are only fetched on demand. A stop whose next departure is
+    within departure_window is refreshed every cycle. Stops whose demand decayed under
+    forget_demand are forgotten."""
+
+    def __init__(
+        self,
+        api: CtsApi,
+        rate: float,
+        cycle: timedelta = timedelta(seconds=30),
+        max_interval: timedelta = timedelta(minutes=10),
+        half_life: timedelta = timedelta(minutes=10),
+        cold_demand: float = 0.5,
+        departure_window: timedelta = timedelta(minutes=2),
+        forget_demand: float = 0.01,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize the object."""
+        self.api = api
+        self.budget = TokenBucket(rate, burst=rate * cycle.total_seconds(), clock=clock)
+        self.cycle = cycle.total_seconds()
+        self.max_interval = max_interval.total_seconds()
+        self.half_life = half_life.total_seconds()
+        self.cold_demand = cold_demand
+        self.departure_window = departure_window
+        self.forget_demand = forget_demand
+        self._clock = clock
+        self.stops: dict[str, StopDemand] = {}
+
+    def _decayed(self, stop: StopDemand, now: float) -> float:
+        """Returns the demand of a stop decayed up to now."""
+        return stop.demand * 0.5 ** ((now - stop.demand_at) / self.half_life)
+
+    def record_demand(self, monitoring_ref: str, weight: float = 1.0) -> StopDemand:
+        """Record views of a stop."""
+        now = self._clock()
+        stop = self.stops.get(monitoring_ref)
+        if stop is None:
+            stop = self.stops[monitoring_ref] = StopDemand(monitoring_ref)
+        stop.demand = self._decayed(stop, now) + weight
+        stop.demand_at = now
+        return stop
+
+    def total_demand(self, now: float) -> float:
+        """Returns the demand of all the stops decayed up to now."""
+        return sum(self._decayed(s, now) for s in self.stops.values())
+
+    def interval(
+        self, stop: StopDemand, now: float, total: Optional[float] = None
+    ) -> Optional[float]:
+        """Returns the polling interval of a stop, None if it is only fetched on demand.
+
+        total is the total demand at now, computed when not given."""
+        demand = self._decayed(stop, now)
+        if demand < self.cold_demand:
+            return None
+        if total is None:
+            total = self.total_demand(now)
+        interval = total / (self.budget.rate * demand)
+        if stop.next_departure is not None:
+            remaining = stop.next_departure - datetime.now(stop.next_departure.tzinfo)
+            if remaining <= self.departure_window:
+                interval = self.cycle
+        return min(max(interval, self.cycle), self.max_interval)
+
+    def due(self, now: Optional[float] = None) -> list[StopDemand]:
+        """Returns the stops to refresh, the most overdue and in demand first."""
+        now = self._clock() if now is None else now
+        demands = {ref: self._decayed(stop, now) for ref, stop in self.stops.items()}
+        for ref, demand in demands.items():
+            if demand < self.forget_demand:
+                del self.stops[ref]
+        total = sum(demands.values())
+
+        ranked = []
+        for stop in self.stops.values():
+            interval = self.interval(stop, now, total)
+            if interval is None:
+                continue
+            if stop.polled_at is None:
+                overdue = float("inf")
+            else:
+                overdue = (now - stop.polled_at) / interval
+            if overdue >= 1:
+                ranked.append((overdue, demands[stop.monitoring_ref], stop))
+        ranked.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        return [stop for _, _, stop in ranked]
+
+    async def _fetch(self, stop: StopDemand) -> StopMonitoringResponse:
+        """Refresh a stop."""
+        stop.polled_at = self._clock()
+        response = await self.api.stop_monitoring(stop.monitoring_ref)
+        stop.response = response
+        stop.next_departure = next_departure(response)
+        return response
+
+    async def _poll(self, stop: StopDemand) -> None:
+        """Refresh a stop in the background."""
+        try:
+            await self._fetch(stop)
+        except CtsError as err:
+            _LOGGER.warning("Polling %s failed: %s", stop.monitoring_ref, err)
+
+    async def tick(self) -> int:
+        """Refresh the due stops within the budget and return how many were polled."""
+        polls = []
+        for stop in self.due():
+            if not self.budget.try_acquire():
+                break
+            polls.append(self._poll(stop))
+        await asyncio.gather(*polls)
+        return len(polls)
+
+    async def run(self, tick_interval: float = 1.0) -> None:
+        """Poll forever."""
+        while True:
+            await self.tick()
+            await asyncio.sleep(tick_interval)
+
+    async def get(self, monitoring_ref: str) -> StopMonitoringResponse:
+        """Returns the departures of a stop, recording the demand.
+
+        The last polled response is returned if it is recent enough, otherwise the
+        stop is fetched now."""
+        stop = self.record_demand(monitoring_ref)
+        now = self._clock()
+        if (
+            stop.response is not None
+            and stop.polled_at is not None
+            and now - stop.polled_at < (self.interval(stop, now) or self.cycle)
+        ):
+            return stop.response
+
+        await self.budget.acquire()
+        return await self._fetch(stop)
@@ -0,0 +1,153 @@
+"""Autocomplete index of stop names."""
+
+from bisect import bisect_left
+from dataclasses import dataclass, field
+import re
+import unicodedata
+from typing import Iterable
+
+from .responses import AnnotatedStopPointRef, StopPointsDiscoveryResponse
+
+_SEPARATORS = re.compile(r"[^0-9a-z]+")
+
+
+def fold(text: str) -> str:
+    """Returns a text lowercased, without accents nor punctuation."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(_SEPARATORS.sub(" ", stripped.casefold()).split())
+
+
+def trigrams(text: str) -> set[str]:
+    """Returns the trigrams of a folded text, padded at word boundaries."""
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class StopGroup:
+    """Stop points sharing a logical stop code, e.g. both platforms of a stop."""
+
+    logical_stop_code: str
+    stop_name: str
+    stop_points: list[AnnotatedStopPointRef] = field(default_factory=list)
+
+
+@dataclass
+class SearchResult:
+    """Stop group matching a query, the best matches having the highest score."""
+
+    group: StopGroup
+    score: float
+
+
+class StopSearchIndex:
+    """Prefix and fuzzy search of stops by name.
+
+    Words of the folded names are kept in a sorted list, so the words starting with a
+    prefix are a contiguous range found by bisection. When fewer stops than requested
+    match, the results are completed with the names sharing the most trigrams with
+    the query, to tolerate typos."""
+
+    def __init__(self, stop_points: Iterable[AnnotatedStopPointRef] = ()) -> None:
+        """Initialize the object."""
+        self.groups: list[StopGroup] = []
+        self._names: list[str] = []
+        self._by_code: dict[str, int] = {}
+        self._words: list[tuple[str, int]] = []
+        self._trigrams: dict[str, list[int]] = {}
+        self._trigram_counts: list[int] = []
+        self.add(stop_points)
+
+    @staticmethod
+    def from_response(response: StopPointsDiscoveryResponse) -> "StopSearchIndex":
+        """Build the index of a stop points discovery response."""
+        return StopSearchIndex(response.stop_points_delivery.annotated_stop_point_ref)
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    def add(self, stop_points: Iterable[AnnotatedStopPointRef]) -> None:
+        """Index stop points."""
+        for stop_point in stop_points:
+            code = (
+                stop_point.extension.logical_stop_code
+                or stop_point.extension.stop_code
+                or stop_point.stop_point_ref
+            )
+            index = self._by_code.get(code)
+            if index is not None:
+                self.groups[index].stop_points.append(stop_point)
+                continue
+
+            index = self._by_code[code] = len(self.groups)
+            self.groups.append(StopGroup(code, stop_point.stop_name, [stop_point]))
+            name = fold(stop_point.stop_name)
+            self._names.append(name)
+            for word in set(name.split()):
+                self._words.append((word, index))
+            name_trigrams = trigrams(name)
+            self._trigram_counts.append(len(name_trigrams))
+            for trigram in name_trigrams:
+                self._trigrams.setdefault(trigram, []).append(index)
+        self._words.sort()
+
+    def _prefixed(self, prefix: str) -> set[int]:
+        """Returns the groups having a word starting with a prefix."""
+        matches = set()
+        words = self._words
+        position = bisect_left(words, (prefix, -1))
+        while position < len(words) and words[position][0].startswith(prefix):
+            matches.add(words[position][1])
+            position += 1
+        return matches
+
+    def search(
+        self, query: str, limit: int = 10, min_similarity: float = 0.3
+    ) -> list[SearchResult]:
+        """Returns the stop groups matching a query, best first.
+
+        Each word of the query must start a word of the name. Exact names rank first,
+        then names starting with the query, then the shortest names."""
+        folded = fold(query)
+        if not folded:
+            return []
+
+        words = folded.split()
+        matches = self._prefixed(words[0])
+        for word in words[1:]:
+            if not matches:
+                break
+            matches &= self._prefixed(word)
+
+        results = []
+        for index in matches:
+            name = self._names[index]
+            score = 2.0 if name == folded else 1.0 if name.startswith(folded) else 0.5
+            results.append(SearchResult(self.groups[index], score + 1 / (1 + len(name))))
+
+        if len(results) < limit:
+            results.extend(self._fuzzy(folded, matches, min_similarity))
+        results.sort(key=lambda r: (-r.score, r.group.stop_name))
+        return results[:limit]
+
+    def _fuzzy(
+        self, folded: str, excluded: set[int], min_similarity: float
+    ) -> list[SearchResult]:
+        """Returns the groups whose name shares enough trigrams with a query."""
+        query_trigrams = trigrams(folded)
+        shared: dict[int, int] = {}
+        for trigram in query_trigrams:
+            for index in self._trigrams.get(trigram, []):
+                shared[index] = shared.get(index, 0) + 1
+
+        results = []
+        for index, count in shared.items():
+            if index in excluded:
+                continue
+            total = len(query_trigrams) + self._trigram_counts[index] - count
+            similarity = count / total
+            if similarity >= min_similarity:
+                # Below the prefix matches, whose score is at least 0.5.
+                results.append(SearchResult(self.groups[index], similarity / 2))
+        return results
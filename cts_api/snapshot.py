@@ -0,0 +1,290 @@
+"""Read-only departure snapshots shared between processes through mmap."""
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import mmap
+import os
+import struct
+import tempfile
+from typing import Iterable, Iterator, Optional
+
+from .archive import MISSING, StringTable
+from .responses import MonitoredStopVisit
+
+MAGIC = b"CTSD"
+VERSION = 1
+
+# Magic, version, generation time, records, strings, string bytes, stops, lines.
+_HEADER = struct.Struct("<4sHxxqIIIII")
+# Stop code, monitoring ref, stop name, line ref, line name, destination name,
+# journey ref, vehicle mode (string ids), direction, departure, arrival, recording.
+_RECORD = struct.Struct("<8Iiqqq")
+# Key (string id), first position and count of its records.
+_INDEX = struct.Struct("<III")
+_U32 = struct.Struct("<I")
+
+
+@dataclass
+class Departure:
+    """Departure of a journey at a stop, as read from a snapshot."""
+
+    stop_code: str
+    monitoring_ref: str
+    stop_name: str
+    line_ref: str
+    published_line_name: str
+    destination_name: str
+    journey_ref: str
+    vehicle_mode: str
+    direction_ref: int
+    expected_departure_time: Optional[datetime]
+    expected_arrival_time: Optional[datetime]
+    recorded_at_time: Optional[datetime]
+
+
+def _epoch(value: Optional[datetime]) -> int:
+    """Returns the epoch seconds of a time, MISSING if there is none."""
+    return int(value.timestamp()) if value is not None else MISSING
+
+
+def _time(epoch: int) -> Optional[datetime]:
+    """Returns the UTC time of epoch seconds."""
+    return datetime.fromtimestamp(epoch, timezone.utc) if epoch != MISSING else None
+
+
+def _index(
+    keys: list[int], order: list[int], strings: list[bytes]
+) -> tuple[bytes, int]:
+    """Returns the index of the contiguous keys of ordered records, sorted by key."""
+    entries = []
+    start = 0
+    while start < len(order):
+        end = start
+        while end < len(order) and keys[order[end]] == keys[order[start]]:
+            end += 1
+        entries.append((keys[order[start]], start, end - start))
+        start = end
+    entries.sort(key=lambda entry: strings[entry[0]])
+    return b"".join(_INDEX.pack(*entry) for entry in entries), len(entries)
+
+
+def write_snapshot(
+    path: str,
+    visits: Iterable[MonitoredStopVisit],
+    generated_at: Optional[datetime] = None,
+) -> int:
+    """Write the visits to a snapshot file and return the number of records.
+
+    The file is written next to path and atomically renamed over it, so readers
+    always see either the previous or the new snapshot. It is readable by all users,
+    so that readers may run under another account."""
+    strings = StringTable()
+    records = []
+    for visit in visits:
+        journey = visit.monitored_vehicle_journey
+        call = journey.monitored_call
+        records.append(
+            (
+                strings.encode(visit.stop_code or call.stop_code),
+                strings.encode(visit.monitoring_ref),
+                strings.encode(call.stop_point_name),
+                strings.encode(journey.line_ref),
+                strings.encode(journey.published_line_name),
+                strings.encode(journey.destination_name),
+                strings.encode(journey.journey_ref),
+                strings.encode(journey.vehicle_mode),
+                journey.direction_ref,
+                _epoch(call.expected_departure_time),
+                _epoch(call.expected_arrival_time),
+                _epoch(visit.recorded_at_time),
+            )
+        )
+
+    encoded = [value.encode() for value in strings.values]
+
+    def departure(record: tuple) -> int:
+        return record[9] if record[9] != MISSING else record[10]
+
+    # Records are stored by stop, lines reference them through a separate order.
+    records.sort(key=lambda record: (encoded[record[0]], departure(record)))
+    line_order = sorted(
+        range(len(records)),
+        key=lambda i: (encoded[records[i][3]], departure(records[i])),
+    )
+    stop_index, stops = _index(
+        [record[0] for record in records], list(range(len(records))), encoded
+    )
+    line_index, lines = _index([record[3] for record in records], line_order, encoded)
+
+    offsets = [0]
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    blob = b"".join(encoded)
+
+    header = _HEADER.pack(
+        MAGIC,
+        VERSION,
+        _epoch(generated_at or datetime.now(timezone.utc)),
+        len(records),
+        len(encoded),
+        len(blob),
+        stops,
+        lines,
+    )
+    directory, name = os.path.split(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(prefix=f".{name}.", dir=directory)
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(header)
+            file.write(b"".join(_U32.pack(offset) for offset in offsets))
+            file.write(blob)
+            file.write(b"".join(_RECORD.pack(*record) for record in records))
+            file.write(stop_index)
+            file.write(line_index)
+            file.write(b"".join(_U32.pack(i) for i in line_order))
+            file.flush()
+            os.fsync(file.fileno())
+        # mkstemp creates the file readable by its owner only.
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return len(records)
+
+
+class DepartureSnapshot:
+    """Memory-mapped snapshot of departures, indexed by stop code and line ref.
+
+    The file is mapped read-only, so the processes reading the same snapshot share
+    its pages, and only the records of the requested stops or lines are decoded.
+    refresh() maps the new file once a writer has replaced it."""
+
+    def __init__(self, path: str) -> None:
+        """Initialize the object."""
+        self.path = path
+        self._mmap: Optional[mmap.mmap] = None
+        self._inode: Optional[int] = None
+        self.refresh()
+
+    def __enter__(self) -> "DepartureSnapshot":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._records_count
+
+    def close(self) -> None:
+        """Unmap the snapshot."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def refresh(self) -> bool:
+        """Map the snapshot file again if it was replaced, returns whether it was."""
+        with open(self.path, "rb") as file:
+            inode = os.fstat(file.fileno()).st_ino
+            if inode == self._inode:
+                return False
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (
+            magic,
+            version,
+            generated_at,
+            records,
+            strings,
+            size,
+            stops,
+            lines,
+        ) = _HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            buffer.close()
+            raise ValueError(f"{self.path} is not a departure snapshot")
+
+        self.close()
+        self._mmap = buffer
+        self._inode = inode
+        self.generated_at = _time(generated_at)
+        self._records_count = records
+        self._stops_count = stops
+        self._lines_count = lines
+        self._strings = _HEADER.size
+        self._blob = self._strings + (strings + 1) * _U32.size
+        self._records = self._blob + size
+        self._stop_index = self._records + records * _RECORD.size
+        self._line_index = self._stop_index + stops * _INDEX.size
+        self._line_order = self._line_index + lines * _INDEX.size
+        return True
+
+    def _bytes(self, index: int) -> bytes:
+        """Returns the encoded string of an id."""
+        assert self._mmap is not None
+        start = _U32.unpack_from(self._mmap, self._strings + index * _U32.size)[0]
+        end = _U32.unpack_from(self._mmap, self._strings + (index + 1) * _U32.size)[0]
+        return self._mmap[self._blob + start : self._blob + end]
+
+    def _string(self, index: int) -> str:
+        """Returns the string of an id."""
+        return self._bytes(index).decode()
+
+    def _find(self, offset: int, count: int, key: str) -> tuple[int, int]:
+        """Returns the first position and count of the records of a key."""
+        encoded = key.encode()
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            string, start, length = _INDEX.unpack_from(
+                self._mmap, offset + middle * _INDEX.size
+            )
+            value = self._bytes(string)
+            if value == encoded:
+                return start, length
+            if value < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        return 0, 0
+
+    def _keys(self, offset: int, count: int) -> Iterator[str]:
+        """Returns the keys of an index."""
+        for position in range(count):
+            entry = offset + position * _INDEX.size
+            yield self._string(_INDEX.unpack_from(self._mmap, entry)[0])
+
+    def _departure(self, position: int) -> Departure:
+        """Decode a record."""
+        offset = self._records + position * _RECORD.size
+        record = _RECORD.unpack_from(self._mmap, offset)
+        return Departure(
+            *(self._string(index) for index in record[:8]),
+            direction_ref=record[8],
+            expected_departure_time=_time(record[9]),
+            expected_arrival_time=_time(record[10]),
+            recorded_at_time=_time(record[11]),
+        )
+
+    def stop_codes(self) -> Iterator[str]:
+        """Returns the stop codes of the snapshot."""
+        return self._keys(self._stop_index, self._stops_count)
+
+    def line_refs(self) -> Iterator[str]:
+        """Returns the line refs of the snapshot."""
+        return self._keys(self._line_index, self._lines_count)
+
+    def stop(self, stop_code: str) -> list[Departure]:
+        """Returns the departures at a stop, the earliest first."""
+        start, count = self._find(self._stop_index, self._stops_count, stop_code)
+        return [self._departure(position) for position in range(start, start + count)]
+
+    def line(self, line_ref: str) -> list[Departure]:
+        """Returns the departures of a line, the earliest first."""
+        start, count = self._find(self._line_index, self._lines_count, line_ref)
+        return [
+            self._departure(
+                _U32.unpack_from(self._mmap, self._line_order + i * _U32.size)[0]
+            )
+            for i in range(start, start + count)
+        ]
@@ -0,0 +1,105 @@
+"""Incremental extraction of array elements from a JSON body."""
+
+import json
+import re
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Optional
+
+# Characters changing the state of the scanner outside and inside strings.
+_STRUCTURE = re.compile(rb'["{}\[\]:]')
+_STRING = re.compile(rb'["\\]')
+
+
+class JsonArrayScanner:
+    """Extracts the objects of the arrays of given keys from chunks of a JSON body.
+
+    Only the elements being decoded are buffered, so the memory used does not grow
+    with the size of the body. Arrays are matched by key at any depth, e.g.
+    "MonitoredStopVisit" in a stop-monitoring response."""
+
+    def __init__(self, keys: Iterable[str]) -> None:
+        """Initialize the object."""
+        self.keys = {key.encode() for key in keys}
+        # Key of each open container whose elements are captured, None otherwise.
+        self._stack: list[Optional[bytes]] = []
+        self._in_string = False
+        self._escape = False
+        self._string = bytearray()
+        self._key = b""
+        self._element = bytearray()
+        self._element_key = b""
+        self._element_depth = 0
+
+    def feed(self, chunk: bytes) -> list[tuple[str, bytes]]:
+        """Scan a chunk and return the (key, raw JSON) of the completed elements."""
+        elements = []
+        capture_from = 0 if self._element_depth else None
+        position = 0
+        while position < len(chunk):
+            if self._in_string:
+                position = self._scan_string(chunk, position)
+                continue
+
+            match = _STRUCTURE.search(chunk, position)
+            if match is None:
+                break
+            position = match.end()
+            char = match.group()
+            if char == b'"':
+                self._in_string = True
+                self._string.clear()
+            elif char == b":":
+                self._key = bytes(self._string)
+            elif char in b"{[":
+                parent = self._stack[-1] if self._stack else None
+                if self._element_depth:
+                    self._element_depth += 1
+                elif parent is not None and char == b"{":
+                    self._element_depth = 1
+                    self._element_key = parent
+                    capture_from = position - 1
+                captured = char == b"[" and not self._element_depth and self._key in self.keys
+                self._stack.append(self._key if captured else None)
+                self._key = b""
+            elif char in b"}]":
+                self._stack.pop()
+                if self._element_depth:
+                    self._element_depth -= 1
+                    if not self._element_depth:
+                        self._element.extend(chunk[capture_from:position])
+                        elements.append(
+                            (self._element_key.decode(), bytes(self._element))
+                        )
+                        self._element.clear()
+                        capture_from = None
+
+        if self._element_depth and capture_from is not None:
+            self._element.extend(chunk[capture_from:])
+        return elements
+
+    def _scan_string(self, chunk: bytes, position: int) -> int:
+        """Scan a chunk inside a string and return the position after it."""
+        if self._escape:
+            self._escape = False
+            self._string.extend(chunk[position : position + 1])
+            return position + 1
+        match = _STRING.search(chunk, position)
+        if match is None:
+            self._string.extend(chunk[position:])
+            return len(chunk)
+        self._string.extend(chunk[position : match.start()])
+        if match.group() == b"\\":
+            self._escape = True
+            self._string.extend(b"\\")
+        else:
+            self._in_string = False
+        return match.end()
+
+
+async def iter_elements(
+    chunks: AsyncIterable[bytes], keys: Iterable[str]
+) -> AsyncIterator[tuple[str, Any]]:
+    """Yields the (key, decoded object) of the elements of the arrays of given keys."""
+    scanner = JsonArrayScanner(keys)
+    async for chunk in chunks:
+        for key, element in scanner.feed(chunk):
+            yield key, json.loads(element)
@@ -0,0 +1 @@
+"""Test helpers for the CTS API client."""
@@ -0,0 +1,115 @@
+"""In-process stand-in for a Redis-protocol store, for tests of the shared cache.
+
+Only the commands used by RedisCacheBackend are implemented. EVAL only supports the
+lock release script."""
+
+import asyncio
+import time
+from typing import Any, Optional
+
+from ..redis_backend import RELEASE_LOCK_SCRIPT
+
+
+def _encode(value: Any) -> bytes:
+    """Encode a reply."""
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, Exception):
+        return b"-ERR %s\r\n" % str(value).encode()
+    return b"+%s\r\n" % str(value).encode()
+
+
+class FakeRedisServer:
+    """Minimal RESP server storing values in memory."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        """Initialize the object."""
+        self.host = host
+        self.port = port
+        self.commands: dict[str, int] = {}
+        self._values: dict[bytes, tuple[bytes, Optional[float]]] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        """Start the server."""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        """Stop the server."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "FakeRedisServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.stop()
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                args = []
+                for _ in range(int(line[1:-2])):
+                    length = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                writer.write(_encode(self._execute(args)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        item = self._values.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= time.monotonic():
+            del self._values[key]
+            return None
+        return item[0]
+
+    def _execute(self, args: list[bytes]) -> Any:
+        command = args[0].decode().upper()
+        self.commands[command] = self.commands.get(command, 0) + 1
+        if command == "PING":
+            return "PONG"
+        if command == "SELECT":
+            return "OK"
+        if command == "GET":
+            return self._get(args[1])
+        if command == "DEL":
+            return sum(self._values.pop(key, None) is not None for key in args[1:])
+        if command == "SET":
+            key, value = args[1], args[2]
+            options = [a.decode().upper() for a in args[3:]]
+            expires_at = None
+            if "PX" in options:
+                milliseconds = int(options[options.index("PX") + 1])
+                expires_at = time.monotonic() + milliseconds / 1000
+            if "NX" in options and self._get(key) is not None:
+                return None
+            self._values[key] = (value, expires_at)
+            return "OK"
+        if command == "EVAL" and args[1].decode() == RELEASE_LOCK_SCRIPT:
+            key, token = args[3], args[4]
+            if self._get(key) == token:
+                del self._values[key]
+                return 1
+            return 0
+        if command == "FLUSHALL":
+            self._values.clear()
+            return "OK"
+        return Exception(f"unknown command '{command}'")
@@ -0,0 +1,695 @@
+"""Local SIRI stub server replaying a synthetic network, for integration and load
+tests of the client."""
+
+import argparse
+import asyncio
+import copy
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import hashlib
+import json
+import math
+from pathlib import Path
+import random
+from typing import Any, Optional
+
+from aiohttp import hdrs, web
+
+from ..const import (
+    RESOURCE_ESTIMATED_TIMETABLE,
+    RESOURCE_GENERAL_MESSAGE,
+    RESOURCE_LINES_DISCOVERY,
+    RESOURCE_STOP_MONITORING,
+    RESOURCE_STOPPOINTS_DISCOVERY,
+    RESOURCE_VEHICLE_MONITORING,
+)
+
+BASE_PATH = "/v1/siri/2.0"
+
+# Minimal templates, used when no fixtures directory is given.
+DEFAULT_TEMPLATES: dict[str, dict[str, Any]] = {
+    "line": {
+        "LineRef": "",
+        "LineName": "",
+        "Destinations": [],
+        "Extension": {"RouteType": "bus", "RouteColor": "", "RouteTextColor": ""},
+    },
+    "stop": {
+        "StopPointRef": "",
+        "Lines": [],
+        "Location": {"Longitude": 0.0, "Latitude": 0.0},
+        "StopName": "",
+        "Extension": {
+            "StopCode": "",
+            "LogicalStopCode": "",
+            "IsFlexhopStop": False,
+            "distance": 0.0,
+        },
+    },
+    "visit": {
+        "RecordedAtTime": None,
+        "MonitoringRef": "",
+        "StopCode": "",
+        "MonitoredVehicleJourney": {
+            "LineRef": "",
+            "DirectionRef": 0,
+            "FramedVehicleJourneyRef": {},
+            "VehicleMode": "bus",
+            "PublishedLineName": "",
+            "DestinationName": "",
+            "DestinationShortName": "",
+            "Via": "",
+            "MonitoredCall": {
+                "StopPointName": "",
+                "StopCode": "",
+                "Order": 0,
+                "Extension": {"IsRealTime": True, "DataSource": "", "Experimentation": ""},
+            },
+            "PreviousCall": [],
+            "OnwardCall": [],
+        },
+    },
+    "message": {
+        "formatRef": "plaintext",
+        "InfoChannelRef": "",
+        "Content": {
+            "ImpactedGroupOfLinesRef": "",
+            "ImpactedLineRef": [],
+            "TypeOfPassengerEquipmentRef": "",
+            "Priority": "Normal",
+            "SendUpdatedNotificationsToCustomers": False,
+            "Message": [],
+        },
+    },
+}
+
+
+def load_templates(fixtures_dir: Path) -> dict[str, dict[str, Any]]:
+    """Load the element templates from fixture files of API responses."""
+
+    def first(filename: str, *path: str) -> dict[str, Any]:
+        data: Any = json.loads((fixtures_dir / filename).read_text())
+        for name in path:
+            data = data[name]
+            if isinstance(data, list):
+                data = data[0]
+        return data
+
+    return {
+        "line": first("lines_discovery.json", "LinesDelivery", "AnnotatedLineRef"),
+        "stop": first(
+            "stoppoints_discovery.json", "StopPointsDelivery", "AnnotatedStopPointRef"
+        ),
+        "visit": first(
+            "stop_monitoring.json",
+            "ServiceDelivery",
+            "StopMonitoringDelivery",
+            "MonitoredStopVisit",
+        ),
+        "message": first(
+            "general_messages.json",
+            "ServiceDelivery",
+            "GeneralMessageDelivery",
+            "InfoMessage",
+        ),
+    }
+
+
+def _isoformat(value: datetime) -> str:
+    return value.isoformat(timespec="seconds")
+
+
+def _distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Returns the approximate distance between two points, in meters."""
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return math.hypot(x, y) * 6371000
+
+
+@dataclass
+class SyntheticNetwork:
+    """Synthetic network of lines, stops, journeys and messages.
+
+    Each line runs back and forth along a route of stops_per_line stops, with a
+    journey every headway, so that the departures of a journey are consistent
+    across the stops it serves."""
+
+    lines: int = 10
+    stops: int = 100
+    stops_per_line: int = 20
+    journeys_per_direction: int = 6
+    headway: timedelta = timedelta(minutes=10)
+    interstop: timedelta = timedelta(minutes=2)
+    messages: int = 5
+    templates: dict[str, dict[str, Any]] = field(
+        default_factory=lambda: copy.deepcopy(DEFAULT_TEMPLATES)
+    )
+    epoch: datetime = field(default_factory=lambda: datetime.now().astimezone())
+    seed: int = 0
+
+    def __post_init__(self) -> None:
+        rnd = random.Random(self.seed)
+        step = max(1, self.stops // max(1, self.lines))
+        self.routes: dict[str, list[str]] = {
+            self.line_ref(i): [
+                self.stop_code((i * step + n) % self.stops)
+                for n in range(min(self.stops_per_line, self.stops))
+            ]
+            for i in range(self.lines)
+        }
+        self.locations: dict[str, tuple[float, float]] = {
+            self.stop_code(i): (
+                48.58 + rnd.uniform(-0.05, 0.05),
+                7.75 + rnd.uniform(-0.07, 0.07),
+            )
+            for i in range(self.stops)
+        }
+        self.visits: dict[str, list[dict[str, Any]]] = {
+            self.stop_code(i): [] for i in range(self.stops)
+        }
+        self.journeys: dict[str, list[dict[str, Any]]] = {}
+        for line_ref, route in self.routes.items():
+            for direction in (1, 2):
+                stops = route if direction == 1 else route[::-1]
+                for n in range(self.journeys_per_direction):
+                    self._add_journey(line_ref, direction, n, stops)
+        for visits in self.visits.values():
+            visits.sort(
+                key=lambda v: v["MonitoredVehicleJourney"]["MonitoredCall"][
+                    "ExpectedDepartureTime"
+                ]
+            )
+
+    @staticmethod
+    def line_ref(index: int) -> str:
+        """Returns the reference of the n-th line."""
+        return f"L{index}"
+
+    @staticmethod
+    def stop_code(index: int) -> str:
+        """Returns the code of the n-th stop."""
+        return f"{index + 1}"
+
+    @staticmethod
+    def stop_name(stop_code: str) -> str:
+        """Returns the name of a stop."""
+        return f"Stop {stop_code}"
+
+    def _add_journey(
+        self, line_ref: str, direction: int, number: int, stops: list[str]
+    ) -> None:
+        """Add the visits of a journey to the stops it serves."""
+        start = self.epoch + number * self.headway
+        times = [start + k * self.interstop for k in range(len(stops))]
+        journey_ref = {
+            "DataFrameRef": self.epoch.date().isoformat(),
+            "DatedVehicleJourneyRef": f"{line_ref}:{direction}:{number}",
+        }
+        destination = self.stop_name(stops[-1])
+        journey_visits = self.journeys[journey_ref["DatedVehicleJourneyRef"]] = []
+        for order, stop_code in enumerate(stops):
+            visit = copy.deepcopy(self.templates["visit"])
+            visit["RecordedAtTime"] = _isoformat(self.epoch)
+            visit["MonitoringRef"] = stop_code
+            visit["StopCode"] = stop_code
+            journey = visit["MonitoredVehicleJourney"]
+            journey.update(
+                {
+                    "LineRef": line_ref,
+                    "DirectionRef": direction,
+                    "FramedVehicleJourneyRef": journey_ref,
+                    "PublishedLineName": line_ref,
+                    "DestinationName": destination,
+                    "DestinationShortName": destination,
+                }
+            )
+            journey["MonitoredCall"].update(
+                {
+                    "StopPointName": self.stop_name(stop_code),
+                    "StopCode": stop_code,
+                    "Order": order + 1,
+                    "ExpectedDepartureTime": _isoformat(times[order]),
+                    "ExpectedArrivalTime": _isoformat(times[order]),
+                }
+            )
+            journey["PreviousCall"] = [
+                {"StopPointName": self.stop_name(code), "StopCode": code, "Order": k + 1}
+                for k, code in enumerate(stops[:order])
+            ]
+            journey["OnwardCall"] = [
+                {
+                    "StopPointName": self.stop_name(code),
+                    "StopCode": code,
+                    "Order": k + 1,
+                    "ExpectedDepartureTime": _isoformat(times[k]),
+                    "ExpectedArrivalTime": _isoformat(times[k]),
+                }
+                for k, code in enumerate(stops)
+                if k > order
+            ]
+            self.visits[stop_code].append(visit)
+            journey_visits.append(visit)
+
+    def lines_discovery(self) -> dict[str, Any]:
+        """Returns a lines-discovery response."""
+        lines = []
+        for line_ref, route in self.routes.items():
+            line = copy.deepcopy(self.templates["line"])
+            line["LineRef"] = line_ref
+            line["LineName"] = f"Line {line_ref}"
+            line["Destinations"] = [
+                {"DirectionRef": 1, "DestinationName": [self.stop_name(route[-1])]},
+                {"DirectionRef": 2, "DestinationName": [self.stop_name(route[0])]},
+            ]
+            lines.append(line)
+        return {
+            "LinesDelivery": {
+                "ResponseTimestamp": _isoformat(self.epoch),
+                "ValidUntil": _isoformat(self.epoch + timedelta(days=1)),
+                "ShortestPossibleCycle": "PT1M",
+                "AnnotatedLineRef": lines,
+            }
+        }
+
+    def stoppoints_discovery(
+        self,
+        stop_code: Optional[str] = None,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        distance: Optional[float] = None,
+    ) -> dict[str, Any]:
+        """Returns a stoppoints-discovery response."""
+        stops = []
+        for code, (lat, lon) in self.locations.items():
+            if stop_code is not None and code != stop_code:
+                continue
+            meters = 0.0
+            if latitude is not None and longitude is not None:
+                meters = _distance(latitude, longitude, lat, lon)
+                if distance is not None and meters > distance:
+                    continue
+            stop = copy.deepcopy(self.templates["stop"])
+            stop["StopPointRef"] = code
+            stop["StopName"] = self.stop_name(code)
+            stop["Location"] = {"Latitude": lat, "Longitude": lon}
+            stop["Extension"] = {
+                **stop.get("Extension", {}),
+                "StopCode": code,
+                "LogicalStopCode": code,
+                "distance": meters,
+            }
+            stops.append(stop)
+        stops.sort(key=lambda s: s["Extension"]["distance"])
+        return {
+            "StopPointsDelivery": {
+                "ResponseTimestamp": _isoformat(self.epoch),
+                "AnnotatedStopPointRef": stops,
+            }
+        }
+
+    def stop_monitoring(
+        self,
+        monitoring_ref: str,
+        line_ref: Optional[str] = None,
+        direction_ref: Optional[int] = None,
+        maximum_stop_visits: Optional[int] = None,
+    ) -> dict[str, Any]:
+        """Returns a stop-monitoring response."""
+        visits = [
+            visit
+            for visit in self.visits.get(monitoring_ref, [])
+            if (
+                line_ref is None
+                or visit["MonitoredVehicleJourney"]["LineRef"] == line_ref
+            )
+            and (
+                direction_ref is None
+                or visit["MonitoredVehicleJourney"]["DirectionRef"] == direction_ref
+            )
+        ]
+        if maximum_stop_visits is not None:
+            visits = visits[:maximum_stop_visits]
+        return {
+            "ServiceDelivery": {
+                "ResponseTimestamp": _isoformat(self.epoch),
+                "StopMonitoringDelivery": [
+                    {
+                        "version": "2.0",
+                        "ResponseTimestamp": _isoformat(self.epoch),
+                        "ValidUntil": _isoformat(self.epoch + timedelta(minutes=1)),
+                        "ShortestPossibleCycle": "PT30S",
+                        "MonitoringRef": [monitoring_ref],
+                        "MonitoredStopVisit": visits,
+                    }
+                ],
+            }
+        }
+
+    def _journeys(
+        self, line_ref: Optional[str], direction_ref: Optional[int]
+    ) -> list[list[dict[str, Any]]]:
+        """Returns the visits of the journeys of a line and direction."""
+        return [
+            visits
+            for visits in self.journeys.values()
+            if (
+                line_ref is None
+                or visits[0]["MonitoredVehicleJourney"]["LineRef"] == line_ref
+            )
+            and (
+                direction_ref is None
+                or visits[0]["MonitoredVehicleJourney"]["DirectionRef"] == direction_ref
+            )
+        ]
+
+    def vehicle_monitoring(
+        self, line_ref: Optional[str] = None, direction_ref: Optional[int] = None
+    ) -> dict[str, Any]:
+        """Returns a vehicle-monitoring response, each vehicle at its first stop."""
+        return {
+            "ServiceDelivery": {
+                "ResponseTimestamp": _isoformat(self.epoch),
+                "VehicleMonitoringDelivery": [
+                    {
+                        "ResponseTimestamp": _isoformat(self.epoch),
+                        "ValidUntil": _isoformat(self.epoch + timedelta(minutes=1)),
+                        "ShortestPossibleCycle": "PT30S",
+                        "VehicleActivity": [
+                            visits[0]
+                            for visits in self._journeys(line_ref, direction_ref)
+                        ],
+                    }
+                ],
+            }
+        }
+
+    def estimated_timetable(
+        self, line_ref: Optional[str] = None, direction_ref: Optional[int] = None
+    ) -> dict[str, Any]:
+        """Returns an estimated-timetable response."""
+        journeys = []
+        for visits in self._journeys(line_ref, direction_ref):
+            journey = visits[0]["MonitoredVehicleJourney"]
+            journeys.append(
+                {
+                    "LineRef": journey["LineRef"],
+                    "DirectionRef": journey["DirectionRef"],
+                    "FramedVehicleJourneyRef": journey["FramedVehicleJourneyRef"],
+                    "PublishedLineName": journey["PublishedLineName"],
+                    "IsCompleteStopSequence": True,
+                    "EstimatedCalls": [
+                        {
+                            "StopPointRef": visit["StopCode"],
+                            "StopPointName": call["StopPointName"],
+                            "DestinationName": journey["DestinationName"],
+                            "DestinationShortName": journey["DestinationShortName"],
+                            "Via": "",
+                            "ExpectedDepartureTime": call["ExpectedDepartureTime"],
+                            "ExpectedArrivalTime": call["ExpectedArrivalTime"],
+                            "Extension": {"IsRealTime": True},
+                        }
+                        for visit in visits
+                        for call in [visit["MonitoredVehicleJourney"]["MonitoredCall"]]
+                    ],
+                }
+            )
+        return {
+            "ServiceDelivery": {
+                "ResponseTimestamp": _isoformat(self.epoch),
+                "EstimatedTimetableDelivery": [
+                    {
+                        "version": "2.0",
+                        "ResponseTimestamp": _isoformat(self.epoch),
+                        "ValidUntil": _isoformat(self.epoch + timedelta(minutes=1)),
+                        "ShortestPossibleCycle": "PT1M",
+                        "EstimatedJourneyVersionFrame": [
+                            {
+                                "RecordedAtTime": _isoformat(self.epoch),
+                                "EstimatedVehicleJourney": journeys,
+                            }
+                        ],
+                    }
+                ],
+            }
+        }
+
+    def general_messages(self, line_refs: Optional[list[str]] = None) -> dict[str, Any]:
+        """Returns a general-message response."""
+        messages = []
+        line_list = list(self.routes)
+        for i in range(self.messages):
+            impacted = [line_list[i % len(line_list)]] if line_list else []
+            if line_refs and not set(impacted) & set(line_refs):
+                continue
+            message = copy.deepcopy(self.templates["message"])
+            message.update(
+                {
+                    "RecordedAtTime": _isoformat(self.epoch),
+                    "ItemIdentifier": f"msg:{i}",
+                    "InfoMessageIdentifier": f"msg:{i}",
+                    "ValidUntilTime": _isoformat(self.epoch + timedelta(hours=2)),
+                }
+            )
+            message["Content"] = {
+                **message.get("Content", {}),
+                "ImpactStartDateTime": _isoformat(self.epoch),
+                "ImpactEndDateTime": _isoformat(self.epoch + timedelta(hours=1)),
+                "ImpactedLineRef": impacted,
+                "Message": [
+                    {
+                        "MessageZoneRef": "",
+                        "MessageText": [
+                            {"Value": f"Disruption {i} on {impacted}", "Lang": "en"}
+                        ],
+                    }
+                ],
+            }
+            messages.append(message)
+        return {
+            "ServiceDelivery": {
+                "ResponseTimestamp": _isoformat(self.epoch),
+                "GeneralMessageDelivery": [
+                    {
+                        "version": "2.0",
+                        "ResponseTimestamp": _isoformat(self.epoch),
+                        "ShortestPossibleCycle": "PT1M",
+                        "InfoMessage": messages,
+                    }
+                ],
+            }
+        }
+
+
+@dataclass
+class Faults:
+    """Faults injected by the stub server.
+
+    Each request is delayed by latency plus a random jitter, then fails with a 429 or
+    a 500 response with the given probabilities."""
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    too_many_requests_rate: float = 0.0
+    technical_error_rate: float = 0.0
+    seed: Optional[int] = None
+
+
+class SiriStubServer:
+    """aiohttp server implementing the CTS SIRI endpoints over a synthetic network.
+
+    The server supports ETag validation. Use it as an async context manager and pass
+    its base_url to CtsApi."""
+
+    def __init__(
+        self,
+        network: Optional[SyntheticNetwork] = None,
+        faults: Optional[Faults] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        """Initialize the object."""
+        self.network = network or SyntheticNetwork()
+        self.faults = faults or Faults()
+        self.host = host
+        self.port = port
+        self.requests: dict[str, int] = {}
+        self._random = random.Random(self.faults.seed)
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.router.add_get(
+            BASE_PATH + RESOURCE_GENERAL_MESSAGE, self._general_message
+        )
+        self.app.router.add_get(
+            BASE_PATH + RESOURCE_LINES_DISCOVERY, self._lines_discovery
+        )
+        self.app.router.add_get(
+            BASE_PATH + RESOURCE_STOPPOINTS_DISCOVERY, self._stoppoints_discovery
+        )
+        self.app.router.add_get(
+            BASE_PATH + RESOURCE_STOP_MONITORING, self._stop_monitoring
+        )
+        self.app.router.add_get(
+            BASE_PATH + RESOURCE_VEHICLE_MONITORING, self._vehicle_monitoring
+        )
+        self.app.router.add_get(
+            BASE_PATH + RESOURCE_ESTIMATED_TIMETABLE, self._estimated_timetable
+        )
+
+    @property
+    def base_url(self) -> str:
+        """Returns the base URL to pass to CtsApi."""
+        return f"http://{self.host}:{self.port}{BASE_PATH}"
+
+    async def start(self) -> None:
+        """Start the server."""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self) -> None:
+        """Stop the server."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "SiriStubServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.stop()
+
+    async def _respond(self, request: web.Request, data: Any) -> web.Response:
+        """Apply the faults and return the JSON response."""
+        resource = request.path[len(BASE_PATH) :]
+        self.requests[resource] = self.requests.get(resource, 0) + 1
+
+        faults = self.faults
+        delay = faults.latency + self._random.uniform(0, faults.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        draw = self._random.random()
+        if draw < faults.too_many_requests_rate:
+            return web.json_response({"error": "Too many requests"}, status=429)
+        if draw < faults.too_many_requests_rate + faults.technical_error_rate:
+            return web.json_response({"error": "Technical error"}, status=500)
+
+        body = json.dumps(data).encode()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if request.headers.get(hdrs.IF_NONE_MATCH) == etag:
+            return web.Response(status=304, headers={hdrs.ETAG: etag})
+        return web.Response(
+            body=body, content_type="application/json", headers={hdrs.ETAG: etag}
+        )
+
+    async def _general_message(self, request: web.Request) -> web.Response:
+        line_refs = [
+            ref
+            for name in ("LineRef", "ImpactedLineRef")
+            for ref in request.query.get(name, "").split(",")
+            if ref
+        ]
+        return await self._respond(
+            request, self.network.general_messages(line_refs or None)
+        )
+
+    async def _lines_discovery(self, request: web.Request) -> web.Response:
+        return await self._respond(request, self.network.lines_discovery())
+
+    async def _stoppoints_discovery(self, request: web.Request) -> web.Response:
+        query = request.query
+        return await self._respond(
+            request,
+            self.network.stoppoints_discovery(
+                stop_code=query.get("stopCode"),
+                latitude=float(query["latitude"]) if "latitude" in query else None,
+                longitude=float(query["longitude"]) if "longitude" in query else None,
+                distance=float(query["distance"]) if "distance" in query else None,
+            ),
+        )
+
+    async def _stop_monitoring(self, request: web.Request) -> web.Response:
+        query = request.query
+        if "MonitoringRef" not in query:
+            return web.json_response({"error": "MonitoringRef is required"}, status=400)
+        return await self._respond(
+            request,
+            self.network.stop_monitoring(
+                query["MonitoringRef"],
+                line_ref=query.get("LineRef"),
+                direction_ref=(
+                    int(query["DirectionRef"]) if "DirectionRef" in query else None
+                ),
+                maximum_stop_visits=(
+                    int(query["MaximumStopVisits"])
+                    if "MaximumStopVisits" in query
+                    else None
+                ),
+            ),
+        )
+
+    async def _vehicle_monitoring(self, request: web.Request) -> web.Response:
+        query = request.query
+        return await self._respond(
+            request,
+            self.network.vehicle_monitoring(
+                line_ref=query.get("LineRef"),
+                direction_ref=(
+                    int(query["DirectionRef"]) if "DirectionRef" in query else None
+                ),
+            ),
+        )
+
+    async def _estimated_timetable(self, request: web.Request) -> web.Response:
+        query = request.query
+        return await self._respond(
+            request,
+            self.network.estimated_timetable(
+                line_ref=query.get("LineRef"),
+                direction_ref=(
+                    int(query["DirectionRef"]) if "DirectionRef" in query else None
+                ),
+            ),
+        )
+
+
+def main() -> None:
+    """Run the stub server from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--fixtures", type=Path, help="directory of fixture files")
+    parser.add_argument("--lines", type=int, default=10)
+    parser.add_argument("--stops", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-500", type=float, default=0.0)
+    args = parser.parse_args()
+
+    network = SyntheticNetwork(
+        lines=args.lines,
+        stops=args.stops,
+        messages=args.messages,
+        templates=(
+            load_templates(args.fixtures)
+            if args.fixtures
+            else copy.deepcopy(DEFAULT_TEMPLATES)
+        ),
+    )
+    server = SiriStubServer(
+        network,
+        Faults(args.latency, args.jitter, args.rate_429, args.rate_500),
+        args.host,
+        args.port,
+    )
+    print(f"Serving {server.base_url}")
+    web.run_app(server.app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
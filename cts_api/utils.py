@@ -1,6 +1,10 @@
 """Utils for API."""
 
-from datetime import timedelta
+import dataclasses
+from datetime import datetime, timedelta
+from enum import Enum
+import re
+from typing import Any, Optional
 
 
 def timedelta_isoformat(td: timedelta) -> str:
@@ -8,3 +12,37 @@ def timedelta_isoformat(td: timedelta) -> str:
     minutes, seconds = divmod(td.seconds, 60)
     hours, minutes = divmod(minutes, 60)
     return f'{"-" if td.days < 0 else ""}P{abs(td.days)}DT{hours:d}H{minutes:d}M{seconds:d}.{td.microseconds:06d}S'
+
+
+_DURATION_PATTERN = re.compile(
+    r"^(?P<sign>-)?P(?:(?P<days>\d+(?:\.\d+)?)D)?"
+    r"(?:T(?:(?P<hours>\d+(?:\.\d+)?)H)?(?:(?P<minutes>\d+(?:\.\d+)?)M)?"
+    r"(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?$"
+)
+
+
+def parse_isoduration(value: str) -> Optional[timedelta]:
+    """Parse an ISO 8601 duration (e.g. PT30S) without years or months."""
+    match = _DURATION_PATTERN.match(value or "")
+    if match is None or value in ("P", "PT", "-P"):
+        return None
+    parts = {k: float(v) for k, v in match.groupdict().items() if k != "sign" and v}
+    duration = timedelta(**parts)
+    return -duration if match.group("sign") else duration
+
+
+def to_jsonable(value: Any) -> Any:
+    """Convert a response object to JSON-serializable values."""
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {
+            f.name: to_jsonable(getattr(value, f.name)) for f in dataclasses.fields(value)
+        }
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return {k: to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.name.lower()
+    return value
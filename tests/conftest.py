@@ -3,6 +3,7 @@ from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from aiohttp import ClientSession
+from multidict import CIMultiDict
 
 
 @pytest.fixture
@@ -12,6 +13,9 @@ def mock_session():
         mock_session_instance = mock_session.return_value
         mock_session_instance.request = MagicMock()
         mock_session_instance.request.return_value = AsyncMock()
+        mock_response = mock_session_instance.request.return_value.__aenter__.return_value
+        mock_response.headers = CIMultiDict()
+        mock_response.content_length = None
         yield mock_session_instance
 
 
@@ -0,0 +1,108 @@
+"""Tests for the stop-monitoring archive."""
+from datetime import datetime, timedelta, timezone
+import json
+
+from cts_api.archive import DeltaArray, StopMonitoringArchive, StringTable
+from cts_api.responses import StopMonitoringResponse
+
+from test_client import load_fixture
+
+RECORDED_AT = datetime(2023, 1, 1, 11, 59, tzinfo=timezone.utc)
+
+
+def poll(minutes, delay):
+    """Returns the fixture response recorded minutes later, delayed by delay minutes."""
+    data = load_fixture("stop_monitoring.json")
+    for visit in data["ServiceDelivery"]["StopMonitoringDelivery"][0]["MonitoredStopVisit"]:
+        recorded_at = RECORDED_AT + timedelta(minutes=minutes)
+        visit["RecordedAtTime"] = recorded_at.isoformat()
+        visit["MonitoredVehicleJourney"]["FramedVehicleJourneyRef"] = {
+            "DatedVehicleJourneyRef": "journey:1"
+        }
+        call = visit["MonitoredVehicleJourney"]["MonitoredCall"]
+        expected = datetime.fromisoformat(call["ExpectedDepartureTime"])
+        call["ExpectedDepartureTime"] = (expected + timedelta(minutes=delay)).isoformat()
+        call.pop("ExpectedArrivalTime", None)
+    return StopMonitoringResponse.from_dict(data)
+
+
+def test_encodings():
+    """Test the string table and the delta arrays."""
+    table = StringTable()
+    assert table.encode("A") == table.encode("A") == 0
+    assert table.encode("B") == 1
+    assert table.decode(1) == "B"
+
+    values = DeltaArray()
+    for value in (1_700_000_000, 1_700_000_030, 1_700_000_060):
+        values.append(value)
+    assert list(values.deltas) == [1_700_000_000, 30, 30]
+    assert list(values) == [1_700_000_000, 1_700_000_030, 1_700_000_060]
+
+
+def test_archive_scan():
+    """Test archiving polls and scanning a stop."""
+    archive = StopMonitoringArchive()
+    assert archive.add(poll(0, 0)) == 1
+    assert archive.add(poll(0, 0)) == 0
+    assert archive.add(poll(1, 2)) == 1
+    assert archive.add(poll(2, 3)) == 1
+    assert len(archive) == 3
+
+    observations = archive.scan(
+        "123", RECORDED_AT + timedelta(minutes=1), RECORDED_AT + timedelta(minutes=3)
+    )
+    assert [o.recorded_at for o in observations] == [
+        RECORDED_AT + timedelta(minutes=1),
+        RECORDED_AT + timedelta(minutes=2),
+    ]
+    assert observations[0].line_ref == "line:1"
+    assert observations[0].expected_departure_time == datetime(
+        2023, 1, 1, 12, 7, tzinfo=timezone.utc
+    )
+    assert observations[0].expected_arrival_time is None
+    assert archive.scan("unknown", RECORDED_AT, RECORDED_AT + timedelta(hours=1)) == []
+
+
+def test_archive_serialization():
+    """Test an archive survives serialization."""
+    archive = StopMonitoringArchive()
+    for minutes in range(10):
+        archive.add(poll(minutes, minutes // 3))
+
+    restored = StopMonitoringArchive.from_bytes(archive.to_bytes())
+
+    observations = archive.scan("123", RECORDED_AT, RECORDED_AT + timedelta(hours=1))
+    assert len(observations) == 10
+    assert restored.scan("123", RECORDED_AT, RECORDED_AT + timedelta(hours=1)) == observations
+    assert restored.journey(observations[0].journey_ref) == observations
+
+
+def test_archive_other_strings():
+    """Test looking up refs known as another kind of string."""
+    archive = StopMonitoringArchive()
+    archive.add(poll(0, 0))
+    start, end = RECORDED_AT, RECORDED_AT + timedelta(minutes=1)
+    assert archive.scan("line:1", start, end) == []
+    assert archive.journey("123") == []
+
+
+def test_unreferenced_departures():
+    """Test departures of a line without journey refs are kept apart."""
+    data = load_fixture("stop_monitoring.json")
+    delivery = data["ServiceDelivery"]["StopMonitoringDelivery"][0]
+    visit = delivery["MonitoredStopVisit"][0]
+    visit["RecordedAtTime"] = RECORDED_AT.isoformat()
+    visits = []
+    for minutes in (5, 20, 35):
+        departure = json.loads(json.dumps(visit))
+        call = departure["MonitoredVehicleJourney"]["MonitoredCall"]
+        expected = RECORDED_AT + timedelta(minutes=minutes)
+        call["ExpectedDepartureTime"] = expected.isoformat()
+        visits.append(departure)
+    delivery["MonitoredStopVisit"] = visits
+    archive = StopMonitoringArchive()
+
+    assert archive.add(StopMonitoringResponse.from_dict(data)) == 3
+    observations = archive.scan("123", RECORDED_AT, RECORDED_AT + timedelta(minutes=1))
+    assert len({o.journey_ref for o in observations}) == 3
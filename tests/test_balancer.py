@@ -0,0 +1,76 @@
+"""Tests for the client-side load balancing."""
+from aiohttp import ClientSession, ClientTimeout
+import pytest
+
+from cts_api.balancer import BalancingStrategy, LoadBalancer
+from cts_api.client import CtsApi
+from cts_api.exceptions import ApiTimeoutError
+from cts_api.testing.siri_server import Faults, SiriStubServer
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_round_robin():
+    """Test that round robin skips unhealthy upstreams until they recover."""
+    clock = FakeClock()
+    balancer = LoadBalancer(["http://a", "http://b", "http://c"], retry_after=10, clock=clock)
+    assert [balancer.pick().base_url for _ in range(4)] == ["http://a", "http://b", "http://c", "http://a"]
+
+    balancer.record_failure(balancer.upstreams[1])
+    assert [balancer.pick().base_url for _ in range(3)] == ["http://c", "http://a", "http://c"]
+
+    clock.now = 10
+    assert [balancer.pick().base_url for _ in range(3)] == ["http://a", "http://b", "http://c"]
+
+
+def test_least_outstanding():
+    """Test that the least loaded upstream is picked."""
+    balancer = LoadBalancer(["http://a", "http://b"], BalancingStrategy.LEAST_OUTSTANDING)
+    balancer.upstreams[0].outstanding = 2
+    balancer.upstreams[1].outstanding = 1
+    assert balancer.pick().base_url == "http://b"
+    assert balancer.pick(exclude=[balancer.upstreams[1]]).base_url == "http://a"
+
+
+@pytest.mark.asyncio
+async def test_failover():
+    """Test that a connection error fails over to the next upstream."""
+    async with SiriStubServer() as server:
+        async with ClientSession() as session:
+            api = CtsApi("test_token", session, base_url=["http://127.0.0.1:1", server.base_url])
+            for _ in range(3):
+                response = await api.lines_discovery()
+                assert response.lines_delivery.annotated_line_refs
+
+    dead, live = api.balancer.upstreams
+    assert dead.failures == 1
+    assert live.requests == 3
+
+
+@pytest.mark.asyncio
+async def test_timeout_does_not_fail_over():
+    """Test that a timeout neither fails over nor marks the upstream unhealthy."""
+    async with SiriStubServer(faults=Faults(latency=0.5)) as server:
+        async with ClientSession() as session:
+            api = CtsApi(
+                "test_token",
+                session,
+                base_url=[server.base_url, server.base_url + "/"],
+                default_timeout=ClientTimeout(total=0.05),
+                upstream_failure_threshold=2,
+            )
+            with pytest.raises(ApiTimeoutError):
+                await api.lines_discovery()
+
+    first, second = api.balancer.upstreams
+    assert api.balancer.failure_threshold == 2
+    assert first.failures == 0
+    assert second.requests == 0
@@ -0,0 +1,85 @@
+"""Tests for the circuit breaker."""
+import pytest
+
+from cts_api.circuit_breaker import CircuitBreaker, CircuitBreakerPolicy, CircuitState
+from cts_api.client import CtsApi
+from cts_api.exceptions import ApiConnectionError, CircuitOpenError
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_open_and_recover():
+    """Test the closed, open and half-open transitions."""
+    clock = FakeClock()
+    policy = CircuitBreakerPolicy(
+        failure_rate_threshold=0.5, min_calls=4, open_duration=10, half_open_calls=2
+    )
+    breaker = CircuitBreaker("test", policy, clock)
+
+    for failed in (False, True, False, True):
+        breaker.before_call()
+        (breaker.record_failure if failed else breaker.record_success)(0.1)
+    assert breaker.state is CircuitState.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.status().retry_in == 10
+
+    clock.now = 10
+    assert breaker.state is CircuitState.HALF_OPEN
+    breaker.before_call()
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success(0.1)
+    breaker.record_success(0.1)
+    assert breaker.state is CircuitState.CLOSED
+
+
+def test_half_open_failure_reopens():
+    """Test that a failed trial call opens the circuit again."""
+    clock = FakeClock()
+    policy = CircuitBreakerPolicy(min_calls=1, open_duration=5)
+    breaker = CircuitBreaker("test", policy, clock)
+    breaker.record_failure(0.1)
+    assert breaker.state is CircuitState.OPEN
+
+    clock.now = 5
+    breaker.before_call()
+    breaker.record_failure(0.1)
+    assert breaker.state is CircuitState.OPEN
+    assert breaker.status().opened_count == 2
+
+
+def test_slow_calls_open_circuit():
+    """Test that slow calls open the circuit."""
+    policy = CircuitBreakerPolicy(min_calls=2, slow_call_duration=1, slow_call_rate_threshold=1)
+    breaker = CircuitBreaker("test", policy, FakeClock())
+    breaker.record_success(2)
+    breaker.record_success(3)
+    assert breaker.state is CircuitState.OPEN
+
+
+@pytest.mark.asyncio
+async def test_client_fails_fast(mock_session):
+    """Test that the client stops calling the API while the circuit is open."""
+    mock_session.request.return_value.__aenter__.side_effect = ApiConnectionError("down")
+
+    api = CtsApi(
+        "test_token", mock_session, circuit_breaker_policy=CircuitBreakerPolicy(min_calls=2)
+    )
+    for _ in range(2):
+        with pytest.raises(ApiConnectionError):
+            await api.lines_discovery()
+    with pytest.raises(CircuitOpenError):
+        await api.lines_discovery()
+
+    assert mock_session.request.call_count == 2
+    assert [s.state for s in api.circuit_status().values()] == [CircuitState.OPEN]
@@ -0,0 +1,48 @@
+"""Tests for the command line interface."""
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from cts_api.cli import build_parser, read_codes, run
+from cts_api.testing.siri_server import SiriStubServer, SyntheticNetwork, load_templates
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def test_read_codes(tmp_path):
+    """Test reading the stop codes from the arguments or a file."""
+    path = tmp_path / "stops.txt"
+    path.write_text("# Stops\n123\n\n456 \n")
+    assert read_codes(["789"], str(path)) == ["789"]
+    assert read_codes([], str(path)) == ["123", "456"]
+    assert read_codes([], None) == []
+
+
+@pytest.mark.asyncio
+async def test_stop_monitoring(tmp_path):
+    """Test fetching many stops and writing NDJSON."""
+    path = tmp_path / "stops.txt"
+    path.write_text("\n".join(str(i) for i in range(20)))
+    network = SyntheticNetwork(stops=20, templates=load_templates(FIXTURES))
+    async with SiriStubServer(network) as server:
+        args = build_parser().parse_args(
+            [
+                "--token=test_token",
+                f"--base-url={server.base_url}",
+                "--rate=1000",
+                "stop-monitoring",
+                f"--input={path}",
+                "--maximum-stop-visits=1",
+            ]
+        )
+        output = io.StringIO()
+        assert await run(args, output) == 0
+
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert sorted(line["monitoring_ref"] for line in lines) == sorted(
+        str(i) for i in range(20)
+    )
+    delivery = lines[0]["service_delivery"]["stop_monitoring_delivery"][0]
+    assert len(delivery["monitored_stop_visit"]) == 1
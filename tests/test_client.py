@@ -1,17 +1,28 @@
 """Tests for the CTS API client."""
+import asyncio
+from datetime import timedelta
 import json
 from pathlib import Path
 
 import pytest
-from aiohttp import ClientResponseError
+from aiohttp import ClientResponseError, ClientTimeout
+from multidict import CIMultiDict
 
+from cts_api.cache import CachePolicy
 from cts_api.client import CtsApi
-from cts_api.exceptions import BadRequestError, CtsError, InvalidTokenError, TechnicalError, TooManyRequestsError
+from cts_api.const import RESOURCE_STOP_MONITORING
+from cts_api.exceptions import ApiTimeoutError, BadRequestError, CtsError, InvalidTokenError, TechnicalError, TooManyRequestsError
+from cts_api.priority import Priority, PriorityScheduler
 
 
 def load_fixture(filename):
     """Load a fixture."""
-    return json.loads((Path(__file__).parent / "fixtures" / filename).read_text())
+    return json.loads(read_fixture(filename))
+
+
+def read_fixture(filename):
+    """Read the raw content of a fixture."""
+    return (Path(__file__).parent / "fixtures" / filename).read_bytes()
 
 
 @pytest.mark.asyncio
@@ -19,7 +30,7 @@ async def test_lines_discovery(mock_session):
     """Test lines_discovery."""
     mock_response = mock_session.request.return_value.__aenter__.return_value
     mock_response.ok = True
-    mock_response.json.return_value = load_fixture("lines_discovery.json")
+    mock_response.read.return_value = read_fixture("lines_discovery.json")
     mock_response.status = 200
 
     api = CtsApi("test_token", mock_session)
@@ -36,7 +47,7 @@ async def test_stoppoints_discovery(mock_session):
     """Test stoppoints_discovery."""
     mock_response = mock_session.request.return_value.__aenter__.return_value
     mock_response.ok = True
-    mock_response.json.return_value = load_fixture("stoppoints_discovery.json")
+    mock_response.read.return_value = read_fixture("stoppoints_discovery.json")
     mock_response.status = 200
 
     api = CtsApi("test_token", mock_session)
@@ -53,7 +64,7 @@ async def test_stop_monitoring(mock_session):
     """Test stop_monitoring."""
     mock_response = mock_session.request.return_value.__aenter__.return_value
     mock_response.ok = True
-    mock_response.json.return_value = load_fixture("stop_monitoring.json")
+    mock_response.read.return_value = read_fixture("stop_monitoring.json")
     mock_response.status = 200
 
     api = CtsApi("test_token", mock_session)
@@ -71,7 +82,7 @@ async def test_general_messages(mock_session):
     """Test general_messages."""
     mock_response = mock_session.request.return_value.__aenter__.return_value
     mock_response.ok = True
-    mock_response.json.return_value = load_fixture("general_messages.json")
+    mock_response.read.return_value = read_fixture("general_messages.json")
     mock_response.status = 200
 
     api = CtsApi("test_token", mock_session)
@@ -118,3 +129,222 @@ async def test_api_errors(mock_session, status, exception):
 
     with pytest.raises(exception):
         await api.api_request("get", "https://fake.url")
+
+
+@pytest.mark.asyncio
+async def test_conditional_request(mock_session):
+    """Test that a 304 response reuses the previously parsed object."""
+    mock_response = mock_session.request.return_value.__aenter__.return_value
+    mock_response.ok = True
+    mock_response.read.return_value = read_fixture("lines_discovery.json")
+    mock_response.status = 200
+    mock_response.headers = CIMultiDict({"ETag": '"v1"', "Content-Encoding": "gzip"})
+    mock_response.content_length = 100
+
+    api = CtsApi("test_token", mock_session)
+    first = await api.lines_discovery()
+
+    mock_response.status = 304
+    mock_response.headers = CIMultiDict({"ETag": '"v1"'})
+    mock_response.read.reset_mock()
+    second = await api.lines_discovery()
+
+    assert second is first
+    mock_response.read.assert_not_called()
+    assert mock_session.request.call_args.kwargs["headers"]["If-None-Match"] == '"v1"'
+    assert api.transfer_metrics.requests == 2
+    assert api.transfer_metrics.not_modified == 1
+    size = len(read_fixture("lines_discovery.json"))
+    assert api.transfer_metrics.bytes_saved == size - 100 + size
+
+
+@pytest.mark.asyncio
+async def test_unchanged_body(mock_session):
+    """Test that an unchanged body reuses the previously parsed object."""
+    mock_response = mock_session.request.return_value.__aenter__.return_value
+    mock_response.ok = True
+    mock_response.read.return_value = read_fixture("stop_monitoring.json")
+    mock_response.status = 200
+
+    api = CtsApi("test_token", mock_session)
+    first = await api.stop_monitoring("123")
+    second = await api.stop_monitoring("123")
+
+    mock_response.read.return_value = read_fixture("stop_monitoring.json") + b" "
+    third = await api.stop_monitoring("123")
+
+    assert second is first
+    assert third is not first
+    assert third == first
+    assert api.fingerprint_metrics.lookups == 3
+    assert api.fingerprint_metrics.hits == 1
+    assert api.fingerprint_metrics.hit_rate == pytest.approx(1 / 3)
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate(mock_session):
+    """Test that a stale response is returned while it is refreshed."""
+    mock_response = mock_session.request.return_value.__aenter__.return_value
+    mock_response.ok = True
+    mock_response.read.return_value = read_fixture("stop_monitoring.json")
+    mock_response.status = 200
+
+    api = CtsApi(
+        "test_token",
+        mock_session,
+        cache_policy=CachePolicy(max_age=timedelta(0), use_valid_until=False),
+    )
+    first = await api.stop_monitoring("stop:1")
+    assert not first.stale
+
+    second = await api.stop_monitoring("stop:1")
+    assert second.stale
+    assert second.service_delivery is first.service_delivery
+
+    await asyncio.sleep(0)
+    assert mock_session.request.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_stale_if_error(mock_session):
+    """Test that a stale response is returned when the API fails."""
+    mock_response = mock_session.request.return_value.__aenter__.return_value
+    mock_response.ok = True
+    mock_response.read.return_value = read_fixture("stop_monitoring.json")
+    mock_response.status = 200
+
+    api = CtsApi(
+        "test_token",
+        mock_session,
+        cache_policy=CachePolicy(
+            max_age=timedelta(0),
+            stale_while_revalidate=timedelta(0),
+            use_valid_until=False,
+        ),
+    )
+    first = await api.stop_monitoring("stop:1")
+
+    mock_response.ok = False
+    mock_response.status = 500
+    mock_response.content_type = "application/json"
+    mock_response.json.return_value = {"error": "Test error"}
+    mock_response.raise_for_status = MagicMock(
+        side_effect=ClientResponseError(
+            mock_response.request_info, mock_response.history, status=500
+        )
+    )
+    second = await api.stop_monitoring("stop:1")
+    assert second.stale
+    assert second.service_delivery is first.service_delivery
+
+    with pytest.raises(TechnicalError):
+        await api.stop_monitoring("stop:2")
+
+
+@pytest.mark.asyncio
+async def test_endpoint_timeouts(mock_session):
+    """Test that each endpoint uses its configured timeout."""
+    mock_response = mock_session.request.return_value.__aenter__.return_value
+    mock_response.ok = True
+    mock_response.read.return_value = read_fixture("stop_monitoring.json")
+    mock_response.status = 200
+
+    timeout = ClientTimeout(total=2, connect=0.5, sock_read=1)
+    api = CtsApi("test_token", mock_session, timeouts={RESOURCE_STOP_MONITORING: timeout})
+    await api.stop_monitoring("stop:1")
+    assert mock_session.request.call_args.kwargs["timeout"] is timeout
+
+    mock_response.read.return_value = read_fixture("lines_discovery.json")
+    await api.lines_discovery()
+    assert mock_session.request.call_args.kwargs["timeout"] is api.default_timeout
+
+
+@pytest.mark.asyncio
+async def test_timeout_error(mock_session):
+    """Test that timeouts raise ApiTimeoutError."""
+    mock_session.request.return_value.__aenter__.side_effect = asyncio.TimeoutError()
+
+    api = CtsApi("test_token", mock_session)
+    with pytest.raises(ApiTimeoutError):
+        await api.lines_discovery()
+
+
+@pytest.mark.asyncio
+async def test_prefetch_stops(mock_session):
+    """Test that a discovery prefetches the monitoring of the nearest stops."""
+    mock_response = mock_session.request.return_value.__aenter__.return_value
+    mock_response.ok = True
+    mock_response.read.return_value = read_fixture("stoppoints_discovery.json")
+    mock_response.status = 200
+
+    scheduler = PriorityScheduler()
+    api = CtsApi(
+        "test_token",
+        mock_session,
+        cache_policy=CachePolicy(use_valid_until=False),
+        scheduler=scheduler,
+        prefetch_stops=2,
+    )
+    await api.stoppoints_discovery(latitude=48.58, longitude=7.74, distance=500)
+    mock_response.read.return_value = read_fixture("stop_monitoring.json")
+    await asyncio.sleep(0)
+
+    first = await api.stop_monitoring("123")
+    second = await api.stop_monitoring("123")
+
+    assert second is first
+    assert mock_session.request.call_count == 2
+    assert scheduler.metrics[Priority.BACKGROUND].requests == 1
+
+    with pytest.raises(ValueError):
+        CtsApi("test_token", mock_session, prefetch_stops=2)
+
+
+@pytest.mark.asyncio
+async def test_queued_prefetch_is_not_joined(mock_session):
+    """Test that an interactive call does not wait behind a queued prefetch."""
+    mock_response = mock_session.request.return_value.__aenter__.return_value
+    mock_response.ok = True
+    mock_response.read.return_value = read_fixture("stoppoints_discovery.json")
+    mock_response.status = 200
+
+    scheduler = PriorityScheduler(max_concurrency=1)
+    api = CtsApi(
+        "test_token",
+        mock_session,
+        cache_policy=CachePolicy(use_valid_until=False),
+        scheduler=scheduler,
+        prefetch_stops=2,
+    )
+    await api.stoppoints_discovery(latitude=48.58, longitude=7.74, distance=500)
+    mock_response.read.return_value = read_fixture("stop_monitoring.json")
+    await scheduler.acquire(Priority.BACKGROUND)
+    await asyncio.sleep(0)
+
+    call = asyncio.create_task(api.stop_monitoring("123"))
+    await asyncio.sleep(0)
+    scheduler.release()
+    await call
+
+    # The prefetch was cancelled, and the call made the request in its own lane.
+    assert scheduler.metrics[Priority.INTERACTIVE].requests == 2
+    assert scheduler.metrics[Priority.BACKGROUND].requests == 1
+    assert mock_session.request.call_count == 2
+    assert not api._prefetches  # pylint: disable=protected-access
+
+
+@pytest.mark.asyncio
+async def test_fingerprints_are_bounded(mock_session):
+    """Test that fingerprints and validators are kept for the most recent requests."""
+    mock_response = mock_session.request.return_value.__aenter__.return_value
+    mock_response.ok = True
+    mock_response.read.return_value = read_fixture("stop_monitoring.json")
+    mock_response.status = 200
+    mock_response.headers = CIMultiDict({"ETag": '"v1"'})
+
+    api = CtsApi("test_token", mock_session, cache_policy=CachePolicy(max_entries=2))
+    for monitoring_ref in ("1", "2", "3"):
+        await api.stop_monitoring(monitoring_ref)
+
+    assert len(api._fingerprints) == 2
+    assert len(api._conditional_entries) == 2
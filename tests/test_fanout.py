@@ -0,0 +1,141 @@
+"""Tests for the fan-out server."""
+import asyncio
+from datetime import timedelta
+import json
+
+from aiohttp import ClientSession
+from aiohttp.test_utils import TestClient, TestServer
+import pytest
+
+from cts_api.client import CtsApi
+from cts_api.fanout import FanoutHub, FanoutServer, Subscriber
+from cts_api.responses import StopMonitoringResponse
+from cts_api.testing.siri_server import SiriStubServer, SyntheticNetwork
+
+from test_client import load_fixture
+
+
+def test_slow_subscriber_gets_snapshot():
+    """Test that a full queue is replaced by a snapshot of the topic."""
+    subscriber = Subscriber(max_queue=2)
+    subscriber.send({"topic": "stop:1", "added": [1]}, {"topic": "stop:1", "snapshot": [1]})
+    subscriber.send({"topic": "stop:2", "added": [2]}, {"topic": "stop:2", "snapshot": [2]})
+    subscriber.send({"topic": "stop:1", "added": [3]}, {"topic": "stop:1", "snapshot": [1, 3]})
+
+    events = [subscriber.queue.get_nowait() for _ in range(subscriber.queue.qsize())]
+    assert events == [{"topic": "stop:2", "added": [2]}, {"topic": "stop:1", "snapshot": [1, 3]}]
+    assert subscriber.dropped == 1
+
+
+def test_full_queue_with_two_topics():
+    """Test that topics whose diffs no longer fit are sent a snapshot instead."""
+    subscriber = Subscriber(max_queue=2)
+    subscriber.send({"topic": "stop:2", "added": [2]}, {"topic": "stop:2", "snapshot": [2]})
+    subscriber.send({"topic": "stop:2", "added": [4]}, {"topic": "stop:2", "snapshot": [2, 4]})
+    subscriber.send({"topic": "stop:1", "added": [1]}, {"topic": "stop:1", "snapshot": [1]})
+
+    events = [subscriber.queue.get_nowait() for _ in range(subscriber.queue.qsize())]
+    assert events == [
+        {"topic": "stop:2", "snapshot": [2, 4]},
+        {"topic": "stop:1", "snapshot": [1]},
+    ]
+    assert subscriber.dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_one_poll_for_many_subscribers():
+    """Test that subscribers of a stop share one upstream poll."""
+    network = SyntheticNetwork(lines=2, stops=4, stops_per_line=4)
+    async with SiriStubServer(network) as upstream:
+        async with ClientSession() as session:
+            api = CtsApi("test_token", session, base_url=upstream.base_url)
+            hub = FanoutHub(api, min_interval=timedelta(seconds=60))
+            subscribers = [Subscriber() for _ in range(10)]
+            for subscriber in subscribers:
+                hub.subscribe(subscriber, "stop:1")
+                hub.subscribe(subscriber, "line:L0")
+
+            events = await asyncio.gather(
+                *(asyncio.wait_for(s.queue.get(), 1) for s in subscribers)
+            )
+            await asyncio.sleep(0.05)
+            await hub.close()
+
+    assert upstream.requests["/stop-monitoring"] == 1
+    assert upstream.requests["/general-message"] == 1
+    assert all(e == events[0] for e in events)
+
+
+@pytest.mark.asyncio
+async def test_websocket_and_sse():
+    """Test the WebSocket and SSE endpoints."""
+    async with SiriStubServer() as upstream:
+        async with ClientSession() as session:
+            api = CtsApi("test_token", session, base_url=upstream.base_url)
+            server = FanoutServer(FanoutHub(api, min_interval=timedelta(seconds=60)))
+            async with TestClient(TestServer(server.app)) as client:
+                ws = await client.ws_connect("/ws")
+                await ws.send_json({"subscribe": ["stop:1"]})
+                event = await asyncio.wait_for(ws.receive_json(), 1)
+                assert event["topic"] == "stop:1"
+                assert event["added"][0]["stop_code"] == "1"
+                await ws.send_json({"subscribe": ["bad"]})
+                assert "error" in await asyncio.wait_for(ws.receive_json(), 1)
+                await ws.close()
+
+                response = await client.get("/sse", params={"topic": "stop:1"})
+                line = await asyncio.wait_for(response.content.readline(), 1)
+                event = json.loads(line.decode()[len("data: "):])
+                assert event["topic"] == "stop:1"
+                assert event["added"]
+                response.close()
+
+
+@pytest.mark.asyncio
+async def test_poll_survives_unexpected_errors():
+    """Test that a poll keeps running after an error that is not a CtsError."""
+    calls = []
+
+    class FailingOnceApi:
+        async def stop_monitoring(self, monitoring_ref):
+            calls.append(monitoring_ref)
+            if len(calls) == 1:
+                raise ValueError("unexpected")
+            return StopMonitoringResponse.from_dict(load_fixture("stop_monitoring.json"))
+
+    hub = FanoutHub(
+        FailingOnceApi(), default_interval=timedelta(0), min_interval=timedelta(0)
+    )
+    subscriber = Subscriber()
+    hub.subscribe(subscriber, "stop:123")
+    event = await asyncio.wait_for(subscriber.queue.get(), 1)
+    await hub.close()
+
+    assert calls == ["123", "123"]
+    assert len(event["added"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_unreferenced_departures_are_published():
+    """Test that departures of a line without journey refs are all published."""
+    data = load_fixture("stop_monitoring.json")
+    delivery = data["ServiceDelivery"]["StopMonitoringDelivery"][0]
+    visit = delivery["MonitoredStopVisit"][0]
+    delivery["MonitoredStopVisit"] = []
+    for minute in (5, 20, 35):
+        departure = json.loads(json.dumps(visit))
+        call = departure["MonitoredVehicleJourney"]["MonitoredCall"]
+        call["ExpectedDepartureTime"] = f"2023-01-01T12:{minute:02}:00+00:00"
+        delivery["MonitoredStopVisit"].append(departure)
+
+    class Api:
+        async def stop_monitoring(self, monitoring_ref):
+            return StopMonitoringResponse.from_dict(data)
+
+    hub = FanoutHub(Api())
+    subscriber = Subscriber()
+    hub.subscribe(subscriber, "stop:123")
+    event = await asyncio.wait_for(subscriber.queue.get(), 1)
+    await hub.close()
+
+    assert len(event["added"]) == 3
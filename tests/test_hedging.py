@@ -0,0 +1,112 @@
+"""Tests for hedged requests."""
+import asyncio
+
+import pytest
+
+from cts_api.hedging import HedgingPolicy, LatencyTracker, hedge
+from cts_api.metrics import HedgingMetrics
+
+
+def test_hedge_delay():
+    """Test the hedge delay computed from the recorded latencies."""
+    policy = HedgingPolicy(percentile=0.9, initial_delay=1.0, min_samples=10)
+    tracker = LatencyTracker(window=100)
+    assert tracker.hedge_delay(policy) == 1.0
+
+    for i in range(1, 11):
+        tracker.record(i / 10)
+    assert tracker.percentile(0.5) == 0.5
+    assert tracker.hedge_delay(policy) == 0.9
+
+
+@pytest.mark.asyncio
+async def test_hedge_fires_second_request():
+    """Test that a slow request is hedged and the fastest response wins."""
+    delays = [1.0, 0.01]
+    cancelled = []
+
+    async def request():
+        delay = delays.pop(0)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(delay)
+            raise
+        return delay
+
+    metrics = HedgingMetrics()
+    assert await hedge(request, 0.01, metrics=metrics) == 0.01
+    await asyncio.sleep(0)
+    assert cancelled == [1.0]
+    assert metrics.hedged == 1
+    assert metrics.hedge_wins == 1
+
+
+@pytest.mark.asyncio
+async def test_hedge_not_needed():
+    """Test that a fast request is not hedged."""
+    calls = []
+
+    async def request():
+        calls.append(None)
+        return "ok"
+
+    tracker = LatencyTracker(window=10)
+    assert await hedge(request, 0.5, tracker) == "ok"
+    assert len(calls) == 1
+    assert len(tracker) == 1
+
+
+@pytest.mark.asyncio
+async def test_hedge_failure_falls_back():
+    """Test that a failed attempt does not hide the other one."""
+    attempts = []
+
+    async def request():
+        attempts.append(None)
+        if len(attempts) == 1:
+            await asyncio.sleep(0.02)
+            raise ValueError("boom")
+        await asyncio.sleep(0.05)
+        return "second"
+
+    assert await hedge(request, 0.01) == "second"
+
+
+@pytest.mark.asyncio
+async def test_hedge_both_fail():
+    """Test that the error of the last failed attempt is raised."""
+    attempts = []
+
+    async def request():
+        attempts.append(None)
+        attempt = len(attempts)
+        await asyncio.sleep(0.02 if attempt == 1 else 0.03)
+        raise ValueError(f"attempt {attempt}")
+
+    with pytest.raises(ValueError, match="attempt 2"):
+        await hedge(request, 0.01)
+
+
+@pytest.mark.asyncio
+async def test_hedge_cancelled():
+    """Test that cancelling a hedged call cancels its attempts and records them."""
+    cancelled = []
+
+    async def request():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(None)
+            raise
+
+    tracker = LatencyTracker(window=10)
+    task = asyncio.ensure_future(hedge(request, 0.5, tracker))
+    await asyncio.sleep(0.02)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    await asyncio.sleep(0)
+    assert cancelled == [None]
+    assert len(tracker) == 1
+    assert tracker.percentile(0.5) >= 0.02
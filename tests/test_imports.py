@@ -0,0 +1,65 @@
+"""Tests for the start-up cost of the package."""
+import json
+import subprocess
+import sys
+
+# Modules of the optional features of the client.
+FEATURE_MODULES = {
+    "cts_api.balancer",
+    "cts_api.cache",
+    "cts_api.circuit_breaker",
+    "cts_api.hedging",
+    "cts_api.priority",
+    "cts_api.streaming",
+}
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import cts_api
+cts_api.{attribute}
+elapsed = time.perf_counter() - start
+modules = sorted(sys.modules)
+start = time.perf_counter()
+import aiohttp
+baseline = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "baseline": baseline, "modules": modules}}))
+"""
+
+
+def load(attribute):
+    """Returns the time to load an attribute of the package in a new interpreter, the
+    time to import aiohttp afterwards, and the modules the attribute imported."""
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT.format(attribute=attribute)],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    output = json.loads(result.stdout)
+    return output["elapsed"], output["baseline"], set(output["modules"])
+
+
+def test_lazy_imports():
+    """Test that the package loads the client and its dependencies on first access."""
+    _, _, modules = load("StopMonitoringResponse")
+    assert "cts_api.responses" in modules
+    assert "cts_api.client" not in modules
+    assert "aiohttp" not in modules
+
+    _, _, modules = load("CtsApi")
+    assert "cts_api.client" in modules
+    assert "aiohttp" in modules
+    assert not modules & FEATURE_MODULES
+
+
+def test_import_budget():
+    """Test that loading a response type costs less than importing aiohttp.
+
+    Both are timed in the same interpreter, so the budget follows the speed of the
+    machine."""
+    ratios = []
+    for _ in range(3):
+        elapsed, baseline, _ = load("StopMonitoringResponse")
+        ratios.append(elapsed / baseline)
+    assert min(ratios) < 1
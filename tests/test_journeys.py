@@ -0,0 +1,62 @@
+"""Tests for the journey store."""
+from datetime import datetime, timezone
+
+from cts_api.journeys import JourneyStore
+from cts_api.responses import MonitoredStopVisit
+
+
+def visit(stop, recorded_at, previous, onward):
+    """Returns a visit of journey J1 at a stop."""
+    return MonitoredStopVisit.from_dict(
+        {
+            "RecordedAtTime": f"2023-01-01T{recorded_at}:00+00:00",
+            "StopCode": stop[0],
+            "MonitoredVehicleJourney": {
+                "LineRef": "A",
+                "FramedVehicleJourneyRef": {"DatedVehicleJourneyRef": "J1"},
+                "MonitoredCall": {
+                    "StopCode": stop[0],
+                    "Order": stop[1],
+                    "ExpectedDepartureTime": f"2023-01-01T{stop[2]}:00+00:00",
+                },
+                "PreviousCall": [{"StopCode": s, "Order": o} for s, o in previous],
+                "OnwardCall": [
+                    {
+                        "StopCode": s,
+                        "Order": o,
+                        "ExpectedArrivalTime": f"2023-01-01T{t}:00+00:00",
+                    }
+                    for s, o, t in onward
+                ],
+            },
+        }
+    )
+
+
+def test_merge_visits():
+    """Test the visits of a journey at several stops are merged."""
+    store = JourneyStore()
+    store.add_visit(visit(("S2", 2, "08:02"), "08:00", [("S1", 1)], [("S3", 3, "08:05")]))
+    store.add_visit(visit(("S3", 3, "08:06"), "08:01", [("S1", 1), ("S2", 2)], []))
+    # An older observation does not override a newer prediction.
+    store.add_visit(visit(("S2", 2, "08:02"), "07:59", [], [("S3", 3, "08:04")]))
+
+    assert len(store) == 1
+    journey = store.get("J1")
+    assert [c.stop_code for c in journey.stops()] == ["S1", "S2", "S3"]
+    assert journey.last_call().stop_code == "S2"
+    assert [c.stop_code for c in journey.next_calls()] == ["S3"]
+    assert journey.calls["S3"].expected_departure_time == datetime(
+        2023, 1, 1, 8, 6, tzinfo=timezone.utc
+    )
+    assert store.for_line("A") == [journey]
+
+
+def test_prune():
+    """Test journeys not updated are dropped."""
+    store = JourneyStore()
+    store.add_visit(visit(("S1", 1, "08:00"), "08:00", [], []))
+
+    assert store.prune(datetime(2023, 1, 1, 8, 0, tzinfo=timezone.utc)) == 0
+    assert store.prune(datetime(2023, 1, 1, 9, 0, tzinfo=timezone.utc)) == 1
+    assert store.get("J1") is None
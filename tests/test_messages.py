@@ -0,0 +1,80 @@
+"""Tests for the general message store."""
+from datetime import datetime
+
+import pytest
+
+from cts_api.client import CtsApi
+from cts_api.messages import MessageStore
+from cts_api.responses import InfoMessage
+
+from test_client import read_fixture
+
+
+def make_message(identifier, lines, start=None, end=None, valid_until=None, text=""):
+    """Build an info message."""
+    return InfoMessage.from_dict(
+        {
+            "InfoMessageIdentifier": identifier,
+            "ValidUntilTime": valid_until,
+            "Content": {
+                "ImpactStartDateTime": start,
+                "ImpactEndDateTime": end,
+                "ImpactedLineRef": lines,
+                "Message": [{"MessageText": [{"Value": text, "Lang": "fr"}]}],
+            },
+        }
+    )
+
+
+def at(hour, minute=0):
+    """Build a datetime on the test day."""
+    return datetime.fromisoformat(f"2023-01-01T{hour:02d}:{minute:02d}:00+00:00")
+
+
+def test_active_by_line_and_time():
+    """Test that messages are filtered by line and impact window."""
+    store = MessageStore()
+    store.update(
+        [
+            make_message("a", ["A", "B"], "2023-01-01T08:00:00+00:00", "2023-01-01T10:00:00+00:00"),
+            make_message("b", ["A"], "2023-01-01T09:00:00+00:00", None, "2023-01-01T12:00:00+00:00"),
+            make_message("c", ["C"]),
+        ]
+    )
+
+    assert [m.info_message_identifier for m in store.active("A", at(7))] == []
+    assert [m.info_message_identifier for m in store.active("A", at(9, 30))] == ["a", "b"]
+    assert [m.info_message_identifier for m in store.active("B", at(11))] == []
+    assert [m.info_message_identifier for m in store.active("A", at(11))] == ["b"]
+    assert [m.info_message_identifier for m in store.active("A", at(12))] == []
+    assert [m.info_message_identifier for m in store.active("C", at(23))] == ["c"]
+    assert [m.info_message_identifier for m in store.active(at=at(9))] == ["a", "b", "c"]
+
+
+def test_incremental_update():
+    """Test that updates replace, keep and remove messages."""
+    store = MessageStore()
+    assert store.update([make_message("a", ["A"]), make_message("b", ["B"])]) == 2
+    assert store.update([make_message("a", ["A"]), make_message("b", ["B"])]) == 0
+
+    assert store.update([make_message("a", ["C"], text="moved")]) == 2
+    assert "b" not in store
+    assert store.for_line("A") == []
+    assert store.for_line("C")[0].content.message[0].message_text[0].value == "moved"
+
+    assert store.update([make_message("d", ["D"])], complete=False) == 1
+    assert len(store) == 2
+
+
+@pytest.mark.asyncio
+async def test_refresh(mock_session):
+    """Test refreshing the store from the API."""
+    mock_response = mock_session.request.return_value.__aenter__.return_value
+    mock_response.ok = True
+    mock_response.read.return_value = read_fixture("general_messages.json")
+    mock_response.status = 200
+
+    store = MessageStore()
+    assert await store.refresh(CtsApi("test_token", mock_session)) == 1
+    assert [m.info_message_identifier for m in store.active(at=at(12, 30))] == ["msg:1"]
+    assert store.active(at=at(13, 30)) == []
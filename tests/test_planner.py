@@ -0,0 +1,123 @@
+"""Tests for the stop-monitoring query planner."""
+import asyncio
+import copy
+
+import pytest
+
+from cts_api.planner import StopMonitoringPlanner
+from cts_api.responses import StopMonitoringResponse
+
+from test_client import load_fixture
+
+# Line and direction of the visits at the stop, in time order.
+VISITS = [("A", 1), ("B", 1), ("A", 2), ("A", 1), ("B", 2), ("A", 2), ("A", 1)]
+
+
+class FakeApi:
+    """Stop-monitoring API over VISITS, counting the calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def stop_monitoring(
+        self,
+        monitoring_ref,
+        requestor_ref=None,
+        message_identifier=None,
+        vehicle_mode=None,
+        preview_interval=None,
+        start_time=None,
+        line_ref=None,
+        direction_ref=None,
+        maximum_stop_visits=3,
+        minimum_stop_visits_per_line=3,
+        include_general_message=None,
+        include_fluo67=False,
+    ):
+        self.calls.append((line_ref, direction_ref, maximum_stop_visits))
+        await asyncio.sleep(0)
+        data = load_fixture("stop_monitoring.json")
+        delivery = data["ServiceDelivery"]["StopMonitoringDelivery"][0]
+        template = delivery["MonitoredStopVisit"][0]
+        matching = [
+            (line, direction)
+            for line, direction in VISITS
+            if line_ref in (None, line) and direction_ref in (None, direction)
+        ]
+        visits, per_line = [], {}
+        for index, (line, direction) in enumerate(matching):
+            count = per_line.get(line, 0)
+            if (
+                maximum_stop_visits is None
+                or index < maximum_stop_visits
+                or count < (minimum_stop_visits_per_line or 0)
+            ):
+                visit = copy.deepcopy(template)
+                visit["MonitoredVehicleJourney"]["LineRef"] = line
+                visit["MonitoredVehicleJourney"]["DirectionRef"] = direction
+                visits.append(visit)
+                per_line[line] = count + 1
+        delivery["MonitoredStopVisit"] = visits
+        return StopMonitoringResponse.from_dict(data)
+
+
+def lines(response):
+    """Returns the lines and directions of the visits of a response."""
+    visits = response.service_delivery.stop_monitoring_delivery[0].monitored_stop_visit
+    journeys = [visit.monitored_vehicle_journey for visit in visits]
+    return [(journey.line_ref, journey.direction_ref) for journey in journeys]
+
+
+@pytest.mark.asyncio
+async def test_merged_requests():
+    """Test that concurrent requests of a stop get the visits of their own query."""
+    selections = [
+        {},
+        {"maximum_stop_visits": 2, "minimum_stop_visits_per_line": 0},
+        {"line_ref": "A"},
+        {"line_ref": "B", "direction_ref": 2, "maximum_stop_visits": 1},
+        {
+            "line_ref": "A",
+            "direction_ref": 2,
+            "maximum_stop_visits": 1,
+            "minimum_stop_visits_per_line": 0,
+        },
+    ]
+    api = FakeApi()
+    planner = StopMonitoringPlanner(api)
+    responses = await asyncio.gather(
+        *(planner.stop_monitoring("123", **selection) for selection in selections)
+    )
+    assert planner.metrics.requests == 5
+    assert planner.metrics.merged == 5
+    assert len(api.calls) == planner.metrics.upstream_calls == 1
+    assert api.calls[0][:2] == (None, None)
+
+    for selection, response in zip(selections, responses):
+        assert lines(response) == lines(await api.stop_monitoring("123", **selection))
+
+
+@pytest.mark.asyncio
+async def test_fallback():
+    """Test that a request whose visits may be cut by the merged query is sent alone."""
+    api = FakeApi()
+    planner = StopMonitoringPlanner(api)
+    narrow, broad = await asyncio.gather(
+        planner.stop_monitoring("123", line_ref="A", direction_ref=1),
+        planner.stop_monitoring("123", maximum_stop_visits=1),
+    )
+    assert lines(narrow) == [("A", 1), ("A", 1), ("A", 1)]
+    assert lines(broad) == [("A", 1), ("B", 1), ("A", 2), ("A", 1), ("B", 2)]
+    assert planner.metrics.fallbacks == 1
+    assert api.calls[-1] == ("A", 1, 3)
+
+
+@pytest.mark.asyncio
+async def test_single_requests():
+    """Test that lone and direction-only requests are sent as they are."""
+    api = FakeApi()
+    planner = StopMonitoringPlanner(api)
+    await planner.stop_monitoring("123", line_ref="B")
+    await planner.stop_monitoring("123", direction_ref=2)
+    assert api.calls == [("B", None, 3), (None, 2, 3)]
+    assert planner.metrics.merged == 0
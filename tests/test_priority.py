@@ -0,0 +1,121 @@
+"""Tests for the priority lanes."""
+import asyncio
+
+import pytest
+
+from cts_api.client import CtsApi
+from cts_api.priority import Priority, PriorityScheduler, current_priority, priority
+
+
+@pytest.mark.asyncio
+async def test_weighted_share():
+    """Test that waiting lanes are granted slots in proportion to their weights."""
+    scheduler = PriorityScheduler(max_concurrency=1)
+    await scheduler.acquire(Priority.INTERACTIVE)
+    granted = []
+
+    async def request(value):
+        async with scheduler.slot(value):
+            granted.append(value)
+
+    tasks = [asyncio.create_task(request(Priority.BACKGROUND)) for _ in range(5)]
+    tasks += [asyncio.create_task(request(Priority.INTERACTIVE)) for _ in range(18)]
+    await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+
+    assert granted[:10].count(Priority.BACKGROUND) == 1
+    assert granted[:20].count(Priority.BACKGROUND) == 2
+    assert scheduler.metrics[Priority.BACKGROUND].requests == 5
+    assert scheduler.metrics[Priority.INTERACTIVE].requests == 19
+    assert scheduler.metrics[Priority.INTERACTIVE].waiting == 0
+    assert scheduler.active == 0
+
+
+@pytest.mark.asyncio
+async def test_context_priority():
+    """Test that the priority of the context is inherited by the tasks."""
+    assert current_priority() is Priority.INTERACTIVE
+    with priority(Priority.BACKGROUND):
+        task = asyncio.create_task(asyncio.sleep(0, current_priority()))
+    assert current_priority() is Priority.INTERACTIVE
+    assert await task is Priority.BACKGROUND
+
+
+@pytest.mark.asyncio
+async def test_cancelled_request():
+    """Test that a cancelled request leaves its lane."""
+    scheduler = PriorityScheduler(max_concurrency=1)
+    await scheduler.acquire(Priority.INTERACTIVE)
+    task = asyncio.create_task(scheduler.acquire(Priority.BACKGROUND))
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    scheduler.release()
+    assert scheduler.active == 0
+    assert scheduler.metrics[Priority.BACKGROUND].waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_cancel_then_release():
+    """Test that slots are not lost when requests are cancelled around a release."""
+    scheduler = PriorityScheduler(max_concurrency=1)
+    await scheduler.acquire(Priority.INTERACTIVE)
+    cancelled = asyncio.create_task(scheduler.acquire(Priority.BACKGROUND))
+    granted = asyncio.create_task(scheduler.acquire(Priority.BACKGROUND))
+    await asyncio.sleep(0)
+
+    # The waiting request is cancelled before the release dispatches the slot.
+    cancelled.cancel()
+    scheduler.release()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+    await granted
+    assert scheduler.active == 1
+
+    # The slot is granted, then the request is cancelled before it resumes.
+    waiting = asyncio.create_task(scheduler.acquire(Priority.INTERACTIVE))
+    await asyncio.sleep(0)
+    scheduler.release()
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+
+    assert scheduler.active == 0
+    assert not any(scheduler._queues.values())  # pylint: disable=protected-access
+    await asyncio.wait_for(scheduler.acquire(Priority.BACKGROUND), 1)
+
+
+@pytest.mark.asyncio
+async def test_rate_budget():
+    """Test that slots are granted within the rate budget."""
+    now = [0.0]
+    scheduler = PriorityScheduler(rate=100, clock=lambda: now[0])
+    await scheduler.acquire(Priority.INTERACTIVE)
+    task = asyncio.create_task(scheduler.acquire(Priority.BACKGROUND))
+    await asyncio.sleep(0)
+    assert not task.done()
+
+    now[0] = 0.01
+    await asyncio.wait_for(task, 1)
+    assert scheduler.metrics[Priority.BACKGROUND].max_queue_time == pytest.approx(0.01)
+
+
+@pytest.mark.asyncio
+async def test_client_scheduler(mock_session):
+    """Test that the client holds a slot per request."""
+    mock_response = mock_session.request.return_value.__aenter__.return_value
+    mock_response.ok = True
+    mock_response.read.return_value = b'{"LinesDelivery": {"AnnotatedLineRef": []}}'
+    mock_response.status = 200
+
+    scheduler = PriorityScheduler()
+    api = CtsApi("test_token", mock_session, scheduler=scheduler)
+    with priority(Priority.BACKGROUND):
+        await api.lines_discovery()
+
+    assert scheduler.metrics[Priority.BACKGROUND].requests == 1
+    assert scheduler.metrics[Priority.INTERACTIVE].requests == 0
+    assert scheduler.active == 0
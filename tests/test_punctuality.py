@@ -0,0 +1,52 @@
+"""Tests for the punctuality engine."""
+from cts_api.punctuality import Dimension, PunctualityEngine
+from cts_api.responses import MonitoredVehicleJourney
+
+
+def journey(ref, line, departure, onward, real_time=True):
+    """Returns a journey at stop A followed by stop B."""
+    return MonitoredVehicleJourney.from_dict(
+        {
+            "LineRef": line,
+            "FramedVehicleJourneyRef": {"DatedVehicleJourneyRef": ref},
+            "MonitoredCall": {
+                "StopCode": "A",
+                "ExpectedDepartureTime": f"2023-01-01T{departure}:00+01:00",
+                "Extension": {"IsRealTime": real_time},
+            },
+            "OnwardCall": [
+                {"StopCode": "B", "ExpectedArrivalTime": f"2023-01-01T{onward}:00+01:00"}
+            ],
+        }
+    )
+
+
+def test_drift():
+    """Test the drift of a journey across polls."""
+    engine = PunctualityEngine()
+    engine.add_journey(journey("J1", "A", "08:00", "08:05"))
+    engine.add_journey(journey("J1", "A", "08:02", "08:08"))
+
+    assert len(engine) == 2
+    assert engine.drift("J1") == {"A": 120, "B": 180}
+    assert engine.drift("unknown") == {}
+    assert engine.drift("A") == {}
+
+
+def test_aggregates():
+    """Test the aggregates per line, stop and hour."""
+    engine = PunctualityEngine()
+    engine.add_journey(journey("J1", "A", "08:00", "08:05"))
+    engine.add_journey(journey("J1", "A", "08:01", "08:05"))
+    engine.add_journey(journey("J2", "B", "09:00", "09:05", real_time=False))
+
+    delays = engine.delays(Dimension.LINE)
+    assert delays["A"].count == 2
+    assert delays["A"].maximum == 60
+    assert delays["A"].mean == 30
+    assert delays["B"].median == 0
+    assert set(engine.delays(Dimension.HOUR)) == {8, 9}
+    assert engine.delays(Dimension.STOP)["A"].p90 == 60
+
+    assert engine.real_time_share(Dimension.LINE) == {"A": 1.0, "B": 0.0}
+    assert engine.real_time_share(Dimension.STOP) == {"A": 0.5}
@@ -0,0 +1,53 @@
+"""Tests for the prepared requests."""
+from datetime import timedelta
+
+import pytest
+
+from cts_api.client import CtsApi
+from cts_api.const import RESOURCE_STOP_MONITORING
+from cts_api.requests import PreparedRequest, prepare_stop_monitoring
+
+from test_client import read_fixture
+
+
+def test_prepared_request_key():
+    """Test the key does not depend on the order of the parameters."""
+    first = PreparedRequest.from_params("/r", {"a": 1, "b": True, "c": None})
+    second = PreparedRequest.from_params("/r", {"b": True, "a": 1})
+
+    assert first.query_string == "a=1&b=true"
+    assert second.query_string == "b=true&a=1"
+    assert first.key == second.key
+    assert first == second
+    assert hash(first) == hash(second)
+    assert first.key != PreparedRequest.from_params("/r", {"a": 2}).key
+
+
+def test_prepare_stop_monitoring():
+    """Test prepared stop monitoring requests are encoded once."""
+    request = prepare_stop_monitoring("123")
+
+    assert request is prepare_stop_monitoring("123")
+    assert request.resource == RESOURCE_STOP_MONITORING
+    assert "MonitoringRef=123" in request.query_string
+    assert "PreviewInternal=P0DT1H30M0.000000S" in request.query_string
+    assert "IncludeFLUO67=false" in request.query_string
+    assert request != prepare_stop_monitoring("123", preview_interval=timedelta(hours=1))
+
+
+@pytest.mark.asyncio
+async def test_execute(mock_session):
+    """Test executing a prepared request."""
+    mock_response = mock_session.request.return_value.__aenter__.return_value
+    mock_response.ok = True
+    mock_response.read.return_value = read_fixture("stop_monitoring.json")
+    mock_response.status = 200
+
+    api = CtsApi("test_token", mock_session)
+    request = prepare_stop_monitoring("123")
+    response = await api.execute(request)
+
+    assert response.service_delivery is not None
+    url = mock_session.request.call_args.args[1]
+    assert url.path.endswith(RESOURCE_STOP_MONITORING)
+    assert url.query_string == request.query_string
@@ -0,0 +1,150 @@
+"""Tests for the connection scan router."""
+from datetime import datetime, timedelta, timezone
+
+from cts_api.responses import StopMonitoringResponse, StopPointsDiscoveryResponse
+from cts_api.routing import ConnectionRouter
+
+
+def at(time):
+    """Returns a time of the test day."""
+    return datetime.fromisoformat(f"2023-01-01T{time}:00+00:00")
+
+
+def response(journey_ref, line_ref, calls):
+    """Returns the visit of a journey at its first stop, with its onward calls."""
+    (stop, time), *onward = calls
+    return StopMonitoringResponse.from_dict(
+        {
+            "ServiceDelivery": {
+                "StopMonitoringDelivery": [
+                    {
+                        "MonitoredStopVisit": [
+                            {
+                                "RecordedAtTime": "2023-01-01T07:00:00+00:00",
+                                "StopCode": stop,
+                                "MonitoredVehicleJourney": {
+                                    "LineRef": line_ref,
+                                    "FramedVehicleJourneyRef": {
+                                        "DatedVehicleJourneyRef": journey_ref
+                                    },
+                                    "MonitoredCall": {
+                                        "StopCode": stop,
+                                        "Order": 1,
+                                        "ExpectedDepartureTime": at(time).isoformat(),
+                                    },
+                                    "OnwardCall": [
+                                        {
+                                            "StopCode": s,
+                                            "Order": n + 2,
+                                            "ExpectedArrivalTime": at(t).isoformat(),
+                                        }
+                                        for n, (s, t) in enumerate(onward)
+                                    ],
+                                },
+                            }
+                        ]
+                    }
+                ]
+            }
+        }
+    )
+
+
+def make_router():
+    """Returns a router over two lines crossing at X."""
+    router = ConnectionRouter()
+    router.add(response("A1", "A", [("S", "08:00"), ("X", "08:10"), ("T", "08:40")]))
+    router.add(response("B1", "B", [("X", "08:11"), ("T", "08:20")]))
+    router.add(response("B2", "B", [("X", "08:15"), ("T", "08:25")]))
+    return router
+
+
+def test_earliest_arrival():
+    """Test a change is suggested when it arrives earlier."""
+    router = make_router()
+
+    legs = router.earliest_arrival("S", "T", at("07:55"))
+
+    assert [(leg.line_ref, leg.from_stop, leg.to_stop) for leg in legs] == [
+        ("A", "S", "X"),
+        ("B", "X", "T"),
+    ]
+    # B1 leaves one minute after the arrival at X, less than the transfer time.
+    assert legs[1].journey_ref == "B2"
+    assert legs[1].arrival == at("08:25")
+
+    legs = router.earliest_arrival("S", "T", at("07:55"), transfer_time=timedelta(0))
+    assert legs[1].journey_ref == "B1"
+
+    assert router.earliest_arrival("S", "T", at("08:01")) is None
+    assert router.earliest_arrival("T", "S", at("07:55")) is None
+
+
+def test_incremental_update():
+    """Test a new poll replaces the connections of a journey."""
+    router = make_router()
+    router.add(response("B2", "B", [("X", "08:30"), ("T", "08:45")]))
+
+    legs = router.earliest_arrival("S", "T", at("07:55"))
+
+    assert [leg.journey_ref for leg in legs] == ["A1"]
+    assert len(router.connections) == 4
+    assert router.prune(at("08:12")) == 3
+    assert router.earliest_arrival("X", "T", at("08:12"))[0].journey_ref == "B2"
+
+
+def test_same_stop():
+    """Test no leg is needed to go from a stop to itself."""
+    router = make_router()
+
+    assert router.earliest_arrival("S", "S", at("07:55")) == []
+
+
+def test_logical_stops():
+    """Test changing between the stops of a logical stop."""
+    router = ConnectionRouter(
+        logical_stops={"X1": "X", "X2": "X", "T1": "T", "T2": "T"}
+    )
+    router.add(response("A1", "A", [("S", "08:00"), ("X1", "08:10")]))
+    router.add(response("B1", "B", [("X2", "08:11"), ("T2", "08:20")]))
+    router.add(response("B2", "B", [("X2", "08:15"), ("T1", "08:25")]))
+
+    legs = router.earliest_arrival("S", "T1", at("07:55"))
+
+    # The walk from X1 to X2 takes the transfer time, and T2 is part of T.
+    assert [(leg.journey_ref, leg.from_stop, leg.to_stop) for leg in legs] == [
+        ("A1", "S", "X1"),
+        ("B2", "X2", "T1"),
+    ]
+    legs = router.earliest_arrival("S", "T1", at("07:55"), transfer_time=timedelta(0))
+    assert [leg.journey_ref for leg in legs] == ["A1", "B1"]
+    assert legs[-1].to_stop == "T2"
+    assert router.earliest_arrival("X2", "X1", at("07:55")) == []
+    assert router.earliest_arrival("X1", "T1", at("08:12"))[0].journey_ref == "B2"
+
+
+def test_logical_stops_from_discovery():
+    """Test the logical stops of a stoppoints-discovery response."""
+    router = ConnectionRouter()
+    router.add_stop_points(
+        StopPointsDiscoveryResponse.from_dict(
+            {
+                "StopPointsDelivery": {
+                    "AnnotatedStopPointRef": [
+                        {
+                            "StopPointRef": ref,
+                            "StopName": "Homme de Fer",
+                            "Extension": {
+                                "StopCode": ref,
+                                "LogicalStopCode": "HDF",
+                            },
+                        }
+                        for ref in ("HDF1", "HDF2")
+                    ]
+                }
+            }
+        )
+    )
+
+    assert router.logical_stops == {"HDF1": "HDF", "HDF2": "HDF"}
+    assert router.earliest_arrival("HDF1", "HDF2", at("07:55")) == []
@@ -0,0 +1,96 @@
+"""Tests for the adaptive polling scheduler."""
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+
+import pytest
+
+from cts_api.ratelimit import TokenBucket
+from cts_api.responses import StopMonitoringResponse
+from cts_api.scheduler import AdaptivePoller
+
+from test_client import load_fixture
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_api():
+    """Build a fake API returning the stop monitoring fixture."""
+    api = AsyncMock()
+    api.stop_monitoring.return_value = StopMonitoringResponse.from_dict(
+        load_fixture("stop_monitoring.json")
+    )
+    return api
+
+
+def test_token_bucket():
+    """Test the token bucket refill."""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=2, clock=clock)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    clock.now = 0.5
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+
+def test_budget_shared_by_demand():
+    """Test that hot stops are polled more often than cold ones."""
+    clock = FakeClock()
+    poller = AdaptivePoller(make_api(), rate=0.1, cold_demand=1, clock=clock)
+    poller.record_demand("hot", 90)
+    poller.record_demand("warm", 10)
+    poller.record_demand("cold", 0.5)
+
+    assert poller.interval(poller.stops["hot"], 0) == 30
+    assert poller.interval(poller.stops["warm"], 0) == pytest.approx(100.5)
+    assert poller.interval(poller.stops["cold"], 0) is None
+
+
+def test_departure_proximity():
+    """Test that a stop is refreshed every cycle just before a departure."""
+    clock = FakeClock()
+    poller = AdaptivePoller(make_api(), rate=0.01, clock=clock)
+    stop = poller.record_demand("stop:1", 1)
+    assert poller.interval(stop, 0) == 100
+    stop.next_departure = datetime.now().astimezone() + timedelta(minutes=1)
+    assert poller.interval(stop, 0) == 30
+
+
+@pytest.mark.asyncio
+async def test_tick_within_budget():
+    """Test that a tick polls the due stops within the budget."""
+    clock = FakeClock()
+    api = make_api()
+    poller = AdaptivePoller(api, rate=1, cycle=timedelta(seconds=2), clock=clock)
+    for i in range(5):
+        poller.record_demand(f"stop:{i}", 5 - i)
+
+    assert await poller.tick() == 2
+    assert [c.args[0] for c in api.stop_monitoring.call_args_list] == ["stop:0", "stop:1"]
+
+    response = await poller.get("stop:0")
+    assert response is api.stop_monitoring.return_value
+    assert api.stop_monitoring.call_count == 2
+
+
+def test_forgotten_stops():
+    """Test that stops without demand left are forgotten."""
+    clock = FakeClock()
+    poller = AdaptivePoller(
+        make_api(), rate=1, half_life=timedelta(seconds=60), clock=clock
+    )
+    poller.record_demand("stop:1", 1)
+    clock.now = 60
+    poller.record_demand("stop:2", 1)
+
+    clock.now = 60 * 7
+    assert poller.due() == []
+    assert list(poller.stops) == ["stop:2"]
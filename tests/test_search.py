@@ -0,0 +1,54 @@
+"""Tests for the stop search index."""
+from cts_api.responses import AnnotatedStopPointRef
+from cts_api.search import StopSearchIndex, fold
+
+
+def stop(name, code, logical_code):
+    """Returns a stop point."""
+    return AnnotatedStopPointRef.from_dict(
+        {
+            "StopPointRef": code,
+            "StopName": name,
+            "Extension": {"StopCode": code, "LogicalStopCode": logical_code},
+        }
+    )
+
+
+STOPS = [
+    stop("Homme de Fer", "1a", "1"),
+    stop("Homme de Fer", "1b", "1"),
+    stop("Hôpital Civil", "2", "2"),
+    stop("Place de l'Étoile", "3", "3"),
+    stop("Étoile Bourse", "4", "4"),
+    stop("Gare Centrale", "5", "5"),
+]
+
+
+def test_fold():
+    """Test accents, case and punctuation are folded."""
+    assert fold("Place de l'Étoile") == "place de l etoile"
+
+
+def test_prefix_search():
+    """Test prefix search, grouped by logical stop code."""
+    index = StopSearchIndex(STOPS)
+
+    results = index.search("hom")
+    assert len(index) == 5
+    assert [r.group.logical_stop_code for r in results] == ["1"]
+    assert len(results[0].group.stop_points) == 2
+
+    assert [r.group.stop_name for r in index.search("etoile", limit=2)] == [
+        "Étoile Bourse",
+        "Place de l'Étoile",
+    ]
+    assert [r.group.stop_name for r in index.search("de fer", limit=1)] == ["Homme de Fer"]
+    assert index.search("") == []
+
+
+def test_fuzzy_search():
+    """Test typos are tolerated."""
+    index = StopSearchIndex(STOPS)
+
+    assert index.search("hopital civl")[0].group.stop_name == "Hôpital Civil"
+    assert index.search("gare centarle")[0].group.stop_name == "Gare Centrale"
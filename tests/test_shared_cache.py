@@ -0,0 +1,143 @@
+"""Tests for the shared cache backends."""
+import asyncio
+import socket
+import time
+
+from aiohttp import ClientSession
+import pytest
+
+from cts_api.cache import CachePolicy, MemoryCacheBackend
+from cts_api.client import CtsApi
+from cts_api.exceptions import TechnicalError
+from cts_api.redis_backend import RedisCacheBackend, RedisError
+from cts_api.testing.redis_server import FakeRedisServer
+from cts_api.testing.siri_server import Faults, SiriStubServer
+
+
+class BrokenBackend(MemoryCacheBackend):
+    """Backend failing on reads and hanging on writes."""
+
+    async def get(self, key):
+        raise RedisError("ERR broken")
+
+    async def set(self, key, value, ttl):
+        await asyncio.sleep(3600)
+
+
+@pytest.mark.asyncio
+async def test_redis_backend():
+    """Test the commands of the Redis backend against the fake server."""
+    async with FakeRedisServer() as redis:
+        backend = RedisCacheBackend(port=redis.port)
+        assert await backend.get("key") is None
+        await backend.set("key", b"\x00value", ttl=0.05)
+        assert await backend.get("key") == b"\x00value"
+        await asyncio.sleep(0.1)
+        assert await backend.get("key") is None
+
+        token = await backend.acquire_lock("key", ttl=10)
+        assert token is not None
+        assert await backend.acquire_lock("key", ttl=10) is None
+        await backend.release_lock("key", "wrong token")
+        assert await backend.acquire_lock("key", ttl=10) is None
+        await backend.release_lock("key", token)
+        assert await backend.acquire_lock("key", ttl=10) is not None
+        await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_lock():
+    """Test the locks of the memory backend."""
+    backend = MemoryCacheBackend()
+    token = await backend.acquire_lock("key", ttl=10)
+    assert await backend.acquire_lock("key", ttl=10) is None
+    await backend.release_lock("key", token)
+    assert await backend.acquire_lock("key", ttl=10) is not None
+
+
+@pytest.mark.asyncio
+async def test_clients_share_responses():
+    """Test that only one of several clients calls the API for a request."""
+    async with SiriStubServer() as server, FakeRedisServer() as redis:
+        async with ClientSession() as session:
+            backend = RedisCacheBackend(port=redis.port)
+            workers = [
+                CtsApi(
+                    "test_token",
+                    session,
+                    cache_backend=backend,
+                    cache_policy=CachePolicy(use_valid_until=False),
+                    base_url=server.base_url,
+                )
+                for _ in range(4)
+            ]
+            responses = await asyncio.gather(*(api.stop_monitoring("1") for api in workers))
+            await backend.close()
+
+    assert server.requests["/stop-monitoring"] == 1
+    assert len({r.service_delivery.response_timestamp for r in responses}) == 1
+
+
+@pytest.mark.asyncio
+async def test_waiters_take_over_failed_holder():
+    """Test that clients waiting for a failed holder take over without waiting."""
+    async with SiriStubServer(faults=Faults(technical_error_rate=1.0)) as server:
+        async with ClientSession() as session:
+            backend = MemoryCacheBackend()
+            workers = [
+                CtsApi(
+                    "test_token",
+                    session,
+                    cache_backend=backend,
+                    cache_policy=CachePolicy(lock_timeout=2),
+                    base_url=server.base_url,
+                )
+                for _ in range(3)
+            ]
+            start = time.monotonic()
+            results = await asyncio.gather(
+                *(api.stop_monitoring("1") for api in workers), return_exceptions=True
+            )
+
+    assert all(isinstance(result, TechnicalError) for result in results)
+    assert time.monotonic() - start < 1
+
+
+@pytest.mark.asyncio
+async def test_backend_failures_are_bypassed():
+    """Test that backend errors and hangs do not fail the requests."""
+    async with SiriStubServer() as server:
+        async with ClientSession() as session:
+            api = CtsApi(
+                "test_token",
+                session,
+                cache_backend=BrokenBackend(),
+                cache_policy=CachePolicy(backend_timeout=0.05),
+                base_url=server.base_url,
+            )
+            response = await api.stop_monitoring("1")
+
+    assert response.service_delivery.stop_monitoring_delivery
+
+
+@pytest.mark.asyncio
+async def test_unreachable_backend_does_not_wait_for_lock():
+    """Test that a backend outage is not mistaken for a lock held by another client."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    async with SiriStubServer() as server:
+        async with ClientSession() as session:
+            api = CtsApi(
+                "test_token",
+                session,
+                cache_backend=RedisCacheBackend("127.0.0.1", port),
+                cache_policy=CachePolicy(lock_timeout=3),
+                base_url=server.base_url,
+            )
+            start = time.monotonic()
+            response = await api.stop_monitoring("1")
+
+    assert response.service_delivery.stop_monitoring_delivery
+    assert time.monotonic() - start < 1
+    assert server.requests["/stop-monitoring"] == 1
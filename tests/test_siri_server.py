@@ -0,0 +1,83 @@
+"""Tests against the local SIRI stub server."""
+import asyncio
+from pathlib import Path
+
+from aiohttp import ClientSession
+import pytest
+
+from cts_api.client import CtsApi
+from cts_api.exceptions import TechnicalError, TooManyRequestsError
+from cts_api.testing.siri_server import Faults, SiriStubServer, SyntheticNetwork, load_templates
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def make_network(**kwargs):
+    """Build a synthetic network from the fixtures."""
+    return SyntheticNetwork(templates=load_templates(FIXTURES), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_endpoints():
+    """Test all the endpoints against the stub server."""
+    async with SiriStubServer(make_network(lines=3, stops=12, stops_per_line=6)) as server:
+        async with ClientSession() as session:
+            api = CtsApi("test_token", session, base_url=server.base_url)
+
+            lines = await api.lines_discovery()
+            assert len(lines.lines_delivery.annotated_line_refs) == 3
+
+            stops = await api.stoppoints_discovery(stop_code="1")
+            assert [s.stop_name for s in stops.stop_points_delivery.annotated_stop_point_ref] == ["Stop 1"]
+
+            response = await api.stop_monitoring("1", maximum_stop_visits=2)
+            visits = response.service_delivery.stop_monitoring_delivery[0].monitored_stop_visit
+            assert len(visits) == 2
+            assert all(v.stop_code == "1" for v in visits)
+
+            messages = await api.general_messages()
+            assert len(messages.service_delivery.general_message_delivery[0].info_message) == 5
+
+            vehicles = await api.vehicle_monitoring(line_ref="L0")
+            activity = vehicles.service_delivery.vehicle_monitoring_delivery[0].vehicle_activity
+            assert len(activity) == 12
+            assert {v.monitored_vehicle_journey.line_ref for v in activity} == {"L0"}
+
+            timetable = await api.estimated_timetable(line_ref="L0", direction_ref=1)
+            frame = timetable.service_delivery.estimated_timetable_delivery[0].estimated_journey_version_frame[0]
+            assert len(frame.estimated_vehicle_journey) == 6
+            assert len(frame.estimated_vehicle_journey[0].estimated_calls) == 6
+
+            assert await api.lines_discovery() is lines
+            assert api.transfer_metrics.not_modified == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests():
+    """Test many concurrent requests over one pooled session."""
+    async with SiriStubServer(make_network(stops=50), Faults(latency=0.01)) as server:
+        async with ClientSession() as session:
+            api = CtsApi("test_token", session, base_url=server.base_url)
+            responses = await asyncio.gather(
+                *(api.stop_monitoring(str(i % 50 + 1)) for i in range(200))
+            )
+
+    assert len(responses) == 200
+    assert server.requests["/stop-monitoring"] == 200
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "faults,exception",
+    [
+        (Faults(technical_error_rate=1), TechnicalError),
+        (Faults(too_many_requests_rate=1), TooManyRequestsError),
+    ],
+)
+async def test_faults(faults, exception):
+    """Test the injected errors."""
+    async with SiriStubServer(make_network(), faults) as server:
+        async with ClientSession() as session:
+            api = CtsApi("test_token", session, base_url=server.base_url)
+            with pytest.raises(exception):
+                await api.lines_discovery()
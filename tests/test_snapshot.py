@@ -0,0 +1,59 @@
+"""Tests for the departure snapshots."""
+from datetime import datetime, timedelta, timezone
+import os
+import stat
+
+from cts_api.responses import MonitoredStopVisit
+from cts_api.snapshot import DepartureSnapshot, write_snapshot
+
+from test_client import load_fixture
+
+
+def visit(stop_code, line_ref, minutes):
+    """Returns the fixture visit at a stop of a line, leaving minutes after noon."""
+    data = load_fixture("stop_monitoring.json")
+    data = data["ServiceDelivery"]["StopMonitoringDelivery"][0]["MonitoredStopVisit"][0]
+    data["StopCode"] = stop_code
+    journey = data["MonitoredVehicleJourney"]
+    journey["LineRef"] = line_ref
+    noon = datetime(2023, 1, 1, 12, tzinfo=timezone.utc)
+    expected = noon + timedelta(minutes=minutes)
+    journey["MonitoredCall"]["ExpectedDepartureTime"] = expected.isoformat()
+    journey["MonitoredCall"].pop("ExpectedArrivalTime")
+    return MonitoredStopVisit.from_dict(data)
+
+
+def test_snapshot(tmp_path):
+    """Test writing, reading and replacing a snapshot."""
+    path = str(tmp_path / "departures.bin")
+    visits = [
+        visit("123", "line:1", 10),
+        visit("456", "line:2", 3),
+        visit("123", "line:2", 5),
+        visit("456", "line:1", 12),
+    ]
+    assert write_snapshot(path, visits) == 4
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+
+    with DepartureSnapshot(path) as snapshot:
+        assert len(snapshot) == 4
+        assert sorted(snapshot.stop_codes()) == ["123", "456"]
+        assert sorted(snapshot.line_refs()) == ["line:1", "line:2"]
+
+        departures = snapshot.stop("123")
+        assert [d.line_ref for d in departures] == ["line:2", "line:1"]
+        assert departures[0].stop_name == "Stop 1"
+        assert departures[0].direction_ref == 1
+        assert departures[0].expected_departure_time == datetime(
+            2023, 1, 1, 12, 5, tzinfo=timezone.utc
+        )
+        assert departures[0].expected_arrival_time is None
+        assert [d.stop_code for d in snapshot.line("line:2")] == ["456", "123"]
+        assert snapshot.stop("789") == []
+
+        assert not snapshot.refresh()
+        write_snapshot(path, visits[:1])
+        assert snapshot.refresh()
+        assert len(snapshot) == 1
+        assert snapshot.stop("456") == []
+        assert list(tmp_path.iterdir()) == [tmp_path / "departures.bin"]
@@ -0,0 +1,55 @@
+"""Tests for the streaming of responses."""
+import json
+from pathlib import Path
+
+from aiohttp import ClientSession
+import pytest
+
+from cts_api.client import CtsApi
+from cts_api.requests import prepare_general_messages, prepare_stop_monitoring
+from cts_api.responses import InfoMessage, MonitoredStopVisit
+from cts_api.streaming import JsonArrayScanner
+from cts_api.testing.siri_server import SiriStubServer, SyntheticNetwork, load_templates
+
+from test_client import load_fixture
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+def test_scanner(chunk_size):
+    """Test elements are extracted whatever the chunk boundaries."""
+    data = load_fixture("stop_monitoring.json")
+    delivery = data["ServiceDelivery"]["StopMonitoringDelivery"][0]
+    visit = delivery["MonitoredStopVisit"][0]
+    visit["MonitoredVehicleJourney"]["Via"] = 'a "quoted\\" {[value]}'
+    delivery["MonitoredStopVisit"] = [visit] * 3
+    body = json.dumps(data).encode()
+
+    scanner = JsonArrayScanner(["MonitoredStopVisit"])
+    elements = []
+    for start in range(0, len(body), chunk_size):
+        elements.extend(scanner.feed(body[start : start + chunk_size]))
+
+    assert [key for key, _ in elements] == ["MonitoredStopVisit"] * 3
+    assert [json.loads(element) for _, element in elements] == [visit] * 3
+
+
+@pytest.mark.asyncio
+async def test_stream():
+    """Test streaming visits and messages from the stub server."""
+    network = SyntheticNetwork(templates=load_templates(FIXTURES), stops=20)
+    async with SiriStubServer(network) as server:
+        async with ClientSession() as session:
+            api = CtsApi("test_token", session, base_url=server.base_url)
+
+            visits = [
+                v async for v in api.stream(prepare_stop_monitoring("1", maximum_stop_visits=5))
+            ]
+            assert len(visits) == 5
+            assert all(isinstance(v, MonitoredStopVisit) for v in visits)
+            assert all(v.stop_code == "1" for v in visits)
+
+            messages = [m async for m in api.stream(prepare_general_messages())]
+            assert len(messages) == 5
+            assert all(isinstance(m, InfoMessage) for m in messages)